@@ -0,0 +1,146 @@
+"""
+BIM Aggregation Module
+Groups per-element BoQ lines into one line per item, uom, material and storey
+"""
+
+import melon
+from melon import _
+from melon.utils import flt
+from typing import Dict, List, Tuple
+import base64
+import hashlib
+import json
+import zlib
+import numpy as np
+
+from quantity_survey.bim.spatial_index import get_common_location
+
+AGGREGATION_BY_ITEM = 'By Item'
+AGGREGATION_BY_ITEM_AND_STOREY = 'By Item and Storey'
+
+AGGREGATION_MODES = (AGGREGATION_BY_ITEM, AGGREGATION_BY_ITEM_AND_STOREY)
+
+# Length of the bim_element_type Data field
+ELEMENT_TYPE_FIELD_LENGTH = 140
+
+
+def aggregate_boq_lines(lines: List[Dict], aggregation: str) -> List[Dict]:
+    """
+    Collapse per-element lines into one line per group.
+
+    Lines are grouped by (item_code, uom, material) and, for
+    AGGREGATION_BY_ITEM_AND_STOREY, storey. Quantities are summed with a
+    single bincount. Each group line keeps the ids of its elements in
+    bim_element_ids (see pack_element_ids) and carries a stable group id in
+    bim_element_id, so a re-import can diff groups the way it diffs elements.
+    """
+    if not lines:
+        return []
+
+    if aggregation not in AGGREGATION_MODES:
+        melon.throw(_('Unsupported aggregation: {0}').format(aggregation))
+
+    by_storey = aggregation == AGGREGATION_BY_ITEM_AND_STOREY
+
+    groups: Dict[Tuple[str, str, str, str], int] = {}
+    codes = np.fromiter(
+        (groups.setdefault(get_group_key(line, by_storey), len(groups)) for line in lines),
+        dtype=np.int64, count=len(lines)
+    )
+    quantities = np.fromiter((flt(line['quantity']) for line in lines), dtype=float, count=len(lines))
+
+    totals = np.bincount(codes, weights=quantities, minlength=len(groups))
+    counts = np.bincount(codes, minlength=len(groups))
+
+    # Line positions per group, each in original order
+    members = np.split(np.argsort(codes, kind='stable'), np.cumsum(counts)[:-1])
+
+    item_names = get_item_names({key[0] for key in groups})
+
+    grouped = []
+    for code, key in enumerate(groups):
+        item_code, uom, material, storey = key
+        group_lines = [lines[position] for position in members[code].tolist()]
+        element_types = sorted({line['bim_element_type'] for line in group_lines if line.get('bim_element_type')})
+
+        grouped.append({
+            'item_code': item_code,
+            'item_name': item_names.get(item_code, item_code),
+            'description': describe_group(item_names.get(item_code, item_code), material, storey, len(group_lines)),
+            'quantity': float(totals[code]),
+            'uom': uom,
+            'bim_element_id': get_group_id(key),
+            'bim_element_type': ', '.join(element_types)[:ELEMENT_TYPE_FIELD_LENGTH],
+            'location_path': get_common_location([line.get('location_path') for line in group_lines]) or None,
+            'additional_quantities': None,
+            'bim_properties': json.dumps({'material': material, 'storey': storey}),
+            'bim_hash': hashlib.sha1('\n'.join(sorted(line['bim_hash'] for line in group_lines)).encode()).hexdigest(),
+            'bim_element_count': len(group_lines),
+            'bim_element_ids': pack_element_ids(line['bim_element_id'] for line in group_lines),
+            'material': material,
+            'storey': storey
+        })
+
+    return grouped
+
+
+def get_group_key(line: Dict, by_storey: bool) -> Tuple[str, str, str, str]:
+    return (
+        line['item_code'],
+        line.get('uom') or 'Nos',
+        line.get('material') or '',
+        (line.get('storey') or '') if by_storey else ''
+    )
+
+
+def get_group_id(key: Tuple[str, str, str, str]) -> str:
+    """Stable bim_element_id for a group line"""
+    return 'group:' + hashlib.sha1('\x1f'.join(key).encode()).hexdigest()[:20]
+
+
+def describe_group(item_name: str, material: str, storey: str, element_count: int) -> str:
+    parts = [item_name or '']
+    if material:
+        parts.append(material)
+    if storey:
+        parts.append(storey)
+    return f"{', '.join(parts)} ({element_count} BIM elements)"
+
+
+def get_item_names(item_codes) -> Dict[str, str]:
+    item_codes = list(item_codes)
+    if not item_codes:
+        return {}
+
+    items = melon.db.get_all('Item',
+        filters={'name': ['in', item_codes]},
+        fields=['name', 'item_name']
+    )
+    return {item.name: item.item_name for item in items}
+
+
+def pack_element_ids(element_ids) -> str:
+    """Element ids as compressed, base64 encoded text"""
+    return base64.b64encode(zlib.compress('\n'.join(element_ids).encode(), 9)).decode()
+
+
+def unpack_element_ids(packed: str) -> List[str]:
+    if not packed:
+        return []
+    return zlib.decompress(base64.b64decode(packed)).decode().split('\n')
+
+
+@melon.whitelist()
+def get_boq_item_element_ids(boq_item: str) -> List[str]:
+    """Model element ids that make up a grouped BoQ line"""
+    row = melon.db.get_value('BoQ Item', boq_item, ['parent', 'bim_element_id', 'bim_element_ids'], as_dict=True)
+    if not row:
+        melon.throw(_('BoQ Item {0} not found').format(boq_item))
+
+    if not melon.has_permission('BoQ', 'read', row.parent):
+        melon.throw(_('Access denied'), melon.PermissionError)
+
+    if row.bim_element_ids:
+        return unpack_element_ids(row.bim_element_ids)
+
+    return [row.bim_element_id] if row.bim_element_id else []
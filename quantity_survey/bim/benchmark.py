@@ -0,0 +1,259 @@
+"""
+BIM Benchmark Module
+Timing helpers for comparing BIM import strategies on real models
+"""
+
+import melon
+from melon import _
+from melon.utils import now
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from quantity_survey.bim.integrator import (
+    PARALLEL_EXTRACTION_MIN_ELEMENTS, extract_ifc_elements, get_bim_import_workers
+)
+
+
+def benchmark_ifc_extraction(file_path: str, workers: int = None) -> Dict:
+    """
+    Compare serial and process-pool IFC element extraction on one model.
+
+    Both runs go through extract_ifc_elements, the path imports take, with
+    one worker and with workers; models below PARALLEL_EXTRACTION_MIN_ELEMENTS
+    run serially either way, as they do on import.
+
+    Run from the console, e.g.
+    pine --site <site> execute quantity_survey.bim.benchmark.benchmark_ifc_extraction --args "['/path/model.ifc']"
+    """
+    import ifcopenshell
+
+    workers = workers or get_bim_import_workers()
+
+    start = time.perf_counter()
+    ifc_file = ifcopenshell.open(file_path)
+    building_elements = ifc_file.by_type("IfcBuildingElement")
+    open_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    serial_elements = extract_ifc_elements(ifc_file, file_path, workers=1)
+    serial_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel_elements = extract_ifc_elements(ifc_file, file_path, workers=workers)
+    parallel_seconds = time.perf_counter() - start
+
+    result = {
+        'file_path': file_path,
+        'elements': len(building_elements),
+        'workers': workers,
+        'parallel_used': workers > 1 and len(building_elements) >= PARALLEL_EXTRACTION_MIN_ELEMENTS,
+        'open_seconds': round(open_seconds, 3),
+        'serial_seconds': round(serial_seconds, 3),
+        'parallel_seconds': round(parallel_seconds, 3),
+        'speedup': round(serial_seconds / parallel_seconds, 2) if parallel_seconds else 0,
+        'results_match': serial_elements == parallel_elements
+    }
+
+    melon.logger().info(f"IFC extraction benchmark: {result}")
+    return result
+
+
+# Import stages timed by benchmark_bim_import, in run order
+BENCHMARK_STAGES = ('parse', 'extract', 'map', 'boq_write')
+
+
+def benchmark_bim_import(file_path: str, file_type: str, project: str, keep_boq: bool = False) -> Dict:
+    """
+    Time each stage of a BIM import against the site database.
+
+    parse only reads the file the way its reader does (STEP tokenising,
+    XML iterparse, sheet chunks) without building elements; extract then
+    produces the element dicts, so extract minus parse is the element
+    building cost. Quantities are derived while elements are built (from
+    IFC geometry or properties, DXF entities or sheet columns), so extract
+    includes that cost; there is no separate quantity stage. map picks each
+    element's primary quantity, matches items and builds BoQ lines (creating
+    any generic Items), and boq_write writes the BoQ. Every stage reports wall time, its own peak RSS and the
+    number of SQL statements it issued.
+
+    The BoQ is deleted again unless keep_boq is set. Generic Items and
+    learned mappings stay, so only a first run includes creating them.
+
+    Run from the console, e.g.
+    pine --site <site> execute quantity_survey.bim.benchmark.benchmark_bim_import --args "['/tmp/bim_corpus/bim_benchmark_10000.ifc', 'ifc', 'PROJ-0001']"
+    """
+    from quantity_survey.bim.boq_builder import create_boq_bulk
+    from quantity_survey.bim.integrator import build_boq_lines, extract_bim_elements
+    from quantity_survey.bim.item_matcher import ItemMatchIndex
+
+    file_type = file_type.lower()
+    stages = []
+
+    with measure_stage('parse', stages):
+        records = parse_bim_file(file_path, file_type)
+
+    with measure_stage('extract', stages):
+        elements = extract_bim_elements(file_path, file_type)
+
+    with measure_stage('map', stages):
+        match_index = ItemMatchIndex()
+        lines = build_boq_lines(elements, match_index)
+        match_index.save()
+        melon.db.commit()
+
+    with measure_stage('boq_write', stages):
+        boq_doc = create_boq_bulk(project, f'BIM Benchmark - {os.path.basename(file_path)}',
+            f'Benchmark import of {file_path}', lines)
+
+    if not keep_boq:
+        delete_benchmark_boq(boq_doc.name)
+
+    import quantity_survey
+
+    result = {
+        'file_path': file_path,
+        'file_type': file_type,
+        'file_size_mb': round(os.path.getsize(file_path) / (1 << 20), 2),
+        'records': records,
+        'elements': len(elements),
+        'boq_lines': len(lines),
+        'boq': boq_doc.name if keep_boq else None,
+        'version': quantity_survey.__version__,
+        'timestamp': str(now()),
+        'stages': stages,
+        'total_seconds': round(sum(stage['seconds'] for stage in stages), 3)
+    }
+
+    melon.logger().info(f"BIM import benchmark: {result}")
+    return result
+
+
+def run_bim_benchmark_suite(corpus_dir: str, project: str, sizes=None, formats=None,
+        results_path: str = None) -> List[Dict]:
+    """
+    Generate the synthetic corpus (if needed) and benchmark every file in it.
+
+    Each result is appended as one JSON line to results_path (default
+    bim_benchmark_results.jsonl in corpus_dir), so runs from different
+    releases can be compared side by side.
+
+    Run from the console, e.g.
+    pine --site <site> execute quantity_survey.bim.benchmark.run_bim_benchmark_suite --args "['/tmp/bim_corpus', 'PROJ-0001', [1000, 10000]]"
+    """
+    from quantity_survey.bim.benchmark_corpus import (
+        BENCHMARK_FORMATS, BENCHMARK_SIZES, generate_benchmark_corpus
+    )
+
+    corpus = generate_benchmark_corpus(corpus_dir, sizes or BENCHMARK_SIZES, formats or BENCHMARK_FORMATS)
+    results_path = results_path or os.path.join(corpus_dir, 'bim_benchmark_results.jsonl')
+
+    results = []
+    for entry in corpus:
+        result = benchmark_bim_import(entry['file_path'], entry['file_type'], project)
+        results.append(result)
+
+        with open(results_path, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+    return results
+
+
+def parse_bim_file(file_path: str, file_type: str) -> int:
+    """Read a file with its format's parser only; returns the number of records seen"""
+    if file_type == 'ifc':
+        try:
+            import ifcopenshell
+        except ImportError:
+            from quantity_survey.bim.step_reader import iter_step_entities
+            return sum(1 for _entity in iter_step_entities(file_path))
+        return len(ifcopenshell.open(file_path).by_type('IfcRoot'))
+
+    if file_type == 'xml':
+        import xml.etree.ElementTree as ET
+
+        count = 0
+        for _event, elem in ET.iterparse(file_path):
+            count += 1
+            elem.clear()
+        return count
+
+    if file_type == 'dxf':
+        from quantity_survey.bim.dxf_reader import iter_dxf_pairs
+        return sum(1 for _pair in iter_dxf_pairs(file_path))
+
+    if file_type in ('xlsx', 'csv'):
+        from quantity_survey.utils.sheet_import import iter_sheet_chunks
+        return sum(len(chunk) for chunk in iter_sheet_chunks(file_path))
+
+    melon.throw(_('Unsupported file type: {0}').format(file_type))
+
+
+def delete_benchmark_boq(boq_name: str):
+    """Remove a benchmark BoQ and its rows without loading them"""
+    melon.db.delete('BoQ Item', {'parent': boq_name, 'parenttype': 'BoQ'})
+    melon.db.delete('BoQ', boq_name)
+    melon.db.commit()
+
+
+@contextmanager
+def measure_stage(stage: str, stages: List[Dict]):
+    """Record wall time, peak RSS and SQL statement count of the enclosed block"""
+    reset_peak_rss()
+    with count_db_statements() as counter:
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+
+    stages.append({
+        'stage': stage,
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': round(get_peak_rss_mb(), 1),
+        'db_statements': counter['statements']
+    })
+
+
+@contextmanager
+def count_db_statements():
+    """Count calls to melon.db.sql (every query helper goes through it) while the block runs"""
+    db = melon.db
+    counter = {'statements': 0}
+    original_sql = db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter['statements'] += 1
+        return original_sql(*args, **kwargs)
+
+    db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        # Drop the instance attribute so the class method is visible again
+        del db.sql
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS mark for this process (Linux); elsewhere peaks are cumulative"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def get_peak_rss_mb() -> float:
+    """Peak resident set size since the last reset_peak_rss, in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if os.uname().sysname == 'Darwin' else peak / 1024
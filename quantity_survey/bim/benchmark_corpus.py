@@ -0,0 +1,314 @@
+"""
+BIM Benchmark Corpus Module
+Deterministic synthetic models in every import format, for timing the BIM import stages
+"""
+
+import os
+import random
+from typing import Dict, Iterator, List, Tuple
+
+BENCHMARK_SIZES = (1000, 10000, 100000, 1000000)
+
+BENCHMARK_FORMATS = ('ifc', 'xml', 'csv', 'xlsx')
+
+# Element kinds cycled through the model: (IFC entity, XML tag, material)
+BENCHMARK_ELEMENT_KINDS = [
+    ('IFCWALL', 'wall', 'Concrete'),
+    ('IFCWALL', 'wall', 'Brick'),
+    ('IFCSLAB', 'slab', 'Concrete'),
+    ('IFCCOLUMN', 'column', 'Concrete'),
+    ('IFCBEAM', 'beam', 'Steel'),
+    ('IFCDOOR', 'door', 'Wood'),
+    ('IFCWINDOW', 'window', 'Glass'),
+]
+
+# Elements per storey in the generated spatial structure
+ELEMENTS_PER_STOREY = 5000
+
+SHEET_COLUMNS = ['Type', 'Description', 'Material', 'Quantity', 'Length', 'Width', 'Height', 'Area', 'Volume', 'Unit']
+
+
+def generate_benchmark_corpus(output_dir: str, sizes=BENCHMARK_SIZES, formats=BENCHMARK_FORMATS,
+        seed: int = 0) -> List[Dict]:
+    """
+    Write one synthetic model per size and format into output_dir.
+
+    Files are named bim_benchmark_<size>.<format>. Existing files are kept,
+    so the (slow) 1M element models are only written once. The same seed
+    always gives byte-identical files, so timings stay comparable between
+    releases.
+
+    Run from the console, e.g.
+    pine --site <site> execute quantity_survey.bim.benchmark_corpus.generate_benchmark_corpus --args "['/tmp/bim_corpus']"
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    files = []
+    for size in sizes:
+        for file_type in formats:
+            file_path = get_corpus_file_path(output_dir, size, file_type)
+            if not os.path.exists(file_path):
+                write_benchmark_model(file_path, file_type, size, seed)
+            files.append({'file_path': file_path, 'file_type': file_type, 'elements': size})
+
+    return files
+
+
+def get_corpus_file_path(output_dir: str, size: int, file_type: str) -> str:
+    return os.path.join(output_dir, f'bim_benchmark_{size}.{file_type}')
+
+
+def write_benchmark_model(file_path: str, file_type: str, size: int, seed: int = 0):
+    """Write a model of size elements; a partly written file never keeps the final name"""
+    writers = {
+        'ifc': write_ifc_model,
+        'xml': write_xml_model,
+        'csv': write_csv_model,
+        'xlsx': write_xlsx_model
+    }
+    if file_type not in writers:
+        raise ValueError(f'Unsupported benchmark format: {file_type}')
+
+    temp_path = file_path + '.part'
+    try:
+        writers[file_type](temp_path, iter_synthetic_elements(size, seed))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, file_path)
+
+
+def iter_synthetic_elements(size: int, seed: int = 0) -> Iterator[Dict]:
+    """
+    Yield size element specs with dimensions in metres.
+
+    Each spec has kind (index into BENCHMARK_ELEMENT_KINDS), storey,
+    length, width and height. Slabs use length x width as their footprint
+    and height as thickness; doors and windows use height x width.
+    """
+    rng = random.Random(seed)
+
+    for index in range(size):
+        kind = index % len(BENCHMARK_ELEMENT_KINDS)
+        entity_type = BENCHMARK_ELEMENT_KINDS[kind][0]
+
+        if entity_type == 'IFCWALL':
+            dimensions = (rng.uniform(1, 10), rng.choice((0.1, 0.2, 0.3)), rng.uniform(2.4, 4.0))
+        elif entity_type == 'IFCSLAB':
+            dimensions = (rng.uniform(3, 12), rng.uniform(3, 12), rng.choice((0.15, 0.2, 0.25)))
+        elif entity_type in ('IFCCOLUMN', 'IFCBEAM'):
+            dimensions = (rng.uniform(2.5, 9), rng.choice((0.3, 0.4, 0.5)), rng.choice((0.3, 0.4, 0.6)))
+        else:
+            dimensions = (0.0, rng.choice((0.9, 1.2, 1.8)), rng.choice((1.2, 2.1)))
+
+        length, width, height = (round(value, 3) for value in dimensions)
+        yield {
+            'index': index,
+            'kind': kind,
+            'storey': index // ELEMENTS_PER_STOREY,
+            'length': length,
+            'width': width,
+            'height': height
+        }
+
+
+def get_element_quantities(spec: Dict) -> Dict[str, float]:
+    """Take-off quantities of a spec, as a quantity sheet would list them"""
+    entity_type = BENCHMARK_ELEMENT_KINDS[spec['kind']][0]
+    length, width, height = spec['length'], spec['width'], spec['height']
+
+    if entity_type == 'IFCWALL':
+        return {'length': length, 'width': width, 'height': height,
+            'area': round(length * height, 4), 'volume': round(length * width * height, 4)}
+    if entity_type == 'IFCSLAB':
+        return {'length': length, 'width': width, 'height': height,
+            'area': round(length * width, 4), 'volume': round(length * width * height, 4)}
+    if entity_type in ('IFCCOLUMN', 'IFCBEAM'):
+        return {'length': length, 'width': width, 'height': height,
+            'volume': round(length * width * height, 4)}
+    return {'quantity': 1, 'width': width, 'height': height, 'area': round(width * height, 4)}
+
+
+def get_element_unit(spec: Dict) -> str:
+    entity_type = BENCHMARK_ELEMENT_KINDS[spec['kind']][0]
+    if entity_type in ('IFCWALL', 'IFCSLAB'):
+        return 'Sqm'
+    if entity_type in ('IFCCOLUMN', 'IFCBEAM'):
+        return 'Lm'
+    return 'Nos'
+
+
+def write_ifc_model(file_path: str, specs: Iterator[Dict]):
+    """
+    IFC2x3-style STEP file the fallback reader fully understands.
+
+    Every element gets an extruded body: rectangles for walls, slabs, beams
+    and columns, and OverallHeight/OverallWidth for doors and windows.
+    Elements are contained in one storey per ELEMENTS_PER_STOREY and are
+    associated with their material. Lengths are written in millimetres.
+    """
+    with open(file_path, 'w', encoding='ascii', buffering=1 << 20) as f:
+        f.write("ISO-10303-21;\nHEADER;\n"
+            "FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');\n"
+            "FILE_NAME('bim_benchmark.ifc','',(''),(''),'quantity_survey','','');\n"
+            "FILE_SCHEMA(('IFC2X3'));\nENDSEC;\nDATA;\n")
+
+        f.write("#1=IFCSIUNIT(*,.LENGTHUNIT.,.MILLI.,.METRE.);\n"
+            "#2=IFCDIRECTION((0.,0.,1.));\n"
+            "#3=IFCDIRECTION((1.,0.,0.));\n"
+            "#4=IFCCARTESIANPOINT((0.,0.,0.));\n"
+            "#5=IFCAXIS2PLACEMENT3D(#4,#2,#3);\n"
+            "#10=IFCPROJECT('0BenchmarkProject0000',$,'Benchmark',$,$,$,$,$,$);\n"
+            "#11=IFCSITE('0BenchmarkSite00000000',$,'Site',$,$,$,$,$,.ELEMENT.,$,$,$,$,$);\n"
+            "#12=IFCBUILDING('0BenchmarkBuilding0000',$,'Building',$,$,$,$,$,.ELEMENT.,$,$,$);\n"
+            "#13=IFCRELAGGREGATES('0BenchmarkAggregate001',$,$,$,#10,(#11));\n"
+            "#14=IFCRELAGGREGATES('0BenchmarkAggregate002',$,$,$,#11,(#12));\n")
+
+        materials = sorted({kind[2] for kind in BENCHMARK_ELEMENT_KINDS})
+        material_ids = {}
+        next_id = 20
+        for material in materials:
+            material_ids[material] = next_id
+            f.write(f"#{next_id}=IFCMATERIAL('{material}');\n")
+            next_id += 1
+
+        storey_ids: Dict[int, int] = {}
+        storey_members: Dict[int, List[int]] = {}
+        material_members: Dict[str, List[int]] = {material: [] for material in materials}
+        next_id = 100
+
+        for spec in specs:
+            entity_type, _tag, material = BENCHMARK_ELEMENT_KINDS[spec['kind']]
+
+            storey = spec['storey']
+            if storey not in storey_ids:
+                storey_ids[storey] = next_id
+                storey_members[storey] = []
+                f.write(f"#{next_id}=IFCBUILDINGSTOREY('{ifc_guid('S', storey)}',$,'Level {storey:02d}',"
+                    f"$,$,$,$,$,.ELEMENT.,{storey * 3000}.);\n")
+                next_id += 1
+
+            lines, element_id, next_id = get_ifc_element_lines(spec, entity_type, next_id)
+            f.write(''.join(lines))
+            storey_members[storey].append(element_id)
+            material_members[material].append(element_id)
+
+        storey_list = ','.join(f'#{storey_id}' for storey_id in storey_ids.values())
+        f.write(f"#{next_id}=IFCRELAGGREGATES('0BenchmarkAggregate003',$,$,$,#12,({storey_list}));\n")
+        next_id += 1
+
+        for storey, members in storey_members.items():
+            f.write(f"#{next_id}=IFCRELCONTAINEDINSPATIALSTRUCTURE('{ifc_guid('C', storey)}',$,$,$,"
+                f"({format_ifc_refs(members)}),#{storey_ids[storey]});\n")
+            next_id += 1
+
+        for position, material in enumerate(materials):
+            if material_members[material]:
+                f.write(f"#{next_id}=IFCRELASSOCIATESMATERIAL('{ifc_guid('M', position)}',$,$,$,"
+                    f"({format_ifc_refs(material_members[material])}),#{material_ids[material]});\n")
+                next_id += 1
+
+        f.write("ENDSEC;\nEND-ISO-10303-21;\n")
+
+
+def get_ifc_element_lines(spec: Dict, entity_type: str, next_id: int) -> Tuple[List[str], int, int]:
+    """STEP lines for one element and its body; returns (lines, element id, next free id)"""
+    index = spec['index']
+    name = f"{entity_type[3:].title()} {index}"
+    guid = ifc_guid('E', index)
+    length, width, height = (millimetres(spec[key]) for key in ('length', 'width', 'height'))
+
+    if entity_type in ('IFCDOOR', 'IFCWINDOW'):
+        line = (f"#{next_id}={entity_type}('{guid}',$,'{name}',$,$,#5,$,$,{height},{width});\n")
+        return [line], next_id, next_id + 1
+
+    if entity_type == 'IFCWALL':
+        profile, depth = (length, width), height
+    elif entity_type == 'IFCSLAB':
+        profile, depth = (length, width), height
+    else:
+        profile, depth = (width, height), length
+
+    profile_id, solid_id, body_id, shape_id, element_id = range(next_id, next_id + 5)
+    lines = [
+        f"#{profile_id}=IFCRECTANGLEPROFILEDEF(.AREA.,$,$,{profile[0]},{profile[1]});\n",
+        f"#{solid_id}=IFCEXTRUDEDAREASOLID(#{profile_id},#5,#2,{depth});\n",
+        f"#{body_id}=IFCSHAPEREPRESENTATION($,'Body','SweptSolid',(#{solid_id}));\n",
+        f"#{shape_id}=IFCPRODUCTDEFINITIONSHAPE($,$,(#{body_id}));\n",
+    ]
+    if entity_type == 'IFCSLAB':
+        lines.append(f"#{element_id}={entity_type}('{guid}',$,'{name}',$,$,#5,#{shape_id},$,.FLOOR.);\n")
+    else:
+        lines.append(f"#{element_id}={entity_type}('{guid}',$,'{name}',$,$,#5,#{shape_id},$);\n")
+
+    return lines, element_id, element_id + 1
+
+
+def write_xml_model(file_path: str, specs: Iterator[Dict]):
+    """Building-layout XML: one element per spec, quantities as attributes"""
+    with open(file_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<project name="Benchmark">\n')
+
+        for spec in specs:
+            _entity_type, tag, material = BENCHMARK_ELEMENT_KINDS[spec['kind']]
+            attributes = ' '.join(f'{field}="{value}"' for field, value in get_element_quantities(spec).items())
+            f.write(f'  <{tag} id="{tag}_{spec["index"]}" name="{tag.title()} {spec["index"]}" '
+                f'material="{material}" storey="Level {spec["storey"]:02d}" {attributes}/>\n')
+
+        f.write('</project>\n')
+
+
+def write_csv_model(file_path: str, specs: Iterator[Dict]):
+    """Quantity sheet with the SHEET_COLUMNS header"""
+    import csv
+
+    with open(file_path, 'w', encoding='utf-8', newline='', buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(SHEET_COLUMNS)
+        writer.writerows(iter_sheet_rows(specs))
+
+
+def write_xlsx_model(file_path: str, specs: Iterator[Dict]):
+    """Same rows as the CSV sheet, written with openpyxl's streaming writer"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Quantities')
+    sheet.append(SHEET_COLUMNS)
+    for row in iter_sheet_rows(specs):
+        sheet.append(row)
+
+    with open(file_path, 'wb') as f:
+        workbook.save(f)
+
+
+def iter_sheet_rows(specs: Iterator[Dict]) -> Iterator[list]:
+    for spec in specs:
+        entity_type, tag, material = BENCHMARK_ELEMENT_KINDS[spec['kind']]
+        quantities = get_element_quantities(spec)
+        yield [
+            entity_type,
+            f"{tag.title()} {spec['index']}",
+            material,
+            quantities.get('quantity', ''),
+            quantities.get('length', ''),
+            quantities.get('width', ''),
+            quantities.get('height', ''),
+            quantities.get('area', ''),
+            quantities.get('volume', ''),
+            get_element_unit(spec)
+        ]
+
+
+def ifc_guid(prefix: str, number: int) -> str:
+    """22 character GlobalId-shaped identifier"""
+    return f'{prefix}{number:021d}'
+
+
+def format_ifc_refs(entity_ids: List[int]) -> str:
+    return ','.join(f'#{entity_id}' for entity_id in entity_ids)
+
+
+def millimetres(metres: float) -> str:
+    return f'{round(metres * 1000)}.'
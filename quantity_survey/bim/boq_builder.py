@@ -0,0 +1,158 @@
+"""
+BoQ Builder Module
+Bulk materialisation of BoQ documents from large BIM imports
+"""
+
+import melon
+from melon.utils import flt, now
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+# Child rows written (and committed) per batch
+BOQ_INSERT_CHUNK_SIZE = 5000
+
+BOQ_ITEM_LINE_FIELDS = [
+    'item_code', 'item_name', 'description', 'uom', 'quantity',
+    'bim_element_id', 'bim_element_type', 'location_path', 'additional_quantities', 'bim_properties', 'bim_hash',
+    'bim_element_count', 'bim_element_ids'
+]
+
+BOQ_ITEM_INSERT_FIELDS = [
+    'name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus',
+    'parent', 'parenttype', 'parentfield', 'idx'
+] + BOQ_ITEM_LINE_FIELDS + ['rate', 'amount']
+
+
+def create_boq_bulk(project: str, title: str, description: str, lines: List[Dict],
+        chunk_size: int = BOQ_INSERT_CHUNK_SIZE, aggregation: str = None):
+    """
+    Create a draft BoQ and write its lines with batched multi-row inserts.
+
+    Each line is a dict with the BOQ_ITEM_LINE_FIELDS keys. Rates are taken
+    from Item.standard_rate in a single query. The header is inserted first
+    with no rows and committed together with the first batch; its totals are
+    kept in step with every committed batch, so a partially written BoQ is
+    still internally consistent.
+    """
+    boq_doc = create_boq_header(project, title, description, aggregation)
+
+    total_quantity, total_amount = append_boq_items(boq_doc.name, lines, chunk_size=chunk_size)
+
+    boq_doc.total_quantity = total_quantity
+    boq_doc.total_amount = total_amount
+    return boq_doc
+
+
+def create_boq_header(project: str, title: str, description: str, aggregation: str = None):
+    """Insert an empty draft BoQ (not committed)"""
+    boq_doc = melon.new_doc('BoQ')
+    boq_doc.project = project
+    boq_doc.title = title
+    boq_doc.description = description
+    boq_doc.status = 'Draft'
+    boq_doc.bim_aggregation = aggregation
+
+    # BoQ Items are mandatory, but the rows are bulk-inserted after the header
+    boq_doc.flags.ignore_mandatory = True
+    boq_doc.insert()
+    return boq_doc
+
+
+def append_boq_items(boq_name: str, lines: List[Dict], start_idx: int = 0,
+        chunk_size: int = BOQ_INSERT_CHUNK_SIZE, commit: bool = True) -> Tuple[float, float]:
+    """
+    Append lines to an existing BoQ in batches.
+
+    Returns the (quantity, amount) totals added to the header.
+    """
+    if not lines:
+        return 0.0, 0.0
+
+    rates = get_standard_rates({line['item_code'] for line in lines})
+
+    quantities = np.fromiter((flt(line['quantity']) for line in lines), dtype=float, count=len(lines))
+    rate_column = np.fromiter((rates.get(line['item_code'], 0.0) for line in lines), dtype=float, count=len(lines))
+    amounts = quantities * rate_column
+
+    # Same rule as BoQ.calculate_totals: only priced lines count towards total quantity
+    priced = (quantities != 0) & (rate_column != 0)
+
+    total_quantity = 0.0
+    total_amount = 0.0
+
+    for start in range(0, len(lines), chunk_size):
+        stop = min(start + chunk_size, len(lines))
+
+        insert_boq_item_rows(boq_name, lines[start:stop], rate_column[start:stop],
+            amounts[start:stop], start_idx + start)
+
+        chunk_quantity = float(quantities[start:stop][priced[start:stop]].sum())
+        chunk_amount = float(amounts[start:stop].sum())
+        increment_boq_totals(boq_name, chunk_quantity, chunk_amount)
+
+        total_quantity += chunk_quantity
+        total_amount += chunk_amount
+
+        if commit:
+            melon.db.commit()
+
+    return total_quantity, total_amount
+
+
+def insert_boq_item_rows(boq_name: str, lines: List[Dict], rates: Iterable[float],
+        amounts: Iterable[float], start_idx: int):
+    """Write one batch of BoQ Item rows with a single multi-row INSERT"""
+    timestamp = now()
+    user = melon.session.user
+
+    values = []
+    for offset, (line, rate, amount) in enumerate(zip(lines, rates, amounts)):
+        values.append(
+            (melon.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+             boq_name, 'BoQ', 'boq_items', start_idx + offset + 1)
+            + tuple(line.get(field) for field in BOQ_ITEM_LINE_FIELDS)
+            + (float(rate), float(amount))
+        )
+
+    melon.db.bulk_insert('BoQ Item', fields=BOQ_ITEM_INSERT_FIELDS, values=values)
+
+
+def increment_boq_totals(boq_name: str, quantity: float, amount: float):
+    """Add a batch's totals to the BoQ header"""
+    melon.db.sql("""
+        UPDATE `tabBoQ`
+        SET total_quantity = COALESCE(total_quantity, 0) + %s,
+            total_amount = COALESCE(total_amount, 0) + %s
+        WHERE name = %s
+    """, (quantity, amount, boq_name))
+
+
+def refresh_boq_totals(boq_name: str):
+    """Recompute BoQ header totals from its rows in one statement"""
+    melon.db.sql("""
+        UPDATE `tabBoQ` boq
+        SET boq.total_quantity = (
+                SELECT COALESCE(SUM(CASE WHEN item.quantity != 0 AND item.rate != 0 THEN item.quantity ELSE 0 END), 0)
+                FROM `tabBoQ Item` item
+                WHERE item.parent = boq.name AND item.parenttype = 'BoQ'
+            ),
+            boq.total_amount = (
+                SELECT COALESCE(SUM(item.amount), 0)
+                FROM `tabBoQ Item` item
+                WHERE item.parent = boq.name AND item.parenttype = 'BoQ'
+            )
+        WHERE boq.name = %s
+    """, (boq_name,))
+
+
+def get_standard_rates(item_codes: Iterable[str]) -> Dict[str, float]:
+    """Fetch Item.standard_rate for many items in one query"""
+    item_codes = list(item_codes)
+    if not item_codes:
+        return {}
+
+    rows = melon.db.get_all('Item',
+        filters={'name': ['in', item_codes]},
+        fields=['name', 'standard_rate']
+    )
+    return {row.name: flt(row.standard_rate) for row in rows}
@@ -0,0 +1,385 @@
+"""
+DXF Reader Module
+Streaming quantity take-off from ASCII DXF drawings
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Tuple
+import math
+import numpy as np
+
+# $INSUNITS code -> metres per drawing unit
+INSUNITS_TO_METRES = {
+    1: 0.0254,      # inches
+    2: 0.3048,      # feet
+    4: 0.001,       # millimetres
+    5: 0.01,        # centimetres
+    6: 1.0,         # metres
+    7: 1000.0,      # kilometres
+    10: 0.9144,     # yards
+}
+
+# Vertices buffered before a vectorised geometry pass
+GEOMETRY_BATCH_VERTICES = 500000
+
+# Loop kinds accumulated per layer
+KIND_OPEN = 0       # polyline/line: length only
+KIND_CLOSED = 1     # closed polyline: area
+KIND_HATCH = 2      # hatch boundary loop: signed area
+
+HATCH_EXTERNAL_FLAGS = 0x01 | 0x10
+
+
+def iter_dxf_pairs(file_path: str) -> Iterator[Tuple[int, str]]:
+    """Yield (group_code, value) pairs from an ASCII DXF file, line by line"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for code_line in f:
+            value_line = f.readline()
+            try:
+                code = int(code_line)
+            except ValueError:
+                continue
+            yield code, value_line.strip()
+
+
+class DXFTakeoff:
+    """
+    Per-layer quantities accumulated while streaming a drawing.
+
+    Only the ENTITIES section is read, so block definitions are counted
+    through their INSERTs rather than measured. Polyline bulges are taken
+    as straight segments.
+    """
+
+    def __init__(self):
+        self.unit_scale = 1.0
+        self.layers: Dict[str, int] = {}
+        self.layer_names: List[str] = []
+        self.lengths: List[float] = []
+        self.areas: List[float] = []
+        self.hatch_areas: List[float] = []
+        self.open_counts: List[int] = []
+        self.closed_counts: List[int] = []
+        self.hatch_counts: List[int] = []
+        self.inserts: Dict[Tuple[str, str], int] = {}
+
+        self.reset_buffers()
+
+    def reset_buffers(self):
+        """Start empty vertex buffers; one loop id per vertex"""
+        # New arrays rather than truncation: NumPy views may still hold the old ones
+        self.xs = array('d')
+        self.ys = array('d')
+        self.loop_ids = array('l')
+        self.loop_layers = array('l')
+        self.loop_kinds = array('b')
+        self.loop_signs = array('b')
+
+    def layer_id(self, layer: str) -> int:
+        layer_id = self.layers.get(layer)
+        if layer_id is None:
+            layer_id = len(self.layer_names)
+            self.layers[layer] = layer_id
+            self.layer_names.append(layer)
+            for column in (self.lengths, self.areas, self.hatch_areas):
+                column.append(0.0)
+            for column in (self.open_counts, self.closed_counts, self.hatch_counts):
+                column.append(0)
+        return layer_id
+
+    def add_loop(self, layer: str, xs: List[float], ys: List[float], kind: int, sign: int = 1):
+        """Queue one vertex loop for the next geometry pass"""
+        count = min(len(xs), len(ys))
+        if count < 2:
+            return
+        xs, ys = xs[:count], ys[:count]
+
+        layer_id = self.layer_id(layer)
+        loop_id = len(self.loop_kinds)
+
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.loop_ids.extend([loop_id] * len(xs))
+        self.loop_layers.append(layer_id)
+        self.loop_kinds.append(kind)
+        self.loop_signs.append(sign)
+
+        if kind == KIND_OPEN:
+            self.open_counts[layer_id] += 1
+        elif kind == KIND_CLOSED:
+            self.closed_counts[layer_id] += 1
+
+        if len(self.xs) >= GEOMETRY_BATCH_VERTICES:
+            self.flush()
+
+    def add_insert(self, layer: str, block: str):
+        self.layer_id(layer)
+        key = (layer, block)
+        self.inserts[key] = self.inserts.get(key, 0) + 1
+
+    def add_hatch(self, layer: str):
+        self.hatch_counts[self.layer_id(layer)] += 1
+
+    def flush(self):
+        """Measure every buffered loop with one set of array operations"""
+        if not self.loop_kinds:
+            return
+
+        x = np.frombuffer(self.xs, dtype=np.float64)
+        y = np.frombuffer(self.ys, dtype=np.float64)
+        loop = np.frombuffer(self.loop_ids, dtype=self.loop_ids.typecode)
+        layers = np.frombuffer(self.loop_layers, dtype=self.loop_layers.typecode)
+        kinds = np.frombuffer(self.loop_kinds, dtype=np.int8)
+        signs = np.frombuffer(self.loop_signs, dtype=np.int8).astype(np.float64)
+        loop_count = len(kinds)
+
+        # Segments between consecutive vertices of the same loop
+        same_loop = loop[1:] == loop[:-1]
+        segment_lengths = np.hypot(np.diff(x), np.diff(y)) * same_loop
+        cross = (x[:-1] * y[1:] - x[1:] * y[:-1]) * same_loop
+
+        lengths = np.bincount(loop[:-1], weights=segment_lengths, minlength=loop_count)
+        twice_areas = np.bincount(loop[:-1], weights=cross, minlength=loop_count)
+
+        # Closing segment from each loop's last vertex back to its first
+        starts = np.flatnonzero(np.r_[True, ~same_loop])
+        ends = np.r_[starts[1:] - 1, len(x) - 1]
+        closed = kinds != KIND_OPEN
+        lengths += np.hypot(x[starts] - x[ends], y[starts] - y[ends]) * closed
+        twice_areas += (x[ends] * y[starts] - x[starts] * y[ends]) * closed
+
+        loop_areas = np.abs(twice_areas) / 2.0
+        scale = self.unit_scale
+        layer_count = len(self.layer_names)
+
+        layer_lengths = np.bincount(layers, weights=lengths * (kinds == KIND_OPEN), minlength=layer_count)
+        layer_areas = np.bincount(layers, weights=loop_areas * (kinds == KIND_CLOSED), minlength=layer_count)
+        layer_hatch = np.bincount(layers, weights=loop_areas * signs * (kinds == KIND_HATCH), minlength=layer_count)
+
+        for layer_id in range(layer_count):
+            self.lengths[layer_id] += float(layer_lengths[layer_id]) * scale
+            self.areas[layer_id] += float(layer_areas[layer_id]) * scale * scale
+            self.hatch_areas[layer_id] += float(layer_hatch[layer_id]) * scale * scale
+
+        self.reset_buffers()
+
+    def to_elements(self) -> List[Dict]:
+        """Aggregate per-layer totals into importer element dicts"""
+        self.flush()
+        elements = []
+
+        for layer_id, layer in enumerate(self.layer_names):
+            if self.lengths[layer_id] and self.open_counts[layer_id]:
+                elements.append(make_element(f'dxf:{layer}:length', 'DXF_LINEAR', f'{layer} - Linear',
+                    {'length': round(self.lengths[layer_id], 4), 'unit': 'Lm'},
+                    {'layer': layer, 'entity_count': self.open_counts[layer_id]}))
+
+            if self.areas[layer_id]:
+                elements.append(make_element(f'dxf:{layer}:area', 'DXF_AREA', f'{layer} - Area',
+                    {'area': round(self.areas[layer_id], 4), 'unit': 'Sqm'},
+                    {'layer': layer, 'entity_count': self.closed_counts[layer_id]}))
+
+            if self.hatch_areas[layer_id] > 0:
+                elements.append(make_element(f'dxf:{layer}:hatch', 'DXF_HATCH', f'{layer} - Hatch',
+                    {'area': round(self.hatch_areas[layer_id], 4), 'unit': 'Sqm'},
+                    {'layer': layer, 'entity_count': self.hatch_counts[layer_id]}))
+
+        for (layer, block), count in sorted(self.inserts.items()):
+            elements.append(make_element(f'dxf:{layer}:block:{block}', 'DXF_BLOCK', f'{block} ({layer})',
+                {'quantity': count, 'unit': 'Nos'},
+                {'layer': layer, 'block': block}))
+
+        return elements
+
+
+def make_element(element_id: str, element_type: str, name: str, quantities: Dict, properties: Dict) -> Dict:
+    return {
+        'element_id': element_id,
+        'element_type': element_type,
+        'name': name,
+        'material': '',
+        'quantities': quantities,
+        'properties': properties
+    }
+
+
+def extract_dxf_elements(file_path: str) -> List[Dict]:
+    """Stream a DXF file and return one element per layer quantity"""
+    takeoff = DXFTakeoff()
+    section = None
+    header_variable = None
+    entity = None
+
+    for code, value in iter_dxf_pairs(file_path):
+        if code == 0:
+            previous = finish_entity(takeoff, entity) if entity is not None else None
+            entity = None
+
+            if value == 'SECTION':
+                section = ''
+            elif value == 'ENDSEC':
+                section = None
+            elif section == 'ENTITIES':
+                entity = start_entity(value, previous)
+            continue
+
+        if section == '' and code == 2:
+            section = value
+
+        elif section == 'HEADER':
+            if code == 9:
+                header_variable = value
+            elif header_variable == '$INSUNITS' and code == 70:
+                takeoff.unit_scale = INSUNITS_TO_METRES.get(int(value), 1.0)
+
+        elif entity is not None:
+            read_entity_pair(entity, code, value)
+
+    if entity is not None:
+        finish_entity(takeoff, entity)
+
+    return takeoff.to_elements()
+
+
+def start_entity(entity_type: str, previous) -> Dict:
+    """New entity state; VERTEX/SEQEND continue the open POLYLINE"""
+    if entity_type in ('VERTEX', 'SEQEND') and previous is not None and previous.get('polyline'):
+        polyline = previous['polyline']
+        return {'type': entity_type, 'layer': polyline['layer'], 'polyline': polyline, 'xs': [], 'ys': []}
+
+    return {'type': entity_type, 'layer': '0', 'flags': 0, 'xs': [], 'ys': [], 'x2': None, 'y2': None,
+            'block': '', 'loops': [], 'in_boundary': False, 'loop': None, 'edge': None}
+
+
+def read_entity_pair(entity: Dict, code: int, value: str):
+    """Fold one group code into the current entity"""
+    entity_type = entity['type']
+
+    if code == 8 and entity_type != 'VERTEX':
+        entity['layer'] = value
+        return
+
+    if entity_type in ('LWPOLYLINE', 'VERTEX'):
+        if code == 10:
+            entity['xs'].append(float(value))
+        elif code == 20:
+            entity['ys'].append(float(value))
+        elif code == 70:
+            entity['flags'] = int(value)
+
+    elif entity_type == 'POLYLINE':
+        if code == 70:
+            entity['flags'] = int(value)
+
+    elif entity_type == 'LINE':
+        if code == 10:
+            entity['xs'].append(float(value))
+        elif code == 20:
+            entity['ys'].append(float(value))
+        elif code == 11:
+            entity['x2'] = float(value)
+        elif code == 21:
+            entity['y2'] = float(value)
+
+    elif entity_type == 'INSERT':
+        if code == 2:
+            entity['block'] = value
+
+    elif entity_type == 'HATCH':
+        read_hatch_pair(entity, code, value)
+
+
+def read_hatch_pair(entity: Dict, code: int, value: str):
+    """Collect hatch boundary loops; seed and elevation points are ignored"""
+    if code == 91:
+        entity['in_boundary'] = True
+        return
+    if not entity['in_boundary']:
+        return
+    if code == 75:
+        # Hatch style follows the last boundary path
+        entity['in_boundary'] = False
+        return
+
+    if code == 92:
+        entity['loop'] = {'flags': int(value), 'xs': [], 'ys': []}
+        entity['loops'].append(entity['loop'])
+        entity['edge'] = None
+        return
+
+    loop = entity['loop']
+    if loop is None:
+        return
+
+    if loop['flags'] & 0x02:
+        # Polyline boundary: plain vertex list
+        if code == 10:
+            loop['xs'].append(float(value))
+        elif code == 20:
+            loop['ys'].append(float(value))
+        return
+
+    # Edge boundary: use each edge's start point as a polygon vertex
+    if code == 72:
+        entity['edge'] = {'type': int(value)}
+    elif entity['edge'] is not None:
+        edge = entity['edge']
+        edge[code] = float(value)
+        if edge['type'] == 1 and code == 20:
+            loop['xs'].append(edge[10])
+            loop['ys'].append(edge[20])
+        elif edge['type'] == 2 and code == 51:
+            # Arc: start and end points on the chord
+            cx, cy, radius = edge.get(10, 0.0), edge.get(20, 0.0), edge.get(40, 0.0)
+            for angle in (edge.get(50, 0.0), edge[51]):
+                loop['xs'].append(cx + radius * math.cos(math.radians(angle)))
+                loop['ys'].append(cy + radius * math.sin(math.radians(angle)))
+
+
+def finish_entity(takeoff: DXFTakeoff, entity: Dict):
+    """Record a completed entity; returns state to carry into the next one"""
+    entity_type = entity['type']
+
+    if entity_type == 'LWPOLYLINE':
+        takeoff.add_loop(entity['layer'], entity['xs'], entity['ys'],
+            KIND_CLOSED if entity['flags'] & 1 else KIND_OPEN)
+
+    elif entity_type == 'LINE':
+        if entity['xs'] and entity['ys'] and entity['x2'] is not None and entity['y2'] is not None:
+            takeoff.add_loop(entity['layer'], [entity['xs'][0], entity['x2']],
+                [entity['ys'][0], entity['y2']], KIND_OPEN)
+
+    elif entity_type == 'POLYLINE':
+        # Polyface meshes (64) and 3D meshes (16) are not measured
+        if not entity['flags'] & (16 | 64):
+            entity['polyline'] = {'layer': entity['layer'], 'flags': entity['flags'], 'xs': [], 'ys': []}
+            return entity
+
+    elif entity_type == 'VERTEX':
+        polyline = entity['polyline']
+        # Skip spline control points
+        if not entity.get('flags', 0) & 16:
+            polyline['xs'].extend(entity['xs'][:1])
+            polyline['ys'].extend(entity['ys'][:1])
+        return entity
+
+    elif entity_type == 'SEQEND':
+        polyline = entity['polyline']
+        takeoff.add_loop(polyline['layer'], polyline['xs'], polyline['ys'],
+            KIND_CLOSED if polyline['flags'] & 1 else KIND_OPEN)
+
+    elif entity_type == 'INSERT':
+        if entity['block']:
+            takeoff.add_insert(entity['layer'], entity['block'])
+
+    elif entity_type == 'HATCH':
+        loops = [loop for loop in entity['loops'] if len(loop['xs']) >= 3]
+        if loops:
+            takeoff.add_hatch(entity['layer'])
+            has_external = any(loop['flags'] & HATCH_EXTERNAL_FLAGS for loop in loops)
+            for loop in loops:
+                # Without external/outermost flags every loop is an island
+                sign = 1 if not has_external or loop['flags'] & HATCH_EXTERNAL_FLAGS else -1
+                takeoff.add_loop(entity['layer'], loop['xs'], loop['ys'], KIND_HATCH, sign)
+
+    return None
@@ -0,0 +1,232 @@
+"""
+Element Batch Module
+Columnar representation of parsed BIM elements with vectorised quantity rules
+"""
+
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+# Quantity keys held as float columns (NaN where an element has no value)
+QUANTITY_COLUMNS = ('quantity', 'length', 'area', 'volume', 'height', 'width', 'thickness', 'cross_section_area')
+
+# IFC property names read by the element type formulas
+IFC_QUANTITY_PROPERTIES = (
+    'Length', 'NetSideArea', 'Height', 'Width', 'Thickness', 'GrossArea', 'NetArea',
+    'Depth', 'CrossSectionArea', 'OverallHeight', 'OverallWidth'
+)
+
+# Base element types (upper case) and their primary quantity priority; the first present value wins
+PRIMARY_QUANTITY_RULES = [
+    ({'IFCWALL'}, ('area', 'length', 'quantity'), 0.0),
+    ({'IFCSLAB', 'IFCROOF'}, ('area', 'volume', 'quantity'), 0.0),
+    ({'IFCBEAM', 'IFCCOLUMN'}, ('length', 'volume', 'quantity'), 0.0),
+    ({'IFCDOOR', 'IFCWINDOW'}, ('quantity', 'area'), 1.0),
+]
+
+# Fallback priority for other types; the first non-zero value wins
+DEFAULT_PRIMARY_QUANTITY_ORDER = ('quantity', 'area', 'volume', 'length')
+
+# IFC2x3/IFC4 subtypes (e.g. IfcBeamStandardCase) measured like their base type
+BASE_TYPE_SUFFIXES = ('STANDARDCASE', 'ELEMENTEDCASE')
+
+
+class ElementBatch:
+    """
+    Column-per-field view over a list of elements.
+
+    Element types are stored once in type_names and referenced by integer
+    code; numeric quantities live in float arrays keyed by QUANTITY_COLUMNS.
+    The per-type rules then run once per type group instead of once per
+    element.
+    """
+
+    __slots__ = ('type_codes', 'type_names', 'columns')
+
+    def __init__(self, type_codes: np.ndarray, type_names: List[str], columns: Dict[str, np.ndarray]):
+        self.type_codes = type_codes
+        self.type_names = type_names
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    @classmethod
+    def from_elements(cls, elements: List[Dict]) -> 'ElementBatch':
+        """Build the columns from element dicts in one pass per column"""
+        size = len(elements)
+        type_codes, type_names = encode_types(element['element_type'] for element in elements)
+
+        quantities = [element['quantities'] for element in elements]
+        columns = {
+            field: np.fromiter((to_float(q.get(field)) for q in quantities), dtype=float, count=size)
+            for field in QUANTITY_COLUMNS
+        }
+
+        return cls(type_codes, type_names, columns)
+
+    @classmethod
+    def from_ifc_properties(cls, element_types: List[str], properties: List[Dict]) -> 'ElementBatch':
+        """Derive standard quantities from IFC quantity-set values for many elements"""
+        size = len(element_types)
+        type_codes, type_names = encode_types(element_types)
+
+        props = {
+            name: np.fromiter((to_float(p.get(name)) for p in properties), dtype=float, count=size)
+            for name in IFC_QUANTITY_PROPERTIES
+        }
+
+        return cls(type_codes, type_names, derive_ifc_quantities(type_codes, type_names, props))
+
+    def type_mask(self, element_types: Iterable[str], base: bool = False) -> np.ndarray:
+        """Rows whose element type (or with base, its base type) is one of element_types"""
+        element_types = set(element_types)
+        codes = [
+            code for code, name in enumerate(self.type_names)
+            if (get_base_element_type(name) if base else name) in element_types
+        ]
+        return np.isin(self.type_codes, codes)
+
+    def primary_quantities(self) -> np.ndarray:
+        """Vectorised calculate_primary_quantity for every row"""
+        result = np.full(len(self), np.nan)
+        unassigned = np.ones(len(self), dtype=bool)
+
+        for element_types, order, default in PRIMARY_QUANTITY_RULES:
+            rows = self.type_mask(element_types, base=True)
+            result[rows] = first_present(self.columns, order, rows, default)
+            unassigned &= ~rows
+
+        # Remaining types skip zeros as well as missing values
+        values = np.full(len(self), 1.0)
+        for field in reversed(DEFAULT_PRIMARY_QUANTITY_ORDER):
+            column = self.columns[field]
+            values = np.where(np.nan_to_num(column) != 0, column, values)
+        result[unassigned] = values[unassigned]
+
+        return result
+
+    def quantity_dicts(self) -> List[Dict]:
+        """Per-row quantity dicts holding only the values that are set"""
+        present = {field: ~np.isnan(column) for field, column in self.columns.items()}
+        values = {field: column.tolist() for field, column in self.columns.items()}
+
+        return [
+            {field: values[field][row] for field in QUANTITY_COLUMNS if present[field][row]}
+            for row in range(len(self))
+        ]
+
+
+def derive_ifc_quantities(type_codes: np.ndarray, type_names: List[str], props: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Vectorised calculate_element_quantities.
+
+    props maps IFC property name -> float column (NaN when absent). Missing
+    and zero values are treated alike, as the scalar rules' `or` chains do.
+    """
+    size = len(type_codes)
+    p = {name: np.nan_to_num(column) for name, column in props.items()}
+    out = {field: np.full(size, np.nan) for field in QUANTITY_COLUMNS}
+
+    def rows_of(*names):
+        names = {name.upper() for name in names}
+        return np.isin(type_codes, [
+            code for code, name in enumerate(type_names) if get_base_element_type(name) in names
+        ])
+
+    def set_where(field, mask, values):
+        out[field] = np.where(mask, values, out[field])
+
+    def either(first, second):
+        return np.where(first != 0, first, second)
+
+    # Walls: area from length x height, volume when a width is known
+    walls = rows_of('IfcWall')
+    divisor = np.where(np.isnan(props['Height']), 1.0, p['Height'])
+    side_length = np.divide(p['NetSideArea'], divisor, out=np.zeros(size), where=divisor != 0)
+    length = either(p['Length'], side_length)
+    height = p['Height']
+    width = either(p['Width'], p['Thickness'])
+    measured = walls & (length != 0) & (height != 0)
+    set_where('area', measured, length * height)
+    set_where('length', measured, length)
+    set_where('height', measured, height)
+    set_where('volume', measured & (width != 0), length * height * width)
+    set_where('width', measured & (width != 0), width)
+
+    # Slabs and roofs: area, volume when a thickness is known
+    slabs = rows_of('IfcSlab', 'IfcRoof')
+    area = either(p['GrossArea'], p['NetArea'])
+    thickness = either(p['Thickness'], p['Depth'])
+    measured = slabs & (area != 0)
+    set_where('area', measured, area)
+    set_where('volume', measured & (thickness != 0), area * thickness)
+    set_where('thickness', measured & (thickness != 0), thickness)
+
+    # Beams: length, volume from the cross section
+    cross_section = p['CrossSectionArea']
+    measured = rows_of('IfcBeam') & (p['Length'] != 0)
+    set_where('length', measured, p['Length'])
+    set_where('volume', measured & (cross_section != 0), p['Length'] * cross_section)
+    set_where('cross_section_area', measured & (cross_section != 0), cross_section)
+
+    # Columns: height doubles as length
+    column_height = either(p['Height'], p['Length'])
+    measured = rows_of('IfcColumn') & (column_height != 0)
+    set_where('height', measured, column_height)
+    set_where('length', measured, column_height)
+    set_where('volume', measured & (cross_section != 0), column_height * cross_section)
+    set_where('cross_section_area', measured & (cross_section != 0), cross_section)
+
+    # Doors and windows: opening area and a count of one
+    opening_height = either(p['OverallHeight'], p['Height'])
+    opening_width = either(p['OverallWidth'], p['Width'])
+    measured = rows_of('IfcDoor', 'IfcWindow') & (opening_height != 0) & (opening_width != 0)
+    set_where('area', measured, opening_height * opening_width)
+    set_where('height', measured, opening_height)
+    set_where('width', measured, opening_width)
+    set_where('quantity', measured, 1.0)
+
+    return out
+
+
+def primary_quantity_field(element_type: str, quantities: Dict) -> Optional[str]:
+    """Key that calculate_primary_quantity takes its value from, or None for its default"""
+    element_type = get_base_element_type(element_type)
+
+    for element_types, order, default in PRIMARY_QUANTITY_RULES:
+        if element_type in element_types:
+            return next((field for field in order if field in quantities), None)
+
+    return next((field for field in DEFAULT_PRIMARY_QUANTITY_ORDER if quantities.get(field)), None)
+
+
+def get_base_element_type(element_type: str) -> str:
+    """Upper-case element type with a StandardCase/ElementedCase suffix removed"""
+    element_type = element_type.upper()
+    for suffix in BASE_TYPE_SUFFIXES:
+        if element_type.endswith(suffix):
+            return element_type[:-len(suffix)]
+    return element_type
+
+
+def first_present(columns: Dict[str, np.ndarray], order, rows: np.ndarray, default: float) -> np.ndarray:
+    """For the selected rows, the first column in order that has a value"""
+    values = np.full(int(rows.sum()), default)
+    for field in reversed(order):
+        column = columns[field][rows]
+        values = np.where(np.isnan(column), values, column)
+    return values
+
+
+def encode_types(element_types: Iterable[str]):
+    """Integer codes per element plus the list of distinct type names"""
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(name, len(index)) for name in element_types), dtype=np.int32)
+    return codes, list(index)
+
+
+def to_float(value) -> float:
+    """Numeric value as float, anything else as NaN"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
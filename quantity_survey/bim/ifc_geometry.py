@@ -0,0 +1,413 @@
+"""
+IFC Geometry Module
+Quantities from extruded solids for the fallback (IfcOpenShell-free) IFC parser
+"""
+
+from array import array
+from typing import Dict, List, Optional, Tuple
+import math
+import re
+import numpy as np
+
+from quantity_survey.bim.element_batch import primary_quantity_field
+from quantity_survey.bim.step_reader import parse_step_arguments
+
+# Entities kept from the STEP pass to resolve element body geometry
+GEOMETRY_ENTITY_TYPES = {
+    'IFCPRODUCTDEFINITIONSHAPE', 'IFCSHAPEREPRESENTATION', 'IFCMAPPEDITEM', 'IFCREPRESENTATIONMAP',
+    'IFCBOOLEANRESULT', 'IFCBOOLEANCLIPPINGRESULT', 'IFCEXTRUDEDAREASOLID', 'IFCDIRECTION',
+    'IFCRECTANGLEPROFILEDEF', 'IFCCIRCLEPROFILEDEF',
+    'IFCARBITRARYCLOSEDPROFILEDEF', 'IFCARBITRARYPROFILEDEFWITHVOIDS',
+    'IFCPOLYLINE', 'IFCINDEXEDPOLYCURVE', 'IFCCARTESIANPOINTLIST2D',
+    'IFCCARTESIANPOINT', 'IFCSIUNIT'
+}
+
+# Type of each collected entity is stored as its position in this list
+GEOMETRY_TYPES = sorted(GEOMETRY_ENTITY_TYPES)
+GEOMETRY_TYPE_CODES = {entity_type: code for code, entity_type in enumerate(GEOMETRY_TYPES)}
+
+SI_PREFIX_SCALE = {
+    None: 1.0, 'KILO': 1e3, 'HECTO': 1e2, 'DECA': 1e1,
+    'DECI': 1e-1, 'CENTI': 1e-2, 'MILLI': 1e-3, 'MICRO': 1e-6
+}
+
+# Element type groups, by how their body is usually modelled
+FOOTPRINT_WALL_TYPES = {'IFCWALL', 'IFCWALLSTANDARDCASE', 'IFCWALLELEMENTEDCASE', 'IFCCURTAINWALL'}
+FOOTPRINT_SLAB_TYPES = {
+    'IFCSLAB', 'IFCSLABSTANDARDCASE', 'IFCSLABELEMENTEDCASE', 'IFCROOF', 'IFCCOVERING',
+    'IFCPLATE', 'IFCPLATESTANDARDCASE', 'IFCFOOTING'
+}
+SECTION_EXTRUDED_TYPES = {
+    'IFCBEAM', 'IFCBEAMSTANDARDCASE', 'IFCCOLUMN', 'IFCCOLUMNSTANDARDCASE',
+    'IFCMEMBER', 'IFCMEMBERSTANDARDCASE', 'IFCPILE'
+}
+OPENING_TYPES = {'IFCDOOR', 'IFCDOORSTANDARDCASE', 'IFCWINDOW', 'IFCWINDOWSTANDARDCASE'}
+
+QUANTITY_UNITS = {'quantity': 'Nos', 'length': 'Lm', 'area': 'Sqm', 'volume': 'Cum'}
+
+# Profile kinds
+PROFILE_RECTANGLE = 0
+PROFILE_CIRCLE = 1
+PROFILE_POLYGON = 2
+
+# Mapped items and boolean results nest; deeper chains are ignored
+MAX_ITEM_DEPTH = 8
+
+NUMBER_PATTERN = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+class ExtrusionGeometry:
+    """
+    Body geometry entities located while streaming an IFC file.
+
+    Only the id, type and byte span of each geometry instance are kept, in
+    flat arrays, and an instance is decoded from the still-open StepFile
+    each time it is read. Memory per instance is a few bytes whatever its
+    text, so geometry no element refers to costs next to nothing and is
+    never parsed. Volumes do not depend on where a solid is placed, so
+    object placement chains are not resolved; only the extrusion direction
+    relative to the profile plane is used.
+    """
+
+    def __init__(self, step_file):
+        self.step_file = step_file
+        self.ids = array('q')
+        self.type_codes = array('b')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.index = None
+        self.length_scale = 1.0
+        self.profile_cache: Dict[int, Optional[Tuple]] = {}
+
+    def add_entity(self, entity_id: int, entity_type: str, start: int, end: int):
+        """Feed the argument span of one STEP instance of a GEOMETRY_ENTITY_TYPES type"""
+        if entity_type == 'IFCSIUNIT':
+            # (Dimensions, UnitType, Prefix, Name)
+            args = parse_step_arguments(self.step_file.read_arguments(start, end))
+            if len(args) >= 4 and args[1] == 'LENGTHUNIT' and args[3] == 'METRE':
+                self.length_scale = SI_PREFIX_SCALE.get(args[2], 1.0)
+            return
+
+        self.ids.append(entity_id)
+        self.type_codes.append(GEOMETRY_TYPE_CODES[entity_type])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def build_index(self):
+        """Sort the collected spans by id for lookups (ids are usually already in file order)"""
+        ids = np.frombuffer(self.ids, dtype=np.int64) if len(self.ids) else np.zeros(0, dtype=np.int64)
+        order = None if np.all(ids[:-1] < ids[1:]) else np.argsort(ids, kind='stable')
+
+        columns = []
+        for values, dtype in ((self.ids, np.int64), (self.type_codes, np.int8),
+                (self.starts, np.int64), (self.ends, np.int64)):
+            column = np.array(values, dtype=dtype)
+            columns.append(column if order is None else column[order])
+
+        self.index = tuple(columns)
+        self.ids = self.type_codes = self.starts = self.ends = None
+
+    def get_raw_entity(self, entity_id) -> Optional[Tuple[str, str]]:
+        """(entity_type, raw_args) of a collected entity, read back from the file"""
+        if not isinstance(entity_id, int):
+            return None
+        if self.index is None:
+            self.build_index()
+
+        ids, type_codes, starts, ends = self.index
+        position = int(np.searchsorted(ids, entity_id))
+        if position >= len(ids) or ids[position] != entity_id:
+            return None
+
+        raw_args = self.step_file.read_arguments(int(starts[position]), int(ends[position]))
+        return GEOMETRY_TYPES[type_codes[position]], raw_args
+
+    def get_entity(self, entity_id) -> Optional[Tuple[str, list]]:
+        """(entity_type, args) of a collected entity"""
+        raw = self.get_raw_entity(entity_id)
+        if raw is None:
+            return None
+        return raw[0], parse_step_arguments(raw[1])
+
+    def get_point(self, point) -> Optional[Tuple[float, float]]:
+        """First two coordinates of a cartesian point"""
+        raw = self.get_raw_entity(point)
+        if raw is None or raw[0] != 'IFCCARTESIANPOINT':
+            return None
+
+        coordinates = NUMBER_PATTERN.findall(raw[1])
+        if len(coordinates) < 2:
+            return None
+        return float(coordinates[0]), float(coordinates[1])
+
+    def compute_quantities(self, element_types: List[str], representations: List,
+            overall_heights: List, overall_widths: List) -> List[Dict]:
+        """
+        Quantity dicts (with 'unit') for many elements.
+
+        Every extruded solid of every element becomes one row; areas,
+        volumes and extents are computed for all rows at once and summed
+        per element with bincount.
+        """
+        size = len(element_types)
+        scale = self.length_scale
+
+        owners = array('q')
+        kinds = array('b')
+        dim_a = array('d')
+        dim_b = array('d')
+        polygon_areas = array('d')
+        depths = array('d')
+        cosines = array('d')
+
+        for position, representation in enumerate(representations):
+            for solid in self.get_body_solids(representation):
+                row = self.get_solid_row(solid)
+                if row is None:
+                    continue
+                kind, a, b, polygon_area, depth, cosine = row
+                owners.append(position)
+                kinds.append(kind)
+                dim_a.append(a)
+                dim_b.append(b)
+                polygon_areas.append(polygon_area)
+                depths.append(depth)
+                cosines.append(cosine)
+
+        owners = np.asarray(owners, dtype=np.int64)
+        kinds = np.asarray(kinds, dtype=np.int8)
+        dim_a = np.asarray(dim_a, dtype=float) * scale
+        dim_b = np.asarray(dim_b, dtype=float) * scale
+        polygon_areas = np.asarray(polygon_areas, dtype=float) * scale * scale
+        depths = np.abs(np.asarray(depths, dtype=float)) * scale
+        cosines = np.asarray(cosines, dtype=float)
+
+        # Profile area and its long/short extents per solid
+        profile_area = np.select(
+            [kinds == PROFILE_RECTANGLE, kinds == PROFILE_CIRCLE],
+            [dim_a * dim_b, math.pi * dim_a * dim_a],
+            polygon_areas
+        )
+        extent_long = np.where(kinds == PROFILE_CIRCLE, 2 * dim_a, np.maximum(dim_a, dim_b))
+        extent_short = np.where(kinds == PROFILE_CIRCLE, 2 * dim_a, np.minimum(dim_a, dim_b))
+        rise = depths * cosines
+
+        def per_element(values):
+            return np.bincount(owners, weights=values, minlength=size)
+
+        def max_per_element(values):
+            result = np.zeros(size)
+            np.maximum.at(result, owners, values)
+            return result
+
+        solid_count = np.bincount(owners, minlength=size)
+        volume = per_element(profile_area * rise)
+        footprint_area = per_element(profile_area)
+        side_area = per_element(extent_long * rise)
+        run_length = per_element(extent_long)
+        extrusion_length = per_element(depths)
+        max_rise = max_per_element(rise)
+        max_short = max_per_element(extent_short)
+        max_section = max_per_element(profile_area)
+
+        volume, footprint_area, side_area = volume.tolist(), footprint_area.tolist(), side_area.tolist()
+        run_length, extrusion_length = run_length.tolist(), extrusion_length.tolist()
+        max_rise, max_short, max_section = max_rise.tolist(), max_short.tolist(), max_section.tolist()
+        solid_count = solid_count.tolist()
+
+        results = []
+        for position, element_type in enumerate(element_types):
+            quantities = {}
+
+            if element_type in OPENING_TYPES:
+                height = to_length(overall_heights[position], scale)
+                width = to_length(overall_widths[position], scale)
+                if height and width:
+                    quantities.update(area=height * width, height=height, width=width)
+                quantities['quantity'] = 1
+
+            elif solid_count[position]:
+                quantities['volume'] = volume[position]
+
+                if element_type in FOOTPRINT_WALL_TYPES:
+                    quantities.update(
+                        area=side_area[position], length=run_length[position],
+                        height=max_rise[position], width=max_short[position]
+                    )
+                elif element_type in FOOTPRINT_SLAB_TYPES:
+                    quantities.update(area=footprint_area[position], thickness=max_rise[position])
+                elif element_type in SECTION_EXTRUDED_TYPES:
+                    quantities.update(length=extrusion_length[position], cross_section_area=max_section[position])
+                    if 'COLUMN' in element_type:
+                        quantities['height'] = max_rise[position]
+
+            else:
+                quantities['quantity'] = 1
+
+            quantities = {key: round(value, 6) for key, value in quantities.items()}
+            quantities['unit'] = QUANTITY_UNITS.get(primary_quantity_field(element_type, quantities), 'Nos')
+            results.append(quantities)
+
+        return results
+
+    def get_body_solids(self, representation) -> List[int]:
+        """Extruded solid ids of a product's Body representations"""
+        solids = []
+        shape = self.get_entity(representation)
+        if not shape or shape[0] != 'IFCPRODUCTDEFINITIONSHAPE':
+            return solids
+
+        # (Name, Description, Representations)
+        for shape_representation in as_list(shape[1], 2):
+            self.collect_representation_solids(shape_representation, solids, 0)
+
+        return solids
+
+    def collect_representation_solids(self, representation, solids: List[int], depth: int):
+        entity = self.get_entity(representation)
+        if not entity or entity[0] != 'IFCSHAPEREPRESENTATION':
+            return
+
+        # (ContextOfItems, RepresentationIdentifier, RepresentationType, Items)
+        args = entity[1]
+        identifier = args[1] if len(args) > 1 else None
+        if identifier not in (None, 'Body'):
+            return
+
+        for item in as_list(args, 3):
+            self.collect_item_solids(item, solids, depth)
+
+    def collect_item_solids(self, item, solids: List[int], depth: int):
+        if depth > MAX_ITEM_DEPTH:
+            return
+
+        entity = self.get_entity(item)
+        if not entity:
+            return
+
+        entity_type, args = entity
+
+        if entity_type == 'IFCEXTRUDEDAREASOLID':
+            solids.append(item)
+
+        elif entity_type == 'IFCMAPPEDITEM':
+            # (MappingSource, MappingTarget) -> IFCREPRESENTATIONMAP(MappingOrigin, MappedRepresentation)
+            source = self.get_entity(args[0]) if args else None
+            if source and source[0] == 'IFCREPRESENTATIONMAP' and len(source[1]) > 1:
+                self.collect_representation_solids(source[1][1], solids, depth + 1)
+
+        elif entity_type in ('IFCBOOLEANRESULT', 'IFCBOOLEANCLIPPINGRESULT'):
+            # (Operator, FirstOperand, SecondOperand); clipped or cut solids are taken at full size
+            if len(args) > 1:
+                self.collect_item_solids(args[1], solids, depth + 1)
+            if len(args) > 2 and args[0] == 'UNION':
+                self.collect_item_solids(args[2], solids, depth + 1)
+
+    def get_solid_row(self, solid: int) -> Optional[Tuple]:
+        """(kind, dim_a, dim_b, polygon_area, depth, cosine) of one IFCEXTRUDEDAREASOLID"""
+        # (SweptArea, Position, ExtrudedDirection, Depth)
+        args = self.get_entity(solid)[1]
+        if len(args) < 4 or not isinstance(args[3], (int, float)):
+            return None
+
+        profile = self.get_profile(args[0])
+        if profile is None:
+            return None
+
+        return profile + (float(args[3]), self.get_direction_cosine(args[2]))
+
+    def get_direction_cosine(self, direction) -> float:
+        """Share of the extrusion direction normal to the profile plane"""
+        entity = self.get_entity(direction)
+        if not entity or entity[0] != 'IFCDIRECTION':
+            return 1.0
+
+        ratios = as_list(entity[1], 0)
+        if len(ratios) < 3:
+            return 1.0
+
+        norm = math.sqrt(sum(float(value) ** 2 for value in ratios[:3]))
+        return abs(float(ratios[2])) / norm if norm else 1.0
+
+    def get_profile(self, profile) -> Optional[Tuple]:
+        """(kind, dim_a, dim_b, polygon_area) of a profile definition, memoised"""
+        if profile in self.profile_cache:
+            return self.profile_cache[profile]
+
+        result = None
+        entity = self.get_entity(profile)
+
+        if entity:
+            entity_type, args = entity
+
+            if entity_type == 'IFCRECTANGLEPROFILEDEF' and len(args) >= 5:
+                # (ProfileType, ProfileName, Position, XDim, YDim)
+                result = (PROFILE_RECTANGLE, float(args[3] or 0), float(args[4] or 0), 0.0)
+
+            elif entity_type == 'IFCCIRCLEPROFILEDEF' and len(args) >= 4:
+                # (ProfileType, ProfileName, Position, Radius)
+                result = (PROFILE_CIRCLE, float(args[3] or 0), 0.0, 0.0)
+
+            elif entity_type in ('IFCARBITRARYCLOSEDPROFILEDEF', 'IFCARBITRARYPROFILEDEFWITHVOIDS') and len(args) >= 3:
+                # (ProfileType, ProfileName, OuterCurve[, InnerCurves])
+                outer = self.get_curve_points(args[2])
+                if len(outer) >= 3:
+                    inner = [self.get_curve_points(curve) for curve in as_list(args, 3)]
+                    result = polygon_profile(outer, [points for points in inner if len(points) >= 3])
+
+        self.profile_cache[profile] = result
+        return result
+
+    def get_curve_points(self, curve) -> List[Tuple[float, float]]:
+        """Vertices of a polyline or indexed polycurve (arc segments taken as straight)"""
+        entity = self.get_entity(curve)
+        if not entity:
+            return []
+
+        entity_type, args = entity
+
+        if entity_type == 'IFCPOLYLINE':
+            points = [self.get_point(point) for point in as_list(args, 0)]
+            return [point for point in points if point is not None]
+
+        if entity_type == 'IFCINDEXEDPOLYCURVE':
+            # (Points, Segments, SelfIntersect) -> IFCCARTESIANPOINTLIST2D(CoordList)
+            point_list = self.get_entity(args[0]) if args else None
+            if point_list and point_list[0] == 'IFCCARTESIANPOINTLIST2D':
+                return [
+                    (float(coordinates[0]), float(coordinates[1]))
+                    for coordinates in as_list(point_list[1], 0) if len(coordinates) >= 2
+                ]
+
+        return []
+
+
+def polygon_profile(outer: List[Tuple[float, float]], inner: List[List[Tuple[float, float]]]) -> Tuple:
+    """Polygon profile: bounding box extents and area with voids removed"""
+    loops = [outer] + inner
+    sizes = [len(loop) for loop in loops]
+
+    xy = np.array([point for loop in loops for point in loop], dtype=float)
+    loop_ids = np.repeat(np.arange(len(loops)), sizes)
+
+    # Shoelace per loop, with each loop's next vertex wrapping to its first
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    following = np.arange(len(xy)) + 1
+    following[np.cumsum(sizes) - 1] = offsets
+    cross = xy[:, 0] * xy[following, 1] - xy[following, 0] * xy[:, 1]
+    loop_areas = np.abs(np.bincount(loop_ids, weights=cross)) / 2
+
+    outer_xy = xy[:sizes[0]]
+    extent = outer_xy.max(axis=0) - outer_xy.min(axis=0)
+
+    return (PROFILE_POLYGON, float(extent[0]), float(extent[1]),
+        float(max(loop_areas[0] - loop_areas[1:].sum(), 0.0)))
+
+
+def as_list(args: list, index: int) -> list:
+    value = args[index] if len(args) > index else None
+    return value if isinstance(value, list) else []
+
+
+def to_length(value, scale: float) -> float:
+    return float(value) * scale if isinstance(value, (int, float)) else 0.0
@@ -0,0 +1,288 @@
+"""
+BIM Import Job Module
+Background, checkpointed and resumable BIM imports
+"""
+
+import melon
+from melon import _
+from melon.utils import cint, now_datetime
+from melon.realtime import publish_realtime
+from typing import Dict
+import os
+
+from quantity_survey.bim.aggregation import AGGREGATION_MODES, aggregate_boq_lines
+from quantity_survey.bim.boq_builder import append_boq_items, create_boq_header
+from quantity_survey.bim.integrator import build_boq_lines
+from quantity_survey.bim.upload import extract_uploaded_elements
+
+# Elements mapped and written per checkpoint
+BIM_IMPORT_CHUNK_SIZE = 2000
+
+# Worker timeout for a single run, in seconds
+BIM_IMPORT_TIMEOUT = 4 * 60 * 60
+
+SUPPORTED_JOB_FILE_TYPES = ['ifc', 'dxf', 'xml', 'xlsx', 'csv']
+
+
+@melon.whitelist()
+def enqueue_bim_import(file_path: str, file_type: str, project: str, aggregation: str = None,
+        content_hash: str = None) -> Dict:
+    """
+    Queue a BIM import on the long queue and return its job name.
+
+    Progress is pushed to the requesting user as 'bim_import_progress'
+    realtime events. See import_bim_file for aggregation. Files that came
+    through quantity_survey.bim.upload pass their content_hash, so parsed
+    elements are shared between imports of identical files.
+    """
+    try:
+        if not os.path.exists(file_path):
+            return {'success': False, 'message': 'File not found'}
+
+        if file_type.lower() not in SUPPORTED_JOB_FILE_TYPES:
+            return {'success': False, 'message': f'Unsupported file type: {file_type}'}
+
+        if aggregation and aggregation not in AGGREGATION_MODES:
+            return {'success': False, 'message': f'Unsupported aggregation: {aggregation}'}
+
+        return {
+            'success': True,
+            'job': create_bim_import_job(file_path, file_type, project, aggregation, content_hash),
+            'message': _('BIM import queued')
+        }
+
+    except Exception as e:
+        melon.log_error(f"BIM import enqueue error: {str(e)}", "BIM Integrator")
+        return {'success': False, 'message': f'Import failed: {str(e)}'}
+
+
+@melon.whitelist()
+def resume_bim_import(job: str) -> Dict:
+    """Re-queue a failed or interrupted job; it continues from its last checkpoint"""
+    status = melon.db.get_value('BIM Import Job', job, 'status')
+    if not status:
+        return {'success': False, 'message': _('BIM Import Job {0} not found').format(job)}
+
+    if not melon.has_permission('BIM Import Job', 'write', job):
+        melon.throw(_('Access denied'), melon.PermissionError)
+
+    if status == 'Completed':
+        return {'success': False, 'message': _('Import already completed')}
+
+    if is_job_enqueued(get_job_id(job)):
+        return {'success': False, 'message': _('Import is already queued or running')}
+
+    melon.db.set_value('BIM Import Job', job, 'status', 'Queued')
+    enqueue_job(job)
+
+    return {'success': True, 'job': job, 'message': _('BIM import resumed')}
+
+
+@melon.whitelist()
+def get_bim_import_status(job: str) -> Dict:
+    """Current checkpoint of an import job"""
+    if not melon.has_permission('BIM Import Job', 'read', job):
+        melon.throw(_('Access denied'), melon.PermissionError)
+
+    return melon.db.get_value('BIM Import Job', job,
+        ['name', 'status', 'boq', 'progress', 'total_elements', 'processed_elements',
+         'rows_written', 'error_message'],
+        as_dict=True
+    )
+
+
+def create_bim_import_job(file_path: str, file_type: str, project: str, aggregation: str = None,
+        content_hash: str = None) -> str:
+    """
+    Insert a BIM Import Job and queue it once the transaction commits.
+
+    The file is not checked: a finished upload is only moved to file_path
+    on commit, before the job is queued.
+    """
+    job = melon.get_doc({
+        'doctype': 'BIM Import Job',
+        'project': project,
+        'file_path': file_path,
+        'file_type': file_type.lower(),
+        'aggregation': aggregation,
+        'content_hash': content_hash,
+        'status': 'Queued'
+    })
+    job.insert()
+
+    enqueue_job(job.name)
+
+    return job.name
+
+
+def enqueue_job(job: str):
+    """Queue run_bim_import_job once per job"""
+    melon.enqueue(
+        'quantity_survey.bim.import_job.run_bim_import_job',
+        queue='long',
+        timeout=BIM_IMPORT_TIMEOUT,
+        job_id=get_job_id(job),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        import_job=job
+    )
+
+
+def get_job_id(job: str) -> str:
+    return f'bim_import::{job}'
+
+
+def is_job_enqueued(job_id: str) -> bool:
+    from melon.utils.background_jobs import is_job_enqueued as _is_job_enqueued
+    return _is_job_enqueued(job_id)
+
+
+def run_bim_import_job(import_job: str):
+    """
+    Worker entry point.
+
+    The file is parsed, then elements are mapped and written in chunks.
+    Each chunk's BoQ rows and the job checkpoint are committed together,
+    so a restarted worker skips exactly the elements already written.
+    Aggregated imports cannot be written per chunk and are committed once
+    at the end (see run_aggregated_import).
+    """
+    job = melon.get_doc('BIM Import Job', import_job)
+    if job.status == 'Completed':
+        return
+
+    job.db_set({
+        'status': 'Running',
+        'started_at': job.started_at or now_datetime(),
+        'attempts': cint(job.attempts) + 1,
+        'error_message': None
+    }, commit=True)
+
+    try:
+        from quantity_survey.bim.item_matcher import ItemMatchIndex
+
+        elements = extract_uploaded_elements(job.file_path, job.file_type, job.content_hash)
+        total_elements = len(elements)
+
+        if not job.boq:
+            import_source = f'{job.file_type.upper()} Import'
+            boq_doc = create_boq_header(
+                job.project,
+                f'BIM Import - {import_source}',
+                f'Automatically generated from {import_source} on {melon.utils.now()}',
+                job.aggregation
+            )
+            job.db_set({'boq': boq_doc.name, 'total_elements': total_elements}, commit=True)
+
+        match_index = ItemMatchIndex()
+
+        if job.aggregation:
+            run_aggregated_import(job, elements, match_index)
+            return
+
+        processed = cint(job.processed_elements)
+        rows_written = cint(job.rows_written)
+
+        for start in range(processed, total_elements, BIM_IMPORT_CHUNK_SIZE):
+            chunk = elements[start:start + BIM_IMPORT_CHUNK_SIZE]
+
+            lines = build_boq_lines(chunk, match_index)
+            append_boq_items(job.boq, lines, start_idx=rows_written, commit=False)
+            match_index.save()
+
+            processed = start + len(chunk)
+            rows_written += len(lines)
+
+            job.db_set({
+                'processed_elements': processed,
+                'rows_written': rows_written,
+                'total_elements': total_elements,
+                'progress': processed * 100.0 / total_elements
+            })
+            melon.db.commit()
+
+            publish_import_progress(job)
+
+        job.db_set({
+            'status': 'Completed',
+            'progress': 100,
+            'total_elements': total_elements,
+            'completed_at': now_datetime()
+        }, commit=True)
+        publish_import_progress(job)
+
+    except Exception as e:
+        melon.db.rollback()
+        # Drop the in-memory counters of the rolled-back chunk so the final
+        # event reports the last committed checkpoint
+        job.reload()
+        job.db_set({'status': 'Failed', 'error_message': melon.get_traceback()}, commit=True)
+        publish_import_progress(job)
+        melon.log_error(f"BIM import job {job.name} failed: {str(e)}", "BIM Integrator")
+
+
+def run_aggregated_import(job, elements, match_index):
+    """Map elements chunk by chunk for progress, then write the grouped lines in one transaction"""
+    total_elements = len(elements)
+    lines = []
+
+    for start in range(0, total_elements, BIM_IMPORT_CHUNK_SIZE):
+        chunk = elements[start:start + BIM_IMPORT_CHUNK_SIZE]
+        lines.extend(build_boq_lines(chunk, match_index))
+
+        # Progress is published but not committed; nothing is written until the end
+        job.progress = (start + len(chunk)) * 100.0 / total_elements
+        publish_import_progress(job)
+
+    lines = aggregate_boq_lines(lines, job.aggregation)
+    append_boq_items(job.boq, lines, commit=False)
+    match_index.save()
+
+    job.db_set({
+        'status': 'Completed',
+        'progress': 100,
+        'total_elements': total_elements,
+        'processed_elements': total_elements,
+        'rows_written': len(lines),
+        'completed_at': now_datetime()
+    })
+    melon.db.commit()
+    publish_import_progress(job)
+
+
+def publish_import_progress(job):
+    """Push the job checkpoint to the user who queued it"""
+    publish_realtime(
+        event='bim_import_progress',
+        message={
+            'job': job.name,
+            'status': job.status,
+            'boq': job.boq,
+            'progress': job.progress,
+            'processed_elements': job.processed_elements,
+            'total_elements': job.total_elements,
+            'rows_written': job.rows_written
+        },
+        user=job.owner
+    )
+
+
+def resume_interrupted_imports():
+    """Re-queue jobs whose worker died mid-run (called by scheduler)"""
+    try:
+        jobs = melon.get_all('BIM Import Job',
+            filters={'status': ['in', ['Queued', 'Running']]},
+            pluck='name'
+        )
+
+        resumed = 0
+        for job in jobs:
+            if not is_job_enqueued(get_job_id(job)):
+                enqueue_job(job)
+                resumed += 1
+
+        if resumed:
+            melon.logger().info(f"Resumed {resumed} interrupted BIM import jobs")
+
+    except Exception as e:
+        melon.log_error(f"Error resuming BIM import jobs: {str(e)}")
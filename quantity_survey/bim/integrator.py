@@ -8,23 +8,41 @@ from melon import _
 from melon.utils import flt, cint, get_files_path
 import os
 import json
+import hashlib
 import tempfile
 from typing import Dict, List, Any, Optional
-import xml.etree.ElementTree as ET
+
+# Below this many elements, process start-up costs more than parallel extraction saves
+PARALLEL_EXTRACTION_MIN_ELEMENTS = 2000
 
 @melon.whitelist()
-def import_bim_file(file_path: str, file_type: str, project: str) -> Dict:
+def import_bim_file(file_path: str, file_type: str, project: str, boq: str = None,
+        aggregation: str = None) -> Dict:
     """
     Import BIM file and extract quantity data
+    
+    When boq is given, the file is diffed against that BoQ instead of
+    creating a new one (see quantity_survey.bim.reimport). With an
+    aggregation mode ('By Item' or 'By Item and Storey') elements are
+    grouped into one BoQ line per item, uom, material (and storey).
     """
     try:
         if not os.path.exists(file_path):
             return {'success': False, 'message': 'File not found'}
         
+        if boq:
+            from quantity_survey.bim.reimport import reimport_bim_file
+            return reimport_bim_file(file_path, file_type, boq)
+        
+        if aggregation:
+            return import_aggregated_bim_file(file_path, file_type, project, aggregation)
+        
         if file_type.lower() == 'ifc':
             return import_ifc_file(file_path, project)
         elif file_type.lower() == 'dwg':
             return import_dwg_file(file_path, project)
+        elif file_type.lower() == 'dxf':
+            return import_dxf_file(file_path, project)
         elif file_type.lower() == 'xml':
             return import_xml_file(file_path, project)
         elif file_type.lower() in ['xlsx', 'csv']:
@@ -36,91 +54,231 @@ def import_bim_file(file_path: str, file_type: str, project: str) -> Dict:
         melon.log_error(f"BIM import error: {str(e)}", "BIM Integrator")
         return {'success': False, 'message': f'Import failed: {str(e)}'}
 
+def import_aggregated_bim_file(file_path: str, file_type: str, project: str, aggregation: str) -> Dict:
+    """Import any supported file into grouped BoQ lines"""
+    from quantity_survey.bim.aggregation import AGGREGATION_MODES
+    
+    if aggregation not in AGGREGATION_MODES:
+        return {'success': False, 'message': f'Unsupported aggregation: {aggregation}'}
+    
+    elements = extract_bim_elements(file_path, file_type)
+    if not elements:
+        return {'success': False, 'message': 'No valid elements found in file'}
+    
+    boq_doc = create_boq_from_bim_data(elements, project, f'{file_type.upper()} Import', aggregation)
+    return {
+        'success': True,
+        'message': f'Successfully imported {len(elements)} elements as grouped BoQ lines',
+        'boq': boq_doc.name,
+        'elements_count': len(elements)
+    }
+
+def extract_bim_elements(file_path: str, file_type: str) -> List[Dict]:
+    """Parse a supported file into element dicts without creating a BoQ"""
+    file_type = file_type.lower()
+    
+    if file_type == 'ifc':
+        return extract_ifc_file_elements(file_path)
+    elif file_type == 'dxf':
+        from quantity_survey.bim.dxf_reader import extract_dxf_elements
+        return extract_dxf_elements(file_path)
+    elif file_type == 'xml':
+        return extract_xml_elements(file_path)
+    elif file_type in ['xlsx', 'csv']:
+        return extract_excel_elements(file_path)
+    
+    melon.throw(_('Unsupported file type: {0}').format(file_type))
+
 def import_ifc_file(file_path: str, project: str) -> Dict:
     """Import IFC (Industry Foundation Classes) file"""
     try:
         # Try to use IfcOpenShell if available
         try:
             import ifcopenshell
-            import ifcopenshell.util.element
-            
-            # Open IFC file
-            ifc_file = ifcopenshell.open(file_path)
-            
-            # Extract building elements with quantities
-            elements = []
-            
-            # Get all building elements
-            building_elements = ifc_file.by_type("IfcBuildingElement")
-            
-            for element in building_elements:
-                element_data = extract_ifc_element_data(element)
-                if element_data:
-                    elements.append(element_data)
-            
-            # Create BOQ from extracted data
-            boq_doc = create_boq_from_bim_data(elements, project, 'IFC Import')
-            
-            return {
-                'success': True,
-                'message': f'Successfully imported {len(elements)} elements from IFC file',
-                'boq': boq_doc.name,
-                'elements_count': len(elements)
-            }
-            
         except ImportError:
             # Fallback to manual IFC parsing (limited functionality)
             return parse_ifc_manually(file_path, project)
+        
+        # Extract building elements with quantities
+        elements = extract_ifc_file_elements(file_path)
+        
+        # Create BOQ from extracted data
+        boq_doc = create_boq_from_bim_data(elements, project, 'IFC Import')
+        
+        return {
+            'success': True,
+            'message': f'Successfully imported {len(elements)} elements from IFC file',
+            'boq': boq_doc.name,
+            'elements_count': len(elements)
+        }
             
     except Exception as e:
         return {'success': False, 'message': f'IFC import failed: {str(e)}'}
 
-def extract_ifc_element_data(element) -> Optional[Dict]:
-    """Extract quantity data from IFC element"""
+def extract_ifc_file_elements(file_path: str) -> List[Dict]:
+    """Extract elements from an IFC file, with IfcOpenShell when it is installed"""
     try:
-        import ifcopenshell.util.element
-        
-        element_type = element.is_a()
-        element_name = getattr(element, 'Name', '') or f"{element_type}_{element.id()}"
-        
-        # Get quantities
-        quantities = {}
-        
-        # Try to get quantity sets
-        psets = ifcopenshell.util.element.get_psets(element)
-        
-        # Extract relevant quantities
-        for pset_name, pset_data in psets.items():
-            if 'quantity' in pset_name.lower() or 'dimension' in pset_name.lower():
-                for prop_name, prop_value in pset_data.items():
-                    if isinstance(prop_value, (int, float)):
-                        quantities[prop_name] = prop_value
-        
-        # Get material
-        material = ""
+        import ifcopenshell
+    except ImportError:
+        return extract_ifc_elements_manually(file_path)
+    
+    ifc_file = ifcopenshell.open(file_path)
+    return extract_ifc_elements(ifc_file, file_path)
+
+def extract_ifc_elements(ifc_file, file_path: str, workers: int = None) -> List[Dict]:
+    """
+    Extract data for every IfcBuildingElement, in file order.
+    
+    Large models are split across a process pool when more than one
+    worker is configured in Quantity Survey Settings. Every element is
+    tagged with its spatial location from the relationship index.
+    """
+    from quantity_survey.bim.spatial_index import SpatialIndex
+    
+    building_elements = ifc_file.by_type("IfcBuildingElement")
+    
+    if workers is None:
+        workers = get_bim_import_workers()
+    
+    if workers <= 1 or len(building_elements) < PARALLEL_EXTRACTION_MIN_ELEMENTS:
+        elements = []
+        for element in building_elements:
+            element_data = extract_ifc_element_data(element, derive_quantities=False)
+            if element_data:
+                elements.append(element_data)
+        elements = apply_ifc_quantity_formulas(elements)
+    else:
+        element_ids = [element.id() for element in building_elements]
+        elements = extract_ifc_elements_parallel(file_path, element_ids, workers)
+    
+    return SpatialIndex.from_ifc_file(ifc_file).tag_elements(elements)
+
+def get_bim_import_workers() -> int:
+    """Worker count for IFC extraction (0 in settings means one per CPU core)"""
+    workers = cint(melon.db.get_single_value('Quantity Survey Settings', 'bim_import_workers'))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+def extract_ifc_elements_parallel(file_path: str, element_ids: List[int], workers: int) -> List[Dict]:
+    """Extract element data across a process pool, merged in element_ids order"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # A few chunks per worker keeps the pool busy when element cost varies
+    chunk_size = max(1, -(-len(element_ids) // (workers * 4)))
+    chunks = [element_ids[i:i + chunk_size] for i in range(0, len(element_ids), chunk_size)]
+    
+    elements = []
+    # Spawned workers do not inherit the parent's database connection
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_ifc_extraction_worker,
+        initargs=(file_path,)
+    ) as executor:
+        # map() yields results in submission order, so output is deterministic
+        for chunk_elements, chunk_errors in executor.map(_extract_ifc_chunk, chunks):
+            elements.extend(chunk_elements)
+            for error in chunk_errors:
+                melon.log_error(f"IFC element extraction error: {error}", "BIM Integrator")
+    
+    return elements
+
+_worker_ifc_file = None
+
+def _init_ifc_extraction_worker(file_path: str):
+    """Open the IFC file once per worker process"""
+    global _worker_ifc_file
+    import ifcopenshell
+    _worker_ifc_file = ifcopenshell.open(file_path)
+
+def _extract_ifc_chunk(element_ids: List[int]) -> tuple:
+    """Extract a chunk of elements inside a worker; errors are returned, not logged"""
+    elements = []
+    errors = []
+    
+    for element_id in element_ids:
         try:
-            materials = ifcopenshell.util.element.get_material(element)
-            if materials:
-                material = str(materials)
-        except:
-            pass
-        
-        # Calculate quantities based on element type
-        quantity_data = calculate_element_quantities(element_type, quantities)
-        
-        return {
-            'element_id': element.id(),
-            'element_type': element_type,
-            'name': element_name,
-            'material': material,
-            'quantities': quantity_data,
-            'properties': quantities
-        }
+            elements.append(_extract_ifc_element_data(_worker_ifc_file.by_id(element_id), derive_quantities=False))
+        except Exception as e:
+            errors.append(f"#{element_id}: {str(e)}")
+    
+    return apply_ifc_quantity_formulas(elements), errors
+
+def extract_ifc_element_data(element, derive_quantities: bool = True) -> Optional[Dict]:
+    """Extract quantity data from IFC element"""
+    try:
+        return _extract_ifc_element_data(element, derive_quantities)
         
     except Exception as e:
         melon.log_error(f"IFC element extraction error: {str(e)}", "BIM Integrator")
         return None
 
+def _extract_ifc_element_data(element, derive_quantities: bool = True) -> Dict:
+    """
+    Extract quantity data from IFC element without touching the database
+    
+    With derive_quantities off, quantities are left empty for
+    apply_ifc_quantity_formulas to fill for a whole batch.
+    """
+    import ifcopenshell.util.element
+    
+    element_type = element.is_a()
+    element_name = getattr(element, 'Name', '') or f"{element_type}_{element.id()}"
+    
+    # Get quantities
+    quantities = {}
+    
+    # Try to get quantity sets
+    psets = ifcopenshell.util.element.get_psets(element)
+    
+    # Extract relevant quantities
+    for pset_name, pset_data in psets.items():
+        if 'quantity' in pset_name.lower() or 'dimension' in pset_name.lower():
+            for prop_name, prop_value in pset_data.items():
+                if isinstance(prop_value, (int, float)):
+                    quantities[prop_name] = prop_value
+    
+    # Get material; keyed on its name like the fallback parser, since the
+    # entity repr embeds a STEP id that changes with every export
+    material = ""
+    try:
+        materials = ifcopenshell.util.element.get_material(element)
+        if materials and materials.is_a('IfcMaterial'):
+            material = materials.Name or ""
+    except:
+        pass
+    
+    # Calculate quantities based on element type
+    quantity_data = calculate_element_quantities(element_type, quantities) if derive_quantities else {}
+    
+    return {
+        'element_id': element.id(),
+        'global_id': getattr(element, 'GlobalId', None),
+        'element_type': element_type,
+        'name': element_name,
+        'material': material,
+        'quantities': quantity_data,
+        'properties': quantities
+    }
+
+def apply_ifc_quantity_formulas(elements: List[Dict]) -> List[Dict]:
+    """Fill quantities from IFC properties for many elements in one vectorised pass"""
+    from quantity_survey.bim.element_batch import ElementBatch
+    
+    if not elements:
+        return elements
+    
+    batch = ElementBatch.from_ifc_properties(
+        [element['element_type'] for element in elements],
+        [element['properties'] for element in elements]
+    )
+    for element, quantities in zip(elements, batch.quantity_dicts()):
+        element['quantities'] = quantities
+    
+    return elements
+
 def calculate_element_quantities(element_type: str, properties: Dict) -> Dict:
     """Calculate standard quantities based on element type"""
     quantities = {}
@@ -189,55 +347,7 @@ def calculate_element_quantities(element_type: str, properties: Dict) -> Dict:
 def parse_ifc_manually(file_path: str, project: str) -> Dict:
     """Manual IFC parsing without IfcOpenShell (limited functionality)"""
     try:
-        elements = []
-        
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # Basic parsing for wall, slab, and beam elements
-        import re
-        
-        # Find IFC entities
-        wall_pattern = r'#(\d+)=IFCWALL\((.*?)\);'
-        slab_pattern = r'#(\d+)=IFCSLAB\((.*?)\);'
-        beam_pattern = r'#(\d+)=IFCBEAM\((.*?)\);'
-        
-        walls = re.findall(wall_pattern, content, re.IGNORECASE)
-        slabs = re.findall(slab_pattern, content, re.IGNORECASE)
-        beams = re.findall(beam_pattern, content, re.IGNORECASE)
-        
-        # Process walls
-        for wall_id, wall_data in walls:
-            elements.append({
-                'element_id': wall_id,
-                'element_type': 'IFCWALL',
-                'name': f'Wall_{wall_id}',
-                'material': 'Concrete',
-                'quantities': {'quantity': 1, 'unit': 'Nos'},
-                'properties': {'raw_data': wall_data}
-            })
-        
-        # Process slabs
-        for slab_id, slab_data in slabs:
-            elements.append({
-                'element_id': slab_id,
-                'element_type': 'IFCSLAB',
-                'name': f'Slab_{slab_id}',
-                'material': 'Concrete',
-                'quantities': {'quantity': 1, 'unit': 'Nos'},
-                'properties': {'raw_data': slab_data}
-            })
-        
-        # Process beams
-        for beam_id, beam_data in beams:
-            elements.append({
-                'element_id': beam_id,
-                'element_type': 'IFCBEAM',
-                'name': f'Beam_{beam_id}',
-                'material': 'Concrete',
-                'quantities': {'quantity': 1, 'unit': 'Nos'},
-                'properties': {'raw_data': beam_data}
-            })
+        elements = extract_ifc_elements_manually(file_path)
         
         if elements:
             boq_doc = create_boq_from_bim_data(elements, project, 'Manual IFC Import')
@@ -253,6 +363,97 @@ def parse_ifc_manually(file_path: str, project: str) -> Dict:
     except Exception as e:
         return {'success': False, 'message': f'Manual IFC parsing failed: {str(e)}'}
 
+def extract_ifc_elements_manually(file_path: str) -> List[Dict]:
+    """
+    Extract building elements from an IFC file in a single streaming pass
+    
+    Quantities come from each element's extruded body solids; elements
+    without any fall back to a count of one. Geometry is only located
+    during the pass and read back from the mapped file once every element
+    is known, so memory does not grow with the size of the geometry.
+    """
+    from quantity_survey.bim.ifc_geometry import GEOMETRY_ENTITY_TYPES, ExtrusionGeometry
+    from quantity_survey.bim.spatial_index import SPATIAL_INDEX_TYPES, SpatialIndex
+    from quantity_survey.bim.step_reader import BUILDING_ELEMENT_TYPES, StepFile, parse_step_arguments
+    
+    wanted_types = (BUILDING_ELEMENT_TYPES | SPATIAL_INDEX_TYPES | GEOMETRY_ENTITY_TYPES
+        | {'IFCMATERIAL', 'IFCRELASSOCIATESMATERIAL'})
+    
+    elements = []
+    material_names = {}
+    element_materials = {}
+    spatial_index = SpatialIndex()
+    
+    # Per element: Representation, OverallHeight, OverallWidth
+    representations = []
+    overall_heights = []
+    overall_widths = []
+    
+    with StepFile(file_path) as step_file:
+        geometry = ExtrusionGeometry(step_file)
+        
+        for entity_id, entity_type, start, end in step_file.iter_entities(wanted_types):
+            if entity_type in GEOMETRY_ENTITY_TYPES:
+                geometry.add_entity(entity_id, entity_type, start, end)
+                continue
+            
+            args = parse_step_arguments(step_file.read_arguments(start, end))
+            
+            if entity_type in SPATIAL_INDEX_TYPES:
+                spatial_index.add_entity(entity_id, entity_type, args)
+            
+            elif entity_type == 'IFCMATERIAL':
+                material_names[entity_id] = args[0] if args else ''
+            
+            elif entity_type == 'IFCRELASSOCIATESMATERIAL':
+                # (GlobalId, OwnerHistory, Name, Description, RelatedObjects, RelatingMaterial)
+                if len(args) >= 6 and isinstance(args[4], list):
+                    for related_id in args[4]:
+                        element_materials[int(related_id)] = args[5]
+            
+            else:
+                # (GlobalId, OwnerHistory, Name, Description, ObjectType, ObjectPlacement, Representation, Tag, ...)
+                label = entity_type[3:].title()
+                name = args[2] if len(args) > 2 and isinstance(args[2], str) else ''
+                
+                properties = {}
+                if args and isinstance(args[0], str):
+                    properties['global_id'] = args[0]
+                if len(args) > 4 and isinstance(args[4], str):
+                    properties['object_type'] = args[4]
+                
+                elements.append({
+                    'element_id': str(entity_id),
+                    'global_id': properties.get('global_id'),
+                    'element_type': entity_type,
+                    'name': name or f'{label}_{entity_id}',
+                    'material': '',
+                    'quantities': {},
+                    'properties': properties
+                })
+                
+                # Doors and windows carry (..., Tag, OverallHeight, OverallWidth, ...)
+                representations.append(args[6] if len(args) > 6 else None)
+                overall_heights.append(args[8] if len(args) > 8 else None)
+                overall_widths.append(args[9] if len(args) > 9 else None)
+        
+        # Geometry is resolved once every referenced entity has been read
+        all_quantities = geometry.compute_quantities(
+            [element['element_type'] for element in elements],
+            representations, overall_heights, overall_widths
+        )
+    
+    for element, quantities in zip(elements, all_quantities):
+        element['quantities'] = quantities
+    
+    # Material and spatial relationships may appear before or after the entities they reference
+    for element in elements:
+        material_ref = element_materials.get(int(element['element_id']))
+        if material_ref is not None:
+            element['material'] = material_names.get(int(material_ref), '')
+    
+    return spatial_index.tag_elements(elements)
+
 def import_dwg_file(file_path: str, project: str) -> Dict:
     """Import DWG (AutoCAD) file"""
     try:
@@ -267,22 +468,31 @@ def import_dwg_file(file_path: str, project: str) -> Dict:
     except Exception as e:
         return {'success': False, 'message': f'DWG import failed: {str(e)}'}
 
-def import_xml_file(file_path: str, project: str) -> Dict:
-    """Import XML file (Generic or specific format)"""
+def import_dxf_file(file_path: str, project: str) -> Dict:
+    """Import DXF (AutoCAD exchange) file as per-layer quantities"""
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
+        from quantity_survey.bim.dxf_reader import extract_dxf_elements
         
-        elements = []
+        elements = extract_dxf_elements(file_path)
         
-        # Try to parse common XML structures
-        if root.tag.lower() in ['project', 'building', 'model']:
-            elements = parse_building_xml(root)
-        elif root.tag.lower() in ['quantities', 'boq', 'takeoff']:
-            elements = parse_quantities_xml(root)
+        if elements:
+            boq_doc = create_boq_from_bim_data(elements, project, 'DXF Import')
+            return {
+                'success': True,
+                'message': f'Successfully imported {len(elements)} layer quantities from DXF',
+                'boq': boq_doc.name,
+                'elements_count': len(elements)
+            }
         else:
-            # Generic XML parsing
-            elements = parse_generic_xml(root)
+            return {'success': False, 'message': 'No measurable entities found in DXF file'}
+            
+    except Exception as e:
+        return {'success': False, 'message': f'DXF import failed: {str(e)}'}
+
+def import_xml_file(file_path: str, project: str) -> Dict:
+    """Import XML file (Generic or specific format)"""
+    try:
+        elements = extract_xml_elements(file_path)
         
         if elements:
             boq_doc = create_boq_from_bim_data(elements, project, 'XML Import')
@@ -298,176 +508,16 @@ def import_xml_file(file_path: str, project: str) -> Dict:
     except Exception as e:
         return {'success': False, 'message': f'XML import failed: {str(e)}'}
 
-def parse_building_xml(root) -> List[Dict]:
-    """Parse building model XML"""
-    elements = []
-    
-    # Look for common element tags
-    element_tags = ['wall', 'slab', 'beam', 'column', 'door', 'window', 'element', 'component']
-    
-    for tag in element_tags:
-        for elem in root.iter(tag):
-            element_data = {
-                'element_id': elem.get('id', f'{tag}_{len(elements)}'),
-                'element_type': tag.upper(),
-                'name': elem.get('name', f'{tag}_{len(elements)}'),
-                'material': elem.get('material', ''),
-                'quantities': {},
-                'properties': {}
-            }
-            
-            # Extract quantity attributes
-            for attr, value in elem.attrib.items():
-                try:
-                    numeric_value = float(value)
-                    element_data['quantities'][attr] = numeric_value
-                except ValueError:
-                    element_data['properties'][attr] = value
-            
-            # Extract child element quantities
-            for child in elem:
-                try:
-                    numeric_value = float(child.text or 0)
-                    element_data['quantities'][child.tag] = numeric_value
-                except ValueError:
-                    element_data['properties'][child.tag] = child.text
-            
-            elements.append(element_data)
-    
-    return elements
-
-def parse_quantities_xml(root) -> List[Dict]:
-    """Parse quantities-specific XML"""
-    elements = []
-    
-    for item in root.iter('item'):
-        element_data = {
-            'element_id': item.get('id', f'item_{len(elements)}'),
-            'element_type': item.get('type', 'ITEM'),
-            'name': item.get('description', f'Item_{len(elements)}'),
-            'material': item.get('material', ''),
-            'quantities': {},
-            'properties': {}
-        }
-        
-        # Common quantity fields
-        qty_fields = ['quantity', 'length', 'width', 'height', 'area', 'volume', 'weight']
-        
-        for field in qty_fields:
-            value = item.get(field) or (item.find(field).text if item.find(field) is not None else None)
-            if value:
-                try:
-                    element_data['quantities'][field] = float(value)
-                except ValueError:
-                    pass
-        
-        # Get unit of measurement
-        unit = item.get('unit') or (item.find('unit').text if item.find('unit') is not None else 'Nos')
-        element_data['quantities']['unit'] = unit
-        
-        elements.append(element_data)
-    
-    return elements
-
-def parse_generic_xml(root) -> List[Dict]:
-    """Generic XML parsing"""
-    elements = []
-    
-    # Try to find any element with quantity-related attributes
-    for elem in root.iter():
-        if elem.text and elem.text.strip():
-            continue  # Skip text elements
-        
-        has_quantities = any(attr in ['quantity', 'length', 'width', 'height', 'area', 'volume'] 
-                           for attr in elem.attrib.keys())
-        
-        if has_quantities:
-            element_data = {
-                'element_id': elem.get('id', f'{elem.tag}_{len(elements)}'),
-                'element_type': elem.tag.upper(),
-                'name': elem.get('name', f'{elem.tag}_{len(elements)}'),
-                'material': elem.get('material', ''),
-                'quantities': {},
-                'properties': {}
-            }
-            
-            # Extract all attributes
-            for attr, value in elem.attrib.items():
-                try:
-                    numeric_value = float(value)
-                    element_data['quantities'][attr] = numeric_value
-                except ValueError:
-                    element_data['properties'][attr] = value
-            
-            elements.append(element_data)
+def extract_xml_elements(file_path: str) -> List[Dict]:
+    """Extract elements from a building, quantities or generic XML file"""
+    from quantity_survey.bim.xml_reader import iter_xml_elements
     
-    return elements
+    return list(iter_xml_elements(file_path))
 
 def import_excel_file(file_path: str, project: str) -> Dict:
     """Import Excel/CSV file with quantity data"""
     try:
-        import pandas as pd
-        
-        # Read the file
-        if file_path.endswith('.xlsx'):
-            df = pd.read_excel(file_path)
-        else:
-            df = pd.read_csv(file_path)
-        
-        elements = []
-        
-        # Map common column names
-        column_mapping = {
-            'item': 'name',
-            'description': 'name',
-            'element': 'name',
-            'type': 'element_type',
-            'category': 'element_type',
-            'qty': 'quantity',
-            'quantity': 'quantity',
-            'length': 'length',
-            'width': 'width',
-            'height': 'height',
-            'area': 'area',
-            'volume': 'volume',
-            'material': 'material',
-            'unit': 'unit',
-            'uom': 'unit'
-        }
-        
-        # Rename columns based on mapping
-        df.columns = [column_mapping.get(col.lower(), col.lower()) for col in df.columns]
-        
-        for index, row in df.iterrows():
-            element_data = {
-                'element_id': f'excel_item_{index}',
-                'element_type': str(row.get('element_type', 'ITEM')).upper(),
-                'name': str(row.get('name', f'Item_{index}')),
-                'material': str(row.get('material', '')),
-                'quantities': {},
-                'properties': {}
-            }
-            
-            # Extract quantities
-            qty_fields = ['quantity', 'length', 'width', 'height', 'area', 'volume', 'weight']
-            for field in qty_fields:
-                if field in row and pd.notna(row[field]):
-                    try:
-                        element_data['quantities'][field] = float(row[field])
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Add unit
-            if 'unit' in row and pd.notna(row['unit']):
-                element_data['quantities']['unit'] = str(row['unit'])
-            
-            # Add other properties
-            for col in df.columns:
-                if col not in ['name', 'element_type', 'material'] + qty_fields:
-                    if pd.notna(row[col]):
-                        element_data['properties'][col] = str(row[col])
-            
-            elements.append(element_data)
+        elements = extract_excel_elements(file_path)
         
         if elements:
             boq_doc = create_boq_from_bim_data(elements, project, 'Excel Import')
@@ -483,146 +533,191 @@ def import_excel_file(file_path: str, project: str) -> Dict:
     except Exception as e:
         return {'success': False, 'message': f'Excel import failed: {str(e)}'}
 
-def create_boq_from_bim_data(elements: List[Dict], project: str, import_source: str) -> object:
-    """Create BOQ document from BIM data"""
+# Sheet column name -> element field
+EXCEL_COLUMN_MAPPING = {
+    'item': 'name',
+    'description': 'name',
+    'element': 'name',
+    'type': 'element_type',
+    'category': 'element_type',
+    'qty': 'quantity',
+    'quantity': 'quantity',
+    'length': 'length',
+    'width': 'width',
+    'height': 'height',
+    'area': 'area',
+    'volume': 'volume',
+    'material': 'material',
+    'unit': 'unit',
+    'uom': 'unit'
+}
+
+EXCEL_QUANTITY_FIELDS = ['quantity', 'length', 'width', 'height', 'area', 'volume', 'weight']
+
+def extract_excel_elements(file_path: str) -> List[Dict]:
+    """Extract elements from an Excel/CSV quantity sheet"""
+    return list(iter_excel_elements(file_path))
+
+def iter_excel_elements(file_path: str):
+    """
+    Yield elements from an Excel/CSV quantity sheet, one chunk of rows at a time.
     
-    # Create BOQ document
-    boq_doc = melon.new_doc('BOQ')
-    boq_doc.project = project
-    boq_doc.boq_title = f'BIM Import - {import_source}'
-    boq_doc.description = f'Automatically generated from {import_source} on {melon.utils.now()}'
-    boq_doc.status = 'Draft'
+    Column mapping and numeric coercion are done per column for the whole
+    chunk; only the final element dicts are built row by row.
+    """
+    import pandas as pd
+    from quantity_survey.utils.sheet_import import iter_sheet_chunks, text_column
+    
+    for chunk in iter_sheet_chunks(file_path):
+        chunk.columns = [EXCEL_COLUMN_MAPPING.get(str(col).lower(), str(col).lower()) for col in chunk.columns]
+        # Several source columns can map to 'name'; the first one wins
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        
+        index = chunk.index
+        element_types = text_column(chunk, 'element_type', 'ITEM')
+        names = text_column(chunk, 'name', '')
+        materials = text_column(chunk, 'material', '')
+        
+        quantity_columns = []
+        for field in EXCEL_QUANTITY_FIELDS:
+            if field in chunk.columns:
+                values = pd.to_numeric(chunk[field], errors='coerce')
+                quantity_columns.append((field, values.to_numpy(dtype=float), values.notna().to_numpy()))
+        
+        units = None
+        if 'unit' in chunk.columns:
+            units = (text_column(chunk, 'unit'), chunk['unit'].notna().to_numpy())
+        
+        property_columns = [
+            (col, text_column(chunk, col), chunk[col].notna().to_numpy())
+            for col in chunk.columns
+            if col not in ['name', 'element_type', 'material'] + EXCEL_QUANTITY_FIELDS
+        ]
+        
+        for position, row_index in enumerate(index):
+            quantities = {
+                field: float(values[position])
+                for field, values, present in quantity_columns if present[position]
+            }
+            if units is not None and units[1][position]:
+                quantities['unit'] = units[0][position]
+            
+            yield {
+                'element_id': f'excel_item_{row_index}',
+                'element_type': element_types[position].upper(),
+                'name': names[position] or f'Item_{row_index}',
+                'material': materials[position],
+                'quantities': quantities,
+                'properties': {
+                    col: values[position]
+                    for col, values, present in property_columns if present[position]
+                }
+            }
+
+def create_boq_from_bim_data(elements: List[Dict], project: str, import_source: str,
+        aggregation: str = None) -> object:
+    """Create BOQ document from BIM data, optionally grouping elements into fewer lines"""
+    from quantity_survey.bim.aggregation import aggregate_boq_lines
+    from quantity_survey.bim.boq_builder import create_boq_bulk
+    from quantity_survey.bim.item_matcher import ItemMatchIndex
+    
+    # Item lookups are answered from memory for the whole import
+    match_index = ItemMatchIndex()
+    
+    lines = build_boq_lines(elements, match_index)
+    match_index.save()
+    
+    if aggregation:
+        lines = aggregate_boq_lines(lines, aggregation)
+    
+    # Rows are written in batches; the header is created first
+    return create_boq_bulk(
+        project,
+        f'BIM Import - {import_source}',
+        f'Automatically generated from {import_source} on {melon.utils.now()}',
+        lines,
+        aggregation=aggregation
+    )
+
+def build_boq_lines(elements: List[Dict], match_index) -> List[Dict]:
+    """Turn BIM elements into BoQ Item line dicts (rates are added on insert)"""
+    from quantity_survey.bim.element_batch import ElementBatch
     
-    # Process elements and create items
-    for element in elements:
+    lines = []
+    if not elements:
+        return lines
+    
+    # Primary quantities for all elements at once; zero-quantity elements are skipped
+    primary_quantities = ElementBatch.from_elements(elements).primary_quantities()
+    
+    for position in primary_quantities.nonzero()[0].tolist():
+        element = elements[position]
+        primary_qty = float(primary_quantities[position])
+        
         # Map BIM element to construction item
-        item_code = map_bim_element_to_item(element)
+        item_code = map_bim_element_to_item(element, match_index)
         
         if not item_code:
             continue  # Skip if no mapping found
         
-        # Calculate primary quantity
-        primary_qty = calculate_primary_quantity(element)
-        
-        if primary_qty == 0:
-            continue  # Skip if no quantity
-        
-        # Add item to BOQ
-        boq_item = boq_doc.append('boq_items', {})
-        boq_item.item_code = item_code
-        boq_item.item_name = element['name']
-        boq_item.description = f"{element['element_type']}: {element['name']}"
-        boq_item.quantity = primary_qty
-        boq_item.uom = element['quantities'].get('unit', 'Nos')
-        boq_item.rate = get_standard_rate(item_code)
-        boq_item.amount = boq_item.quantity * boq_item.rate
-        
-        # Add BIM metadata
-        boq_item.bim_element_id = element['element_id']
-        boq_item.bim_element_type = element['element_type']
-        
-        # Store additional quantities as JSON
-        if len(element['quantities']) > 1:
-            boq_item.additional_quantities = json.dumps(element['quantities'])
-        
-        # Store properties as JSON
-        if element['properties']:
-            boq_item.bim_properties = json.dumps(element['properties'])
-    
-    # Calculate totals
-    total_amount = sum(item.amount for item in boq_doc.boq_items)
-    boq_doc.total_amount = total_amount
-    
-    # Save BOQ
-    boq_doc.insert()
-    melon.db.commit()
+        lines.append({
+            'item_code': item_code,
+            'item_name': element['name'],
+            'description': f"{element['element_type']}: {element['name']}",
+            'quantity': primary_qty,
+            'uom': element['quantities'].get('unit', 'Nos'),
+            # BIM metadata
+            'bim_element_id': get_element_key(element),
+            'bim_element_type': element['element_type'],
+            # Grouping keys for aggregated imports (not stored per row)
+            'material': element.get('material') or '',
+            'storey': element.get('storey') or '',
+            'location_path': element.get('location_path') or None,
+            # Additional quantities and properties as JSON
+            'additional_quantities': json.dumps(element['quantities']) if len(element['quantities']) > 1 else None,
+            'bim_properties': json.dumps(element['properties']) if element['properties'] else None,
+            'bim_hash': get_element_hash(element)
+        })
+    
+    return lines
+
+def get_element_key(element: Dict) -> str:
+    """
+    Id an element keeps across exports of the same model.
     
-    return boq_doc
+    IFC elements are keyed by GlobalId, since STEP instance ids are
+    renumbered on every export; other formats by their own element id.
+    """
+    return str(element.get('global_id') or element['element_id'])
+
+def get_element_hash(element: Dict) -> str:
+    """Stable digest of everything an element contributes to its BoQ line"""
+    payload = [
+        element['element_type'],
+        element['name'],
+        element.get('material', ''),
+        element['quantities'],
+        element['properties']
+    ]
+    # Only located elements include their location, so other hashes are unchanged
+    if element.get('location_path'):
+        payload.append(element['location_path'])
+    
+    payload = json.dumps(payload, sort_keys=True, default=str)
+    
+    return hashlib.sha1(payload.encode()).hexdigest()
 
-def map_bim_element_to_item(element: Dict) -> str:
-    """Map BIM element to existing construction item"""
+def map_bim_element_to_item(element: Dict, match_index=None) -> str:
+    """Map BIM element to existing construction item, or its generic item"""
+    from quantity_survey.bim.item_matcher import ItemMatchIndex
     
-    element_type = element['element_type'].upper()
-    material = element.get('material', '').lower()
-    
-    # Define mapping rules
-    mapping_rules = {
-        'IFCWALL': ['WALL', 'MASONRY', 'CONCRETE WALL'],
-        'IFCWALLSTANDARDCASE': ['WALL', 'MASONRY', 'CONCRETE WALL'],
-        'IFCSLAB': ['SLAB', 'CONCRETE SLAB', 'FLOOR SLAB'],
-        'IFCBEAM': ['BEAM', 'CONCRETE BEAM', 'STEEL BEAM'],
-        'IFCCOLUMN': ['COLUMN', 'CONCRETE COLUMN', 'STEEL COLUMN'],
-        'IFCDOOR': ['DOOR', 'WOODEN DOOR', 'STEEL DOOR'],
-        'IFCWINDOW': ['WINDOW', 'GLASS WINDOW', 'ALUMINUM WINDOW'],
-        'IFCROOF': ['ROOF', 'ROOFING', 'ROOF SLAB'],
-        'IFCFOUNDATION': ['FOUNDATION', 'FOOTING', 'CONCRETE FOUNDATION']
-    }
+    if match_index is not None:
+        return match_index.match_or_generic(element)
     
-    # Get possible item names for this element type
-    possible_items = mapping_rules.get(element_type, [element_type])
-    
-    # Try to find matching item
-    for item_name in possible_items:
-        # Search for item with similar name
-        items = melon.db.get_all('Item', 
-            filters={
-                'item_name': ['like', f'%{item_name}%'],
-                'is_construction_item': 1,
-                'disabled': 0
-            },
-            fields=['item_code', 'item_name'],
-            limit=1
-        )
-        
-        if items:
-            return items[0].item_code
-    
-    # If no exact match, try by material
-    if material:
-        material_keywords = ['concrete', 'steel', 'wood', 'brick', 'block']
-        for keyword in material_keywords:
-            if keyword in material:
-                items = melon.db.get_all('Item',
-                    filters={
-                        'item_name': ['like', f'%{keyword}%'],
-                        'is_construction_item': 1,
-                        'disabled': 0
-                    },
-                    fields=['item_code'],
-                    limit=1
-                )
-                if items:
-                    return items[0].item_code
-    
-    # Last resort: create a generic item
-    return create_generic_construction_item(element)
-
-def create_generic_construction_item(element: Dict) -> str:
-    """Create a generic construction item for unmapped BIM elements"""
-    
-    item_code = f"BIM_{element['element_type']}_{melon.utils.random_string(5)}"
-    
-    # Check if item already exists
-    if melon.db.exists('Item', item_code):
-        return item_code
-    
-    # Create new item
-    item_doc = melon.new_doc('Item')
-    item_doc.item_code = item_code
-    item_doc.item_name = f"{element['element_type']}: {element['name']}"
-    item_doc.item_group = 'Construction Materials'
-    item_doc.is_construction_item = 1
-    item_doc.stock_uom = element['quantities'].get('unit', 'Nos')
-    item_doc.description = f"Imported from BIM model: {element['element_type']}"
-    item_doc.standard_rate = 0  # Will be set later
-    
-    # Add BIM metadata
-    item_doc.bim_element_type = element['element_type']
-    if element.get('material'):
-        item_doc.material_type = element['material']
-    
-    item_doc.insert(ignore_permissions=True)
-    melon.db.commit()
+    # One-off lookup: persist anything it created straight away
+    match_index = ItemMatchIndex()
+    item_code = match_index.match_or_generic(element)
+    match_index.save()
     
     return item_code
 
@@ -654,11 +749,7 @@ def calculate_primary_quantity(element: Dict) -> float:
 
 def get_standard_rate(item_code: str) -> float:
     """Get standard rate for an item"""
-    try:
-        item = melon.get_doc('Item', item_code)
-        return flt(item.standard_rate)
-    except:
-        return 0.0
+    return flt(melon.get_cached_value('Item', item_code, 'standard_rate'))
 
 @melon.whitelist()
 def get_bim_import_template() -> str:
@@ -0,0 +1,296 @@
+"""
+Item Matcher Module
+In-memory index for mapping BIM elements to construction Items
+"""
+
+import melon
+from melon.utils import now
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import re
+
+# Item name keywords tried, in order, for each element type
+BIM_ITEM_MAPPING_RULES = {
+    'IFCWALL': ['WALL', 'MASONRY', 'CONCRETE WALL'],
+    'IFCWALLSTANDARDCASE': ['WALL', 'MASONRY', 'CONCRETE WALL'],
+    'IFCSLAB': ['SLAB', 'CONCRETE SLAB', 'FLOOR SLAB'],
+    'IFCBEAM': ['BEAM', 'CONCRETE BEAM', 'STEEL BEAM'],
+    'IFCCOLUMN': ['COLUMN', 'CONCRETE COLUMN', 'STEEL COLUMN'],
+    'IFCDOOR': ['DOOR', 'WOODEN DOOR', 'STEEL DOOR'],
+    'IFCWINDOW': ['WINDOW', 'GLASS WINDOW', 'ALUMINUM WINDOW'],
+    'IFCROOF': ['ROOF', 'ROOFING', 'ROOF SLAB'],
+    'IFCFOUNDATION': ['FOUNDATION', 'FOOTING', 'CONCRETE FOUNDATION']
+}
+
+# Material keywords tried when no element type rule matches
+MATERIAL_KEYWORDS = ['concrete', 'steel', 'wood', 'brick', 'block']
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# An IfcMaterial entity repr, e.g. #1234=IfcMaterial('Concrete',$,$)
+MATERIAL_REPR_PATTERN = re.compile(r"^#\d+=IfcMaterial\('((?:[^']|'')*)'", re.IGNORECASE)
+
+# Prefix of the canonical generic Items created for unmapped elements
+GENERIC_ITEM_PREFIX = 'BIM-GEN'
+
+GENERIC_ITEM_GROUP = 'Construction Materials'
+
+
+class ItemMatchIndex:
+    """
+    Per-import lookup structure over construction Items.
+
+    Loads every active construction Item and every BIM Item Mapping once,
+    then answers element -> item_code lookups from memory. Successful rule
+    matches are remembered and written back in one batch by save().
+
+    Elements that match nothing share one generic Item per
+    (element_type, material, uom). Its code is derived from that key, so
+    every import resolves to the same Item and only the first one creates it.
+    """
+
+    def __init__(self):
+        self.item_codes: List[str] = []
+        self.item_names: List[str] = []
+        self.token_index: Dict[str, Set[int]] = {}
+        self.trigram_index: Dict[str, Set[int]] = {}
+        self.learned: Dict[Tuple[str, str, str], str] = {}
+        self.new_mappings: Dict[Tuple[str, str, str], str] = {}
+        self.keyword_cache: Dict[str, Optional[str]] = {}
+        self.pending_generic_items: Dict[str, Tuple[str, str, str]] = {}
+
+        self.load_items()
+        self.load_learned_mappings()
+
+    def load_items(self):
+        """Build token and trigram postings over construction item names"""
+        items = melon.db.get_all('Item',
+            filters={'is_construction_item': 1, 'disabled': 0},
+            fields=['item_code', 'item_name'],
+            order_by='modified desc'
+        )
+
+        # Generic fallbacks are never rule candidates
+        items = [item for item in items if not item.item_code.startswith(GENERIC_ITEM_PREFIX)]
+
+        for position, item in enumerate(items):
+            name = (item.item_name or '').lower()
+            self.item_codes.append(item.item_code)
+            self.item_names.append(name)
+
+            for token in TOKEN_PATTERN.findall(name):
+                self.token_index.setdefault(token, set()).add(position)
+
+            for trigram in get_trigrams(name):
+                self.trigram_index.setdefault(trigram, set()).add(position)
+
+    def load_learned_mappings(self):
+        """
+        Load persisted (element_type, material, uom) -> item_code mappings.
+
+        Manual mappings are applied after Learned ones, so a user override
+        wins over anything an import learned for the same key.
+        """
+        active_items = set(self.item_codes)
+
+        mappings = melon.db.get_all('BIM Item Mapping',
+            fields=['element_type', 'material', 'uom', 'item_code', 'mapping_source'],
+            order_by='modified asc'
+        )
+        mappings.sort(key=lambda mapping: mapping.mapping_source == 'Manual')
+
+        for mapping in mappings:
+            if mapping.item_code in active_items:
+                key = (mapping.element_type, mapping.material or '', mapping.uom or '')
+                self.learned[key] = mapping.item_code
+
+    def match(self, element: Dict) -> Optional[str]:
+        """Return the item_code for an element, or None if nothing matches"""
+        key = get_mapping_key(element)
+
+        item_code = self.learned.get(key)
+        if item_code:
+            return item_code
+
+        item_code = self.match_by_rules(key[0], key[1])
+        if item_code:
+            self.learned[key] = item_code
+            self.new_mappings[key] = item_code
+
+        return item_code
+
+    def match_or_generic(self, element: Dict) -> str:
+        """Matched item_code, falling back to the element's generic Item"""
+        item_code = self.match(element)
+        if item_code:
+            return item_code
+
+        key = get_mapping_key(element)
+        item_code = get_generic_item_code(key)
+
+        # Generic fallbacks are not persisted as mappings, so a matching
+        # Item added later wins on the next import
+        self.learned[key] = item_code
+        self.pending_generic_items[item_code] = key
+
+        return item_code
+
+    def match_by_rules(self, element_type: str, material: str) -> Optional[str]:
+        """Apply the element type and material keyword rules"""
+        for keyword in BIM_ITEM_MAPPING_RULES.get(element_type, [element_type]):
+            item_code = self.find_by_keyword(keyword)
+            if item_code:
+                return item_code
+
+        if material:
+            for keyword in MATERIAL_KEYWORDS:
+                if keyword in material:
+                    item_code = self.find_by_keyword(keyword)
+                    if item_code:
+                        return item_code
+
+        return None
+
+    def find_by_keyword(self, keyword: str) -> Optional[str]:
+        """First item whose name contains keyword, preferring whole-word matches"""
+        keyword = keyword.lower()
+        if keyword in self.keyword_cache:
+            return self.keyword_cache[keyword]
+
+        candidates = self.get_candidates(keyword)
+        item_code = None
+
+        # Positions follow the query order, so the lowest matching one wins
+        for position in sorted(candidates):
+            if keyword in self.item_names[position]:
+                item_code = self.item_codes[position]
+                break
+
+        self.keyword_cache[keyword] = item_code
+        return item_code
+
+    def get_candidates(self, keyword: str):
+        """Narrow the item positions that could contain keyword"""
+        tokens = TOKEN_PATTERN.findall(keyword)
+
+        # Whole-word hits via the token index are the common case
+        if tokens and all(token in self.token_index for token in tokens):
+            word_hits = set.intersection(*(self.token_index[token] for token in tokens))
+            if word_hits:
+                return word_hits
+
+        # Substring hits (e.g. 'wall' in 'drywall') via trigram postings
+        trigrams = get_trigrams(keyword)
+        if not trigrams:
+            return range(len(self.item_names))
+
+        postings = [self.trigram_index.get(trigram) for trigram in trigrams]
+        if not all(postings):
+            return set()
+
+        return set.intersection(*postings)
+
+    def save(self):
+        """
+        Create pending generic Items and persist learned mappings (no commit).
+
+        Keys already mapped, by a concurrent import or by hand, are skipped
+        by the unique (element_type, material, uom) index.
+        """
+        self.create_generic_items()
+
+        if not self.new_mappings:
+            return
+
+        timestamp = now()
+        user = melon.session.user
+        values = [
+            (melon.generate_hash(length=10), timestamp, timestamp, user, user,
+             element_type, material, uom, item_code, 'Learned')
+            for (element_type, material, uom), item_code in self.new_mappings.items()
+        ]
+
+        melon.db.bulk_insert('BIM Item Mapping',
+            fields=['name', 'creation', 'modified', 'owner', 'modified_by',
+                'element_type', 'material', 'uom', 'item_code', 'mapping_source'],
+            values=values,
+            ignore_duplicates=True
+        )
+        self.new_mappings = {}
+
+    def create_generic_items(self):
+        """Insert the generic Items referenced since the last save that do not exist yet"""
+        if not self.pending_generic_items:
+            return
+
+        existing = set(melon.db.get_all('Item',
+            filters={'name': ['in', list(self.pending_generic_items)]},
+            pluck='name'
+        ))
+
+        for item_code, key in self.pending_generic_items.items():
+            if item_code not in existing:
+                create_generic_item(item_code, *key)
+
+        self.pending_generic_items = {}
+
+
+def get_mapping_key(element: Dict) -> Tuple[str, str, str]:
+    """Normalised (element_type, material, uom) key for an element"""
+    return (
+        (element.get('element_type') or '').strip().upper(),
+        get_material_name(element.get('material')).strip().lower(),
+        (element.get('quantities', {}).get('unit') or 'Nos').strip()
+    )
+
+
+def get_material_name(material) -> str:
+    """
+    Material name of an element.
+
+    Elements parsed before materials were keyed on their name may still
+    carry the IfcMaterial repr, whose STEP id changes with every export.
+    """
+    match = MATERIAL_REPR_PATTERN.match(material or '')
+    if match:
+        return match.group(1).replace("''", "'")
+    return material or ''
+
+
+def get_generic_item_code(key: Tuple[str, str, str]) -> str:
+    """
+    Deterministic Item code for an (element_type, material, uom) key.
+
+    The key holds the material name, so the code is stable across exports.
+    """
+    element_type = re.sub(r'[^A-Z0-9]+', '_', key[0]).strip('_')[:40] or 'ELEMENT'
+    digest = hashlib.sha1('|'.join(key).encode()).hexdigest()[:8].upper()
+    return f'{GENERIC_ITEM_PREFIX}-{element_type}-{digest}'
+
+
+def create_generic_item(item_code: str, element_type: str, material: str, uom: str):
+    """Insert one generic construction Item"""
+    item_doc = melon.new_doc('Item')
+    item_doc.item_code = item_code
+    item_doc.item_name = f"{element_type}: {material} ({uom})" if material else f"{element_type} ({uom})"
+    item_doc.item_group = GENERIC_ITEM_GROUP
+    item_doc.is_construction_item = 1
+    item_doc.stock_uom = uom
+    item_doc.description = f"Generic item for unmapped BIM elements of type {element_type}"
+    item_doc.standard_rate = 0  # Will be set later
+
+    # Add BIM metadata
+    item_doc.bim_element_type = element_type
+    if material:
+        item_doc.material_type = material
+
+    try:
+        item_doc.insert(ignore_permissions=True)
+    except melon.DuplicateEntryError:
+        # Created by a concurrent import
+        pass
+
+
+def get_trigrams(text: str) -> Set[str]:
+    """Character trigrams of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
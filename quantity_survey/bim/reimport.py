@@ -0,0 +1,261 @@
+"""
+BIM Re-import Module
+Applies a re-issued model to an existing BoQ by diffing on element key
+"""
+
+import melon
+from melon import _
+from melon.utils import flt, now
+from typing import Dict, List, Tuple
+import os
+
+from quantity_survey.bim.boq_builder import append_boq_items, refresh_boq_totals
+from quantity_survey.bim.integrator import (
+    build_boq_lines, extract_bim_elements, get_element_hash, get_element_key
+)
+
+# Number of individual changes listed in the returned summary
+CHANGE_DETAIL_LIMIT = 100
+
+# Rows per UPDATE/DELETE statement
+WRITE_CHUNK_SIZE = 1000
+
+# BoQ Item fields a re-import rewrites on changed rows; item, description and rate are the QS's
+BOQ_ITEM_REIMPORT_FIELDS = [
+    'quantity', 'bim_element_type', 'location_path', 'additional_quantities', 'bim_properties', 'bim_hash',
+    'bim_element_count', 'bim_element_ids'
+]
+
+
+@melon.whitelist()
+def reimport_bim_file(file_path: str, file_type: str, boq: str) -> Dict:
+    """
+    Re-import a model into an existing draft BoQ.
+
+    Elements are matched to BoQ rows by bim_element_id, which holds the IFC
+    GlobalId (see get_element_key), and compared by content hash; only
+    added, changed and removed rows are written. Changed rows keep their
+    item and rate, and only their quantities and BIM data are replaced. An
+    unchanged model performs no writes at all. BoQs imported with an
+    aggregation mode are diffed by group instead of by element.
+    """
+    try:
+        if not os.path.exists(file_path):
+            return {'success': False, 'message': 'File not found'}
+
+        boq_info = melon.db.get_value('BoQ', boq, ['docstatus', 'bim_aggregation'], as_dict=True)
+        if not boq_info:
+            return {'success': False, 'message': _('BoQ {0} not found').format(boq)}
+        if boq_info.docstatus != 0:
+            return {'success': False, 'message': _('Only draft BoQs can be re-imported')}
+        if not melon.has_permission('BoQ', 'write', boq):
+            return {'success': False, 'message': _('Access denied')}
+
+        elements = extract_bim_elements(file_path, file_type)
+
+        if boq_info.bim_aggregation:
+            summary = apply_aggregated_reimport(boq, elements, boq_info.bim_aggregation)
+        else:
+            diff = diff_bim_elements(boq, elements)
+            summary = apply_bim_diff(boq, diff)
+
+        return {
+            'success': True,
+            'message': _('Re-import complete: {0} added, {1} changed, {2} removed, {3} unchanged').format(
+                summary['added'], summary['changed'], summary['removed'], summary['unchanged']
+            ),
+            'boq': boq,
+            'elements_count': len(elements),
+            'summary': summary
+        }
+
+    except Exception as e:
+        melon.log_error(f"BIM re-import error: {str(e)}", "BIM Integrator")
+        return {'success': False, 'message': f'Re-import failed: {str(e)}'}
+
+
+def diff_bim_elements(boq: str, elements: List[Dict]) -> Dict:
+    """Split elements into added, changed, removed and unchanged sets in one pass"""
+    existing_rows = get_existing_rows(boq)
+
+    existing = {row.bim_element_id: row for row in existing_rows if row.bim_element_id}
+    seen = set()
+
+    added = []
+    changed = []
+    unchanged = 0
+
+    for element in elements:
+        element_id = get_element_key(element)
+        if element_id in seen:
+            continue
+        seen.add(element_id)
+
+        row = existing.get(element_id)
+        if row is None:
+            added.append(element)
+        elif row.bim_hash != get_element_hash(element):
+            changed.append((row, element))
+        else:
+            unchanged += 1
+
+    return {
+        'added': added,
+        'changed': changed,
+        'removed': [row for element_id, row in existing.items() if element_id not in seen],
+        'unchanged': unchanged,
+        'max_idx': max((row.idx for row in existing_rows), default=0)
+    }
+
+
+def get_existing_rows(boq: str) -> List[Dict]:
+    return melon.db.get_all('BoQ Item',
+        filters={'parent': boq, 'parenttype': 'BoQ'},
+        fields=['name', 'idx', 'bim_element_id', 'bim_hash', 'quantity', 'rate'],
+        order_by='idx asc'
+    )
+
+
+def apply_bim_diff(boq: str, diff: Dict) -> Dict:
+    """Write only the rows that differ and return a change summary"""
+    summary = new_summary(diff['unchanged'])
+
+    if not (diff['added'] or diff['changed'] or diff['removed']):
+        return summary
+
+    from quantity_survey.bim.item_matcher import ItemMatchIndex
+
+    match_index = ItemMatchIndex()
+    removed_rows = list(diff['removed'])
+
+    # Changed rows are rewritten in place; ones that no longer yield a line are removed
+    changed_lines = {
+        line['bim_element_id']: line
+        for line in build_boq_lines([element for row, element in diff['changed']], match_index)
+    }
+
+    updates = []
+    for row, element in diff['changed']:
+        line = changed_lines.get(get_element_key(element))
+        if not line:
+            removed_rows.append(row)
+            continue
+
+        updates.append((row, line))
+        record_change(summary, 'changed', line['bim_element_id'], row.quantity, line['quantity'])
+
+    added_lines = build_boq_lines(diff['added'], match_index)
+    match_index.save()
+
+    write_boq_changes(boq, updates, removed_rows, added_lines, diff['max_idx'], summary)
+    return summary
+
+
+def apply_aggregated_reimport(boq: str, elements: List[Dict], aggregation: str) -> Dict:
+    """
+    Re-import into a grouped BoQ.
+
+    Every element has to be mapped to know its group, so lines are rebuilt
+    and aggregated in full; only the group rows whose id or hash differs are
+    written.
+    """
+    from quantity_survey.bim.aggregation import aggregate_boq_lines
+    from quantity_survey.bim.item_matcher import ItemMatchIndex
+
+    match_index = ItemMatchIndex()
+    lines = aggregate_boq_lines(build_boq_lines(elements, match_index), aggregation)
+    match_index.save()
+
+    existing_rows = get_existing_rows(boq)
+    existing = {row.bim_element_id: row for row in existing_rows if row.bim_element_id}
+    summary = new_summary(0)
+
+    updates = []
+    added_lines = []
+    seen = set()
+
+    for line in lines:
+        seen.add(line['bim_element_id'])
+        row = existing.get(line['bim_element_id'])
+        if row is None:
+            added_lines.append(line)
+        elif row.bim_hash != line['bim_hash']:
+            updates.append((row, line))
+            record_change(summary, 'changed', line['bim_element_id'], row.quantity, line['quantity'])
+        else:
+            summary['unchanged'] += 1
+
+    removed_rows = [row for element_id, row in existing.items() if element_id not in seen]
+    max_idx = max((row.idx for row in existing_rows), default=0)
+
+    write_boq_changes(boq, updates, removed_rows, added_lines, max_idx, summary)
+    return summary
+
+
+def new_summary(unchanged: int) -> Dict:
+    return {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': unchanged, 'changes': []}
+
+
+def write_boq_changes(boq: str, updates: List[Tuple[Dict, Dict]], removed_rows: List[Dict],
+        added_lines: List[Dict], max_idx: int, summary: Dict):
+    """
+    Rewrite changed rows, delete removed ones, append added lines, then refresh totals.
+
+    updates pairs each changed row with its new line. Amounts of changed
+    rows are recomputed from the rate already on the row.
+    """
+    row_values = {}
+    for row, line in updates:
+        row_values[row.name] = dict(
+            {field: line.get(field) for field in BOQ_ITEM_REIMPORT_FIELDS},
+            amount=flt(line['quantity']) * flt(row.rate)
+        )
+
+    for start in range(0, len(row_values), WRITE_CHUNK_SIZE):
+        chunk = dict(list(row_values.items())[start:start + WRITE_CHUNK_SIZE])
+        melon.db.bulk_update('BoQ Item', chunk, chunk_size=WRITE_CHUNK_SIZE)
+    summary['changed'] = len(row_values)
+
+    removed_names = [row.name for row in removed_rows]
+    for start in range(0, len(removed_names), WRITE_CHUNK_SIZE):
+        melon.db.delete('BoQ Item', {'name': ['in', removed_names[start:start + WRITE_CHUNK_SIZE]]})
+    for row in removed_rows:
+        record_change(summary, 'removed', row.bim_element_id, row.quantity, 0)
+    summary['removed'] = len(removed_rows)
+
+    append_boq_items(boq, added_lines, start_idx=max_idx, commit=False)
+    for line in added_lines:
+        record_change(summary, 'added', line['bim_element_id'], 0, line['quantity'])
+    summary['added'] = len(added_lines)
+
+    if summary['added'] or summary['changed'] or summary['removed']:
+        refresh_boq_totals(boq)
+        melon.db.set_value('BoQ', boq, {'modified': now(), 'modified_by': melon.session.user},
+            update_modified=False)
+        add_reimport_comment(boq, summary)
+
+    melon.db.commit()
+
+
+def record_change(summary: Dict, change: str, element_id: str, old_quantity: float, new_quantity: float):
+    """Keep the first few individual changes for display"""
+    if len(summary['changes']) < CHANGE_DETAIL_LIMIT:
+        summary['changes'].append({
+            'element_id': element_id,
+            'change': change,
+            'old_quantity': flt(old_quantity),
+            'new_quantity': flt(new_quantity)
+        })
+
+
+def add_reimport_comment(boq: str, summary: Dict):
+    """Leave the change summary on the BoQ timeline"""
+    melon.get_doc({
+        'doctype': 'Comment',
+        'comment_type': 'Info',
+        'reference_doctype': 'BoQ',
+        'reference_name': boq,
+        'content': _('BIM re-import: {0} added, {1} changed, {2} removed, {3} unchanged').format(
+            summary['added'], summary['changed'], summary['removed'], summary['unchanged']
+        )
+    }).insert(ignore_permissions=True)
@@ -0,0 +1,160 @@
+"""
+Spatial Index Module
+Element -> site / building / storey / space lookup built while an IFC model is read
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+# Spatial structure entities that can hold elements
+SPATIAL_STRUCTURE_TYPES = {'IFCPROJECT', 'IFCSITE', 'IFCBUILDING', 'IFCBUILDINGSTOREY', 'IFCSPACE'}
+
+# Everything the fallback parser has to feed into the index
+SPATIAL_INDEX_TYPES = SPATIAL_STRUCTURE_TYPES | {'IFCRELAGGREGATES', 'IFCRELCONTAINEDINSPATIALSTRUCTURE'}
+
+SPATIAL_TYPE_LABELS = {
+    'IFCPROJECT': 'Project',
+    'IFCSITE': 'Site',
+    'IFCBUILDING': 'Building',
+    'IFCBUILDINGSTOREY': 'Storey',
+    'IFCSPACE': 'Space'
+}
+
+LOCATION_PATH_SEPARATOR = ' / '
+
+# Length of the BoQ Item location_path Data field
+LOCATION_PATH_LENGTH = 140
+
+
+class SpatialIndex:
+    """
+    Containment and decomposition relationships of one model.
+
+    Elements are placed through IfcRelContainedInSpatialStructure, or
+    through the whole they are aggregated into (a stair flight takes its
+    stair's location). Containers are chained upwards through
+    IfcRelAggregates to give paths like 'Site / Tower A / Level 03'. The
+    project itself is left out of paths.
+    """
+
+    def __init__(self):
+        self.containers: Dict[int, Tuple[str, str]] = {}
+        self.parents: Dict[int, int] = {}
+        self.contained_in: Dict[int, int] = {}
+        self.container_locations: Dict[int, Tuple[str, str]] = {}
+
+    def add_entity(self, entity_id: int, entity_type: str, args: List):
+        """Feed one decoded STEP instance of a SPATIAL_INDEX_TYPES type"""
+        if entity_type in SPATIAL_STRUCTURE_TYPES:
+            # (GlobalId, OwnerHistory, Name, Description, ObjectType, ObjectPlacement, Representation, LongName, ...)
+            name = args[2] if len(args) > 2 and isinstance(args[2], str) else ''
+            long_name = args[7] if len(args) > 7 and isinstance(args[7], str) else ''
+            self.add_container(entity_id, entity_type, name or long_name)
+
+        elif entity_type == 'IFCRELAGGREGATES':
+            # (GlobalId, OwnerHistory, Name, Description, RelatingObject, RelatedObjects)
+            if len(args) >= 6 and isinstance(args[5], list) and args[4] is not None:
+                for part in args[5]:
+                    self.parents[int(part)] = int(args[4])
+
+        elif entity_type == 'IFCRELCONTAINEDINSPATIALSTRUCTURE':
+            # (GlobalId, OwnerHistory, Name, Description, RelatedElements, RelatingStructure)
+            if len(args) >= 6 and isinstance(args[4], list) and args[5] is not None:
+                for element in args[4]:
+                    self.contained_in[int(element)] = int(args[5])
+
+    def add_container(self, container_id: int, container_type: str, name: str):
+        label = SPATIAL_TYPE_LABELS.get(container_type, container_type)
+        self.containers[container_id] = (container_type, name or f'{label} {container_id}')
+
+    @classmethod
+    def from_ifc_file(cls, ifc_file) -> 'SpatialIndex':
+        """Build the index from an IfcOpenShell file"""
+        index = cls()
+
+        for structure in ifc_file.by_type('IfcSpatialStructureElement'):
+            index.add_container(structure.id(), structure.is_a().upper(),
+                structure.Name or getattr(structure, 'LongName', None) or '')
+
+        for rel in ifc_file.by_type('IfcRelAggregates'):
+            for part in rel.RelatedObjects or []:
+                index.parents[part.id()] = rel.RelatingObject.id()
+
+        for rel in ifc_file.by_type('IfcRelContainedInSpatialStructure'):
+            for element in rel.RelatedElements or []:
+                index.contained_in[element.id()] = rel.RelatingStructure.id()
+
+        return index
+
+    def locate(self, element_id: int) -> Tuple[str, str]:
+        """(location_path, storey name) of an element; empty strings if it is not placed"""
+        container = self.find_container(element_id)
+        if container is None:
+            return '', ''
+        return self.get_container_location(container)
+
+    def find_container(self, element_id: int) -> Optional[int]:
+        current = element_id
+        seen = set()
+
+        while current is not None and current not in seen:
+            seen.add(current)
+            if current in self.contained_in:
+                return self.contained_in[current]
+            if current != element_id and current in self.containers:
+                return current
+            current = self.parents.get(current)
+
+        return None
+
+    def get_container_location(self, container: int) -> Tuple[str, str]:
+        """Path and storey for a container, memoised"""
+        if container in self.container_locations:
+            return self.container_locations[container]
+
+        names = []
+        storey = ''
+        current = container
+        seen = set()
+
+        while current is not None and current not in seen:
+            seen.add(current)
+            entry = self.containers.get(current)
+            if entry:
+                container_type, name = entry
+                if container_type != 'IFCPROJECT':
+                    names.append(name)
+                if container_type == 'IFCBUILDINGSTOREY' and not storey:
+                    storey = name
+            current = self.parents.get(current)
+
+        location = (get_location_path(list(reversed(names))), storey)
+        self.container_locations[container] = location
+        return location
+
+    def tag_elements(self, elements: List[Dict]) -> List[Dict]:
+        """Set location_path and storey on element dicts"""
+        for element in elements:
+            element['location_path'], element['storey'] = self.locate(int(element['element_id']))
+        return elements
+
+
+def get_location_path(names: List[str]) -> str:
+    """Container names joined outermost first, dropping whole trailing segments until it fits"""
+    while len(names) > 1 and len(LOCATION_PATH_SEPARATOR.join(names)) > LOCATION_PATH_LENGTH:
+        names = names[:-1]
+    return LOCATION_PATH_SEPARATOR.join(names)[:LOCATION_PATH_LENGTH]
+
+
+def get_common_location(paths: List[str]) -> str:
+    """Deepest location shared by all paths"""
+    if not paths:
+        return ''
+
+    split_paths = [(path or '').split(LOCATION_PATH_SEPARATOR) for path in paths]
+    common = []
+    for parts in zip(*split_paths):
+        if any(part != parts[0] for part in parts):
+            break
+        common.append(parts[0])
+
+    return LOCATION_PATH_SEPARATOR.join(common)
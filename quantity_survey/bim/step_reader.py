@@ -0,0 +1,209 @@
+"""
+STEP Reader Module
+Streaming tokenizer for ISO 10303-21 (STEP) files such as IFC models
+"""
+
+import mmap
+import re
+from typing import Iterator, List, Optional, Set, Tuple, Any
+
+# One DATA-section instance: #id = TYPE ( args ) ;
+# Arguments may span lines and contain ';' or ')' only inside quoted strings,
+# so the argument body is "anything but quote/semicolon, or a quoted string".
+# A quoted string ('' is an escaped quote) can only be split one way, so a
+# malformed or unterminated one fails fast instead of backtracking.
+ENTITY_PATTERN = re.compile(
+    rb"#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\(((?:[^';]|'[^']*(?:''[^']*)*'(?!'))*)\)\s*;"
+)
+
+DATA_SECTION_PATTERN = re.compile(rb"\bDATA\s*;")
+
+# IfcBuildingElement subtypes recognised by the fallback parser
+BUILDING_ELEMENT_TYPES = {
+    'IFCBEAM', 'IFCBEAMSTANDARDCASE',
+    'IFCBUILDINGELEMENTPROXY',
+    'IFCCHIMNEY',
+    'IFCCOLUMN', 'IFCCOLUMNSTANDARDCASE',
+    'IFCCOVERING',
+    'IFCCURTAINWALL',
+    'IFCDOOR', 'IFCDOORSTANDARDCASE',
+    'IFCFOOTING',
+    'IFCMEMBER', 'IFCMEMBERSTANDARDCASE',
+    'IFCPILE',
+    'IFCPLATE', 'IFCPLATESTANDARDCASE',
+    'IFCRAILING',
+    'IFCRAMP', 'IFCRAMPFLIGHT',
+    'IFCROOF',
+    'IFCSHADINGDEVICE',
+    'IFCSLAB', 'IFCSLABELEMENTEDCASE', 'IFCSLABSTANDARDCASE',
+    'IFCSTAIR', 'IFCSTAIRFLIGHT',
+    'IFCWALL', 'IFCWALLELEMENTEDCASE', 'IFCWALLSTANDARDCASE',
+    'IFCWINDOW', 'IFCWINDOWSTANDARDCASE',
+}
+
+
+class StepRef(int):
+    """Reference to another instance (#id) inside a STEP argument list"""
+
+    def __repr__(self):
+        return f"#{int(self)}"
+
+
+class StepFile:
+    """
+    Memory-mapped STEP file that can be scanned and then read back by offset.
+
+    iter_entities yields the byte span of each instance's arguments instead
+    of the decoded text, so callers can remember where an instance is and
+    decode it later with read_arguments, without holding its text. The map
+    stays open until close().
+    """
+
+    def __init__(self, file_path: str):
+        self.file = open(file_path, 'rb')
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file cannot be mapped
+            self.mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.file.close()
+
+    def iter_entities(self, entity_types: Optional[Set[str]] = None) -> Iterator[Tuple[int, str, int, int]]:
+        """
+        Yield (id, entity_type, args_start, args_end) for every instance in the DATA section.
+
+        When entity_types is given, only those (upper-case) types are yielded.
+        """
+        if self.mm is None:
+            return
+
+        data_start = DATA_SECTION_PATTERN.search(self.mm)
+        start = data_start.end() if data_start else 0
+
+        for match in ENTITY_PATTERN.finditer(self.mm, start):
+            entity_type = match.group(2).decode('ascii').upper()
+            if entity_types is not None and entity_type not in entity_types:
+                continue
+
+            yield int(match.group(1)), entity_type, match.start(3), match.end(3)
+
+    def read_arguments(self, start: int, end: int) -> str:
+        """Raw argument text of an instance from its span"""
+        return self.mm[start:end].decode('utf-8', errors='ignore')
+
+
+def iter_step_entities(file_path: str, entity_types: Optional[Set[str]] = None) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yield (id, entity_type, raw_args) for every instance in the DATA section.
+
+    The file is memory-mapped and scanned once, so memory stays constant
+    regardless of model size. When entity_types is given, only those
+    (upper-case) types are decoded and yielded.
+    """
+    with StepFile(file_path) as step_file:
+        for entity_id, entity_type, start, end in step_file.iter_entities(entity_types):
+            yield entity_id, entity_type, step_file.read_arguments(start, end)
+
+
+def parse_step_arguments(raw_args: str) -> List[Any]:
+    """
+    Parse a raw STEP argument string into Python values.
+
+    Strings become str, numbers int/float, '$' and '*' None, references
+    StepRef, enumerations their bare label (e.g. 'T'), typed values such as
+    IFCLABEL('x') their inner value, and nested lists Python lists.
+    """
+    values, _ = _parse_argument_list(raw_args, 0, len(raw_args))
+    return values
+
+
+def _parse_argument_list(text: str, pos: int, end: int) -> Tuple[List[Any], int]:
+    """Parse comma-separated values until a closing ')' or end of text"""
+    values = []
+
+    while pos < end:
+        char = text[pos]
+
+        if char in ' \t\r\n,':
+            pos += 1
+
+        elif char == ')':
+            return values, pos + 1
+
+        elif char == "'":
+            close = pos + 1
+            while True:
+                close = text.find("'", close)
+                if close == -1:
+                    close = end
+                    break
+                if close + 1 < end and text[close + 1] == "'":
+                    close += 2
+                    continue
+                break
+            values.append(text[pos + 1:close].replace("''", "'"))
+            pos = close + 1
+
+        elif char == '(':
+            nested, pos = _parse_argument_list(text, pos + 1, end)
+            values.append(nested)
+
+        elif char == '#':
+            token_end = _token_end(text, pos + 1, end)
+            values.append(StepRef(text[pos + 1:token_end]))
+            pos = token_end
+
+        elif char in '$*':
+            values.append(None)
+            pos += 1
+
+        elif char == '.':
+            close = text.find('.', pos + 1)
+            close = end if close == -1 else close
+            values.append(text[pos + 1:close])
+            pos = close + 1
+
+        elif char.isalpha():
+            # Typed value, e.g. IFCLENGTHMEASURE(2.5)
+            token_end = _token_end(text, pos, end)
+            if token_end < end and text[token_end] == '(':
+                inner, pos = _parse_argument_list(text, token_end + 1, end)
+                values.append(inner[0] if len(inner) == 1 else inner)
+            else:
+                values.append(text[pos:token_end])
+                pos = token_end
+
+        else:
+            token_end = _token_end(text, pos, end)
+            values.append(_parse_number(text[pos:token_end]))
+            pos = token_end
+
+    return values, pos
+
+
+def _token_end(text: str, pos: int, end: int) -> int:
+    """Return the index just past an unquoted token"""
+    while pos < end and text[pos] not in ',)( \t\r\n':
+        pos += 1
+    return pos
+
+
+def _parse_number(token: str) -> Any:
+    """Convert a numeric STEP token to int or float"""
+    try:
+        if '.' in token or 'E' in token or 'e' in token:
+            return float(token)
+        return int(token)
+    except ValueError:
+        return token
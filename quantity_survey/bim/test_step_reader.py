@@ -0,0 +1,53 @@
+"""
+Tests for the streaming STEP reader
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from quantity_survey.bim.step_reader import iter_step_entities, parse_step_arguments
+
+
+def write_step_file(data_lines):
+    handle, file_path = tempfile.mkstemp(suffix='.ifc')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        f.write("ISO-10303-21;\nHEADER;\nFILE_NAME('test.ifc');\nENDSEC;\nDATA;\n")
+        f.write('\n'.join(data_lines))
+        f.write("\nENDSEC;\nEND-ISO-10303-21;\n")
+    return file_path
+
+
+class TestStepReader(unittest.TestCase):
+    def read_entities(self, data_lines, entity_types=None):
+        file_path = write_step_file(data_lines)
+        try:
+            return list(iter_step_entities(file_path, entity_types))
+        finally:
+            os.remove(file_path)
+
+    def test_quoted_strings(self):
+        """Escaped quotes and ';' or ')' inside strings do not end an instance"""
+        entities = self.read_entities([
+            "#1=IFCWALL('2O2Fr$t4X7Zf8NOew3FLOH',$,'O''Brien; east (ext)',$,$,#5,#6,$);",
+            "#2=IFCMATERIAL('It''s ''B;25''');",
+            "#3=IFCSLAB('3O2Fr$t4X7Zf8NOew3FLOH',\n  $,'Slab',$,$,#5,#7,$,.FLOOR.);"
+        ])
+
+        self.assertEqual([(entity_id, entity_type) for entity_id, entity_type, raw in entities],
+            [(1, 'IFCWALL'), (2, 'IFCMATERIAL'), (3, 'IFCSLAB')])
+        self.assertEqual(parse_step_arguments(entities[0][2])[2], "O'Brien; east (ext)")
+        self.assertEqual(parse_step_arguments(entities[1][2]), ["It's 'B;25'"])
+        self.assertEqual(parse_step_arguments(entities[2][2])[8], 'FLOOR')
+
+    def test_unterminated_string(self):
+        """A broken string is skipped quickly and later instances are still read"""
+        start = time.perf_counter()
+        entities = self.read_entities([
+            "#1=IFCWALL('broken" + "''x" * 5000 + ",$,$);",
+            "#2=IFCMATERIAL('Concrete');"
+        ])
+
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertIn((2, 'IFCMATERIAL', "'Concrete'"), entities)
@@ -0,0 +1,83 @@
+"""
+Tests for chunked BIM uploads
+"""
+
+import hashlib
+import os
+from unittest.mock import patch
+
+import melon
+from melon.tests.utils import MelonTestCase
+
+from quantity_survey.bim.upload import (
+    finish_bim_upload, get_content_hash, get_partial_upload_path, get_uploaded_file_path,
+    start_bim_upload
+)
+
+TEST_PROJECT = "_Test BIM Upload Project"
+
+
+class TestBIMUpload(MelonTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        if not melon.db.exists("Project", TEST_PROJECT):
+            melon.get_doc({"doctype": "Project", "project_name": TEST_PROJECT}).insert()
+
+    def setUp(self):
+        self.created_paths = []
+
+    def tearDown(self):
+        for file_path in self.created_paths:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+
+    @patch('quantity_survey.bim.import_job.enqueue_job')
+    def test_finish_fresh_upload(self, enqueue_job):
+        """A file not on the server yet completes, and is moved into place on commit"""
+        content = f"ISO-10303-21;\n/* {melon.generate_hash()} */\nEND-ISO-10303-21;\n".encode()
+
+        state = start_bim_upload('model.ifc', len(content), TEST_PROJECT)
+        self.assertTrue(state['success'])
+
+        partial_path = get_partial_upload_path(state['upload'])
+        self.created_paths.append(partial_path)
+        with open(partial_path, 'wb') as f:
+            f.write(content)
+
+        doc = melon.get_doc('BIM Upload', state['upload'])
+        doc.db_set({'received_bytes': len(content), 'chunk_hashes': hashlib.sha256(content).hexdigest()})
+
+        finish_bim_upload(doc)
+
+        file_path = get_uploaded_file_path(doc.content_hash, 'ifc', must_exist=False)
+        self.created_paths.append(file_path)
+        self.assertFalse(os.path.exists(file_path))
+
+        self.assertEqual(doc.status, 'Completed')
+        self.assertEqual(melon.db.get_value('BIM Import Job', doc.import_job, 'file_path'), file_path)
+        enqueue_job.assert_called_once_with(doc.import_job)
+
+        melon.db.after_commit.run()
+
+        self.assertTrue(os.path.exists(file_path))
+        self.assertFalse(os.path.exists(partial_path))
+
+    def test_hash_without_readable_upload_is_not_reused(self):
+        """A file on disk is only reused for a user who can read an upload of it"""
+        content = f"ISO-10303-21;\n/* {melon.generate_hash()} */\nEND-ISO-10303-21;\n".encode()
+        content_hash = get_content_hash([hashlib.sha256(content).hexdigest()])
+
+        file_path = get_uploaded_file_path(content_hash, 'ifc', must_exist=False)
+        self.created_paths.append(file_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+        state = start_bim_upload('model.ifc', len(content), TEST_PROJECT, content_hash=content_hash)
+        self.created_paths.append(get_partial_upload_path(state['upload']))
+
+        self.assertFalse(state['deduplicated'])
+        self.assertEqual(state['status'], 'Uploading')
+        self.assertEqual(state['next_offset'], 0)
@@ -0,0 +1,367 @@
+"""
+BIM Upload Module
+Chunked, resumable uploads of large model files straight into the import pipeline
+"""
+
+import melon
+from melon import _
+from melon.utils import add_days, cint, get_files_path, now_datetime
+from typing import Dict, List, Optional, Tuple
+import gzip
+import hashlib
+import json
+import os
+
+# Bytes per chunk; every chunk except the last must be exactly this long
+BIM_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Bytes read from the request and written to disk at a time
+BIM_UPLOAD_READ_SIZE = 1024 * 1024
+
+# Private files folder holding partial uploads, finished files and parsed elements
+BIM_UPLOAD_FOLDER = 'bim_uploads'
+
+# Bump whenever extract_bim_elements output changes, so cached elements are parsed again
+BIM_ELEMENT_CACHE_VERSION = 3
+
+# Unfinished uploads untouched for this many days are cancelled
+STALE_UPLOAD_DAYS = 7
+
+
+@melon.whitelist()
+def start_bim_upload(file_name: str, total_size: int, project: str, file_type: str = None,
+        aggregation: str = None, content_hash: str = None) -> Dict:
+    """
+    Open a chunked upload and return where to send the first chunk.
+
+    Chunks of chunk_size bytes are then posted in order to upload_bim_chunk.
+    A client that already knows the file's content hash (see
+    get_content_hash) can pass it; if the user can read a completed upload
+    of an identical file, the upload is skipped and the import starts
+    straight away.
+    """
+    from quantity_survey.bim.aggregation import AGGREGATION_MODES
+    from quantity_survey.bim.import_job import SUPPORTED_JOB_FILE_TYPES
+
+    try:
+        file_type = (file_type or os.path.splitext(file_name)[1].lstrip('.')).lower()
+        total_size = cint(total_size)
+
+        if file_type not in SUPPORTED_JOB_FILE_TYPES:
+            return {'success': False, 'message': f'Unsupported file type: {file_type}'}
+
+        if aggregation and aggregation not in AGGREGATION_MODES:
+            return {'success': False, 'message': f'Unsupported aggregation: {aggregation}'}
+
+        if total_size <= 0:
+            return {'success': False, 'message': 'File is empty'}
+
+        upload = melon.get_doc({
+            'doctype': 'BIM Upload',
+            'project': project,
+            'file_name': file_name,
+            'file_type': file_type,
+            'aggregation': aggregation,
+            'total_size': total_size,
+            'chunk_size': BIM_UPLOAD_CHUNK_SIZE,
+            'status': 'Uploading'
+        })
+
+        existing_path = get_deduplicated_file_path(content_hash, file_type) if content_hash else None
+        if existing_path and os.path.getsize(existing_path) == total_size:
+            upload.update({'received_bytes': total_size, 'content_hash': content_hash})
+            upload.insert()
+            complete_bim_upload(upload, existing_path)
+            return get_upload_state(upload, deduplicated=True)
+
+        upload.insert()
+
+        os.makedirs(get_upload_folder(), exist_ok=True)
+        open(get_partial_upload_path(upload.name), 'wb').close()
+
+        return get_upload_state(upload)
+
+    except Exception as e:
+        melon.log_error(f"BIM upload start error: {str(e)}", "BIM Integrator")
+        return {'success': False, 'message': f'Upload failed: {str(e)}'}
+
+
+@melon.whitelist()
+def upload_bim_chunk(upload: str, offset: int, chunk_hash: str = None) -> Dict:
+    """
+    Append one chunk, sent as the 'chunk' file of a multipart request.
+
+    offset must equal the bytes already received. A chunk that was stored
+    but whose response never reached the client is acknowledged again
+    rather than written twice. The chunk is hashed while it is copied to
+    disk; when the client sends chunk_hash (hex SHA-256) a mismatch is
+    rejected. The last chunk completes the upload and queues the import.
+    """
+    try:
+        # Row lock: chunks of one upload are written one at a time
+        doc = melon.get_doc('BIM Upload', upload, for_update=True)
+        doc.check_permission('write')
+
+        if doc.status != 'Uploading':
+            return {'success': False, 'message': _('Upload is {0}').format(doc.status)}
+
+        offset = cint(offset)
+        received = cint(doc.received_bytes)
+
+        if offset < received:
+            return get_upload_state(doc)
+
+        if offset > received:
+            return {'success': False, 'message': _('Expected chunk at offset {0}').format(received)}
+
+        expected_size = min(cint(doc.chunk_size), cint(doc.total_size) - received)
+        size, digest = write_chunk(get_partial_upload_path(doc.name), offset, get_request_stream(),
+            expected_size + 1)
+
+        if size != expected_size or (chunk_hash and chunk_hash.lower() != digest):
+            truncate_partial_upload(doc.name, offset)
+            return {'success': False, 'message': _('Chunk at offset {0} is corrupt; send it again').format(offset)}
+
+        doc.db_set({
+            'received_bytes': received + size,
+            'chunk_hashes': '\n'.join(filter(None, [doc.chunk_hashes, digest])),
+            'progress': (received + size) * 100.0 / cint(doc.total_size)
+        })
+
+        if doc.received_bytes == cint(doc.total_size):
+            finish_bim_upload(doc)
+
+        return get_upload_state(doc)
+
+    except Exception as e:
+        melon.db.rollback()
+        melon.log_error(f"BIM upload chunk error: {str(e)}", "BIM Integrator")
+        return {'success': False, 'message': f'Upload failed: {str(e)}'}
+
+
+@melon.whitelist()
+def get_bim_upload_status(upload: str) -> Dict:
+    """Upload state; an interrupted client resumes from next_offset"""
+    doc = melon.get_doc('BIM Upload', upload)
+    doc.check_permission('read')
+    return get_upload_state(doc)
+
+
+@melon.whitelist()
+def cancel_bim_upload(upload: str) -> Dict:
+    """Abandon an unfinished upload and delete what was received"""
+    doc = melon.get_doc('BIM Upload', upload, for_update=True)
+    doc.check_permission('write')
+
+    if doc.status != 'Uploading':
+        return {'success': False, 'message': _('Upload is {0}').format(doc.status)}
+
+    remove_partial_upload(doc.name)
+    doc.db_set('status', 'Cancelled')
+
+    return {'success': True, 'message': _('Upload cancelled')}
+
+
+def get_deduplicated_file_path(content_hash: str, file_type: str) -> Optional[str]:
+    """
+    Finished file with this content, if the user can read an upload of it.
+
+    A hash alone proves nothing, so files the user never had access to are
+    not reused.
+    """
+    if not melon.get_list('BIM Upload',
+            filters={'content_hash': content_hash, 'file_type': file_type, 'status': 'Completed'},
+            limit=1, pluck='name'):
+        return None
+    return get_uploaded_file_path(content_hash, file_type)
+
+
+def get_upload_state(doc, deduplicated: bool = False) -> Dict:
+    return {
+        'success': True,
+        'upload': doc.name,
+        'status': doc.status,
+        'chunk_size': cint(doc.chunk_size),
+        'total_size': cint(doc.total_size),
+        'next_offset': cint(doc.received_bytes),
+        'content_hash': doc.content_hash,
+        'import_job': doc.import_job,
+        'deduplicated': deduplicated
+    }
+
+
+def get_request_stream():
+    """Body of the posted chunk as a readable stream"""
+    chunk = melon.request.files.get('chunk')
+    if chunk is None:
+        melon.throw(_('No chunk in request'))
+    return chunk.stream
+
+
+def write_chunk(file_path: str, offset: int, stream, max_size: int) -> Tuple[int, str]:
+    """
+    Copy up to max_size bytes of stream into file_path at offset, hashing them on the way.
+
+    Anything after offset (left by an earlier failed attempt) is cut off
+    first. Returns (bytes written, hex SHA-256 of the chunk).
+    """
+    hasher = hashlib.sha256()
+    size = 0
+
+    with open(file_path, 'r+b') as f:
+        f.seek(offset)
+        f.truncate()
+
+        while size < max_size:
+            block = stream.read(min(BIM_UPLOAD_READ_SIZE, max_size - size))
+            if not block:
+                break
+            hasher.update(block)
+            f.write(block)
+            size += len(block)
+
+        f.flush()
+        os.fsync(f.fileno())
+
+    return size, hasher.hexdigest()
+
+
+def finish_bim_upload(doc):
+    """
+    Start the import of a fully received file and move it to its content-addressed path.
+
+    The file is only moved once the upload is committed as complete. Should
+    queueing the import or the commit fail, received_bytes rolls back and
+    the .part file is still there, so the client can resend the last chunk.
+    The move is registered before the import is queued, so it runs first.
+    """
+    content_hash = get_content_hash(doc.chunk_hashes.split('\n'))
+    file_path = get_uploaded_file_path(content_hash, doc.file_type, must_exist=False)
+
+    partial_path = get_partial_upload_path(doc.name)
+    melon.db.after_commit.add(lambda: move_finished_upload(partial_path, file_path))
+
+    doc.content_hash = content_hash
+    complete_bim_upload(doc, file_path)
+
+
+def move_finished_upload(partial_path: str, file_path: str):
+    if os.path.exists(file_path):
+        # Identical file uploaded before: keep that copy, so its parsed elements are reused
+        os.remove(partial_path)
+    else:
+        os.replace(partial_path, file_path)
+
+
+def complete_bim_upload(doc, file_path: str):
+    from quantity_survey.bim.import_job import create_bim_import_job
+
+    import_job = create_bim_import_job(file_path, doc.file_type, doc.project, doc.aggregation,
+        content_hash=doc.content_hash)
+
+    doc.db_set({
+        'status': 'Completed',
+        'progress': 100,
+        'file_path': file_path,
+        'content_hash': doc.content_hash,
+        'import_job': import_job
+    })
+
+
+def get_content_hash(chunk_hashes: List[str]) -> str:
+    """
+    File identity: SHA-256 over the binary SHA-256 digests of its chunks.
+
+    A running hashlib state cannot be carried between requests served by
+    different workers, so each chunk is hashed on arrival and the file
+    hash is derived from those digests. Chunk boundaries are fixed by
+    BIM_UPLOAD_CHUNK_SIZE, so identical files always get the same hash and
+    clients can compute it before uploading.
+    """
+    hasher = hashlib.sha256()
+    for chunk_hash in chunk_hashes:
+        hasher.update(bytes.fromhex(chunk_hash))
+    return hasher.hexdigest()
+
+
+def get_upload_folder() -> str:
+    return get_files_path(BIM_UPLOAD_FOLDER, is_private=True)
+
+
+def get_partial_upload_path(upload: str) -> str:
+    return os.path.join(get_upload_folder(), f'{upload}.part')
+
+
+def get_uploaded_file_path(content_hash: str, file_type: str, must_exist: bool = True) -> Optional[str]:
+    """Path of the finished file with this content; None if it is not on disk and must_exist"""
+    if not content_hash or any(c not in '0123456789abcdef' for c in content_hash):
+        return None
+
+    file_path = os.path.join(get_upload_folder(), f'{content_hash}.{file_type}')
+    if must_exist and not os.path.exists(file_path):
+        return None
+    return file_path
+
+
+def truncate_partial_upload(upload: str, size: int):
+    with open(get_partial_upload_path(upload), 'r+b') as f:
+        f.truncate(size)
+
+
+def remove_partial_upload(upload: str):
+    partial_path = get_partial_upload_path(upload)
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+
+def extract_uploaded_elements(file_path: str, file_type: str, content_hash: str = None) -> List[Dict]:
+    """
+    Elements of a file, parsed at most once per content hash.
+
+    The first import of a file stores its elements as gzipped JSON next to
+    the upload; later imports of identical content load them instead of
+    parsing the model again.
+    """
+    from quantity_survey.bim.integrator import extract_bim_elements
+
+    if not content_hash:
+        return extract_bim_elements(file_path, file_type)
+
+    cache_path = os.path.join(get_upload_folder(),
+        f'{content_hash}.{file_type}.v{BIM_ELEMENT_CACHE_VERSION}.elements.json.gz')
+
+    if os.path.exists(cache_path):
+        with gzip.open(cache_path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    elements = extract_bim_elements(file_path, file_type)
+
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        json.dump(elements, f, separators=(',', ':'), default=str)
+    os.replace(temp_path, cache_path)
+
+    return elements
+
+
+def cleanup_stale_bim_uploads():
+    """Cancel unfinished uploads nobody has touched for STALE_UPLOAD_DAYS (called by scheduler)"""
+    try:
+        uploads = melon.get_all('BIM Upload',
+            filters={
+                'status': 'Uploading',
+                'modified': ['<', add_days(now_datetime(), -STALE_UPLOAD_DAYS)]
+            },
+            pluck='name'
+        )
+
+        for upload in uploads:
+            remove_partial_upload(upload)
+            melon.db.set_value('BIM Upload', upload, 'status', 'Cancelled', update_modified=False)
+
+        if uploads:
+            melon.db.commit()
+            melon.logger().info(f"Cancelled {len(uploads)} stale BIM uploads")
+
+    except Exception as e:
+        melon.log_error(f"Error cleaning up BIM uploads: {str(e)}")
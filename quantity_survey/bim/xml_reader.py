@@ -0,0 +1,181 @@
+"""
+XML Reader Module
+Single-pass streaming extraction of elements from take-off XML exports
+"""
+
+from typing import Dict, Iterator, Optional
+import xml.etree.ElementTree as ET
+
+# Root tag -> document layout
+XML_BUILDING_ROOTS = {'project', 'building', 'model'}
+XML_QUANTITIES_ROOTS = {'quantities', 'boq', 'takeoff'}
+
+# Element tags read from building model documents
+XML_BUILDING_TAGS = {'wall', 'slab', 'beam', 'column', 'door', 'window', 'element', 'component'}
+
+# Fields read from <item> attributes or child elements in quantities documents
+XML_QUANTITY_FIELDS = ('quantity', 'length', 'width', 'height', 'area', 'volume', 'weight')
+
+# Attributes that mark an element as measurable in generic documents
+XML_GENERIC_QUANTITY_ATTRS = {'quantity', 'length', 'width', 'height', 'area', 'volume'}
+
+LAYOUT_BUILDING = 'building'
+LAYOUT_QUANTITIES = 'quantities'
+LAYOUT_GENERIC = 'generic'
+
+
+def iter_xml_elements(file_path: str) -> Iterator[Dict]:
+    """
+    Yield element dicts from a building, quantities or generic XML file.
+
+    The document is read once with iterparse. The layout is chosen from the
+    root tag, each element is handled on its end event, and processed
+    subtrees are cleared and detached, so memory does not grow with file
+    size. Elements come out in document order.
+    """
+    layout = None
+    open_elements = []
+    held = []           # per open element: is its subtree needed at its end event
+    held_count = 0
+    count = 0
+
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            if layout is None:
+                layout = get_xml_layout(elem.tag)
+
+            holds_subtree = layout != LAYOUT_GENERIC and is_xml_element_tag(layout, elem.tag)
+            open_elements.append(elem)
+            held.append(holds_subtree)
+            held_count += holds_subtree
+            continue
+
+        open_elements.pop()
+        held_count -= held.pop()
+
+        element = parse_xml_element(layout, elem, count)
+        if element:
+            count += 1
+            yield element
+
+        # Keep children while an enclosing element still has to read them
+        if not held_count:
+            elem.clear()
+            if open_elements:
+                del open_elements[-1][:]
+
+
+def get_xml_layout(root_tag: str) -> str:
+    """Document layout implied by the root tag"""
+    root_tag = root_tag.lower()
+    if root_tag in XML_BUILDING_ROOTS:
+        return LAYOUT_BUILDING
+    if root_tag in XML_QUANTITIES_ROOTS:
+        return LAYOUT_QUANTITIES
+    return LAYOUT_GENERIC
+
+
+def is_xml_element_tag(layout: str, tag: str) -> bool:
+    if layout == LAYOUT_BUILDING:
+        return tag in XML_BUILDING_TAGS
+    if layout == LAYOUT_QUANTITIES:
+        return tag == 'item'
+    return True
+
+
+def parse_xml_element(layout: str, elem, count: int) -> Optional[Dict]:
+    """Element dict for elem, or None if it is not a take-off element"""
+    if layout == LAYOUT_BUILDING:
+        if elem.tag in XML_BUILDING_TAGS:
+            return parse_building_element(elem, count)
+    elif layout == LAYOUT_QUANTITIES:
+        if elem.tag == 'item':
+            return parse_quantities_item(elem, count)
+    else:
+        return parse_generic_element(elem, count)
+
+    return None
+
+
+def parse_building_element(elem, count: int) -> Dict:
+    """Building model element: numeric attributes and child values are quantities"""
+    tag = elem.tag
+    element_data = {
+        'element_id': elem.get('id', f'{tag}_{count}'),
+        'element_type': tag.upper(),
+        'name': elem.get('name', f'{tag}_{count}'),
+        'material': elem.get('material', ''),
+        'quantities': {},
+        'properties': {}
+    }
+
+    split_xml_attributes(elem, element_data)
+
+    for child in elem:
+        try:
+            element_data['quantities'][child.tag] = float(child.text or 0)
+        except ValueError:
+            element_data['properties'][child.tag] = child.text
+
+    return element_data
+
+
+def parse_quantities_item(item, count: int) -> Dict:
+    """Quantities <item>: fields come from attributes, falling back to child elements"""
+    element_data = {
+        'element_id': item.get('id', f'item_{count}'),
+        'element_type': item.get('type', 'ITEM'),
+        'name': item.get('description', f'Item_{count}'),
+        'material': item.get('material', ''),
+        'quantities': {},
+        'properties': {}
+    }
+
+    # First child per tag, read in one pass over the children
+    child_values = {}
+    for child in item:
+        child_values.setdefault(child.tag, child.text)
+
+    for field in XML_QUANTITY_FIELDS:
+        value = item.get(field) or child_values.get(field)
+        if value:
+            try:
+                element_data['quantities'][field] = float(value)
+            except ValueError:
+                pass
+
+    element_data['quantities']['unit'] = item.get('unit') or child_values.get('unit', 'Nos')
+
+    return element_data
+
+
+def parse_generic_element(elem, count: int) -> Optional[Dict]:
+    """Any text-free element carrying a quantity attribute"""
+    if elem.text and elem.text.strip():
+        return None
+
+    if not XML_GENERIC_QUANTITY_ATTRS.intersection(elem.attrib):
+        return None
+
+    tag = elem.tag
+    element_data = {
+        'element_id': elem.get('id', f'{tag}_{count}'),
+        'element_type': tag.upper(),
+        'name': elem.get('name', f'{tag}_{count}'),
+        'material': elem.get('material', ''),
+        'quantities': {},
+        'properties': {}
+    }
+
+    split_xml_attributes(elem, element_data)
+
+    return element_data
+
+
+def split_xml_attributes(elem, element_data: Dict):
+    """Numeric attributes become quantities, the rest properties"""
+    for attr, value in elem.attrib.items():
+        try:
+            element_data['quantities'][attr] = float(value)
+        except ValueError:
+            element_data['properties'][attr] = value
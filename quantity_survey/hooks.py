@@ -122,25 +122,69 @@ doc_events = {
     "Item": {
         "validate": "quantity_survey.utils.item_hooks.validate_item_for_qs"
     },
+    "UOM": {
+        "on_update": "quantity_survey.utils.uom_conversion.clear_uom_conversion_cache",
+        "on_trash": "quantity_survey.utils.uom_conversion.clear_uom_conversion_cache"
+    },
+    "UOM Conversion Detail": {
+        "on_update": "quantity_survey.utils.uom_conversion.clear_uom_conversion_cache",
+        "on_trash": "quantity_survey.utils.uom_conversion.clear_uom_conversion_cache"
+    },
     "BoQ": {
         "validate": "quantity_survey.quantity_surveying.doctype.boq.boq.validate_boq",
-        "on_submit": "quantity_survey.quantity_surveying.doctype.boq.boq.on_submit",
-        "on_cancel": "quantity_survey.quantity_surveying.doctype.boq.boq.on_cancel"
+        "on_submit": [
+            "quantity_survey.quantity_surveying.doctype.boq.boq.on_submit",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_cancel": [
+            "quantity_survey.quantity_surveying.doctype.boq.boq.on_cancel",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_update": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_update_after_submit": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_trash": "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
     },
     "Valuation": {
         "validate": "quantity_survey.quantity_surveying.doctype.valuation.valuation.validate_valuation",
-        "on_submit": "quantity_survey.quantity_surveying.doctype.valuation.valuation.on_submit",
-        "on_cancel": "quantity_survey.quantity_surveying.doctype.valuation.valuation.on_cancel"
+        "on_submit": [
+            "quantity_survey.quantity_surveying.doctype.valuation.valuation.on_submit",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_cancel": [
+            "quantity_survey.quantity_surveying.doctype.valuation.valuation.on_cancel",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_update": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_update_after_submit": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_trash": "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
     },
     "Payment Certificate": {
         "validate": "quantity_survey.quantity_surveying.doctype.payment_certificate.payment_certificate.validate_payment",
-        "on_submit": "quantity_survey.quantity_surveying.doctype.payment_certificate.payment_certificate.on_submit",
-        "on_cancel": "quantity_survey.quantity_surveying.doctype.payment_certificate.payment_certificate.on_cancel"
+        "on_submit": [
+            "quantity_survey.quantity_surveying.doctype.payment_certificate.payment_certificate.on_submit",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_cancel": [
+            "quantity_survey.quantity_surveying.doctype.payment_certificate.payment_certificate.on_cancel",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_update": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_update_after_submit": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_trash": "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
     },
     "Variation Order": {
         "validate": "quantity_survey.quantity_surveying.doctype.variation_order.variation_order.validate_variation_order",
-        "on_submit": "quantity_survey.quantity_surveying.doctype.variation_order.variation_order.on_submit",
-        "on_cancel": "quantity_survey.quantity_surveying.doctype.variation_order.variation_order.on_cancel"
+        "on_submit": [
+            "quantity_survey.quantity_surveying.doctype.variation_order.variation_order.on_submit",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_cancel": [
+            "quantity_survey.quantity_surveying.doctype.variation_order.variation_order.on_cancel",
+            "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
+        ],
+        "on_update": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_update_after_submit": "quantity_survey.utils.financial_rollup.clear_project_financial_summary",
+        "on_trash": "quantity_survey.utils.financial_rollup.clear_project_financial_summary"
     }
 }
 
@@ -148,7 +192,12 @@ doc_events = {
 # ---------------
 
 scheduler_events = {
+    "hourly": [
+        "quantity_survey.bim.import_job.resume_interrupted_imports"
+    ],
     "daily": [
+        "quantity_survey.bim.upload.cleanup_stale_bim_uploads",
+        "quantity_survey.utils.export_cache.cleanup_export_cache",
         "quantity_survey.tasks.daily_tasks.send_payment_reminders",
         "quantity_survey.tasks.daily_tasks.update_project_progress"
     ],
@@ -88,17 +88,35 @@ melon.ui.form.on('Final Account', {
 			
 			frm.add_custom_button(__('Export to Excel'), function() {
 				melon.call({
-					method: 'quantity_survey.utils.bulk_operations.export_final_account_excel',
+					method: 'quantity_survey.utils.export_queue.enqueue_export',
 					args: {
-						final_account_name: frm.doc.name
+						exporter: 'final_account_excel',
+						name: frm.doc.name
 					},
 					callback: function(r) {
-						if (r.message) {
+						if (!r.message || !r.message.success) {
+							return;
+						}
+						if (r.message.queued) {
+							melon.show_alert(r.message.message);
+						} else {
 							window.open(r.message.file_url);
 						}
 					}
 				});
 			}, __('Bulk Operations'));
+			
+			melon.realtime.off('export_ready');
+			melon.realtime.on('export_ready', function(data) {
+				if (data.exporter !== 'final_account_excel' || data.name !== frm.doc.name) {
+					return;
+				}
+				if (data.success) {
+					window.open(data.file_url);
+				} else {
+					melon.msgprint(data.message);
+				}
+			});
 		}
 	},
 	
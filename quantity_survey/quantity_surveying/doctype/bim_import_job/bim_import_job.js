@@ -0,0 +1,46 @@
+// Copyright (c) 2025, Alphamonak Solutions
+
+melon.ui.form.on('BIM Import Job', {
+	refresh: function(frm) {
+		if (frm.doc.status === 'Running' || frm.doc.status === 'Queued') {
+			frm.dashboard.show_progress(__('Import Progress'), frm.doc.progress || 0,
+				__('{0} of {1} elements', [frm.doc.processed_elements || 0, frm.doc.total_elements || 0]));
+		}
+
+		if (frm.doc.status === 'Failed') {
+			frm.add_custom_button(__('Resume Import'), function() {
+				melon.call({
+					method: 'quantity_survey.bim.import_job.resume_bim_import',
+					args: {
+						job: frm.doc.name
+					},
+					callback: function(r) {
+						if (r.message) {
+							melon.show_alert(r.message.message);
+							frm.reload_doc();
+						}
+					}
+				});
+			});
+		}
+
+		if (frm.doc.boq) {
+			frm.add_custom_button(__('View BoQ'), function() {
+				melon.set_route('Form', 'BoQ', frm.doc.boq);
+			});
+		}
+
+		melon.realtime.off('bim_import_progress');
+		melon.realtime.on('bim_import_progress', function(data) {
+			if (data.job !== frm.doc.name) {
+				return;
+			}
+			if (data.status === 'Running') {
+				frm.dashboard.show_progress(__('Import Progress'), data.progress || 0,
+					__('{0} of {1} elements', [data.processed_elements || 0, data.total_elements || 0]));
+			} else {
+				frm.reload_doc();
+			}
+		});
+	}
+});
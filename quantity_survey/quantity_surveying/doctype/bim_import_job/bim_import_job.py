@@ -0,0 +1,10 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+from melon.model.document import Document
+
+
+class BIMImportJob(Document):
+	"""Checkpointed background import of a BIM model into a BoQ."""
+
+	pass
@@ -0,0 +1,36 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+import melon
+from melon import _
+from melon.model.document import Document
+
+
+class BIMItemMapping(Document):
+	"""Resolved Item for a (element type, material, UOM) combination seen in BIM imports."""
+
+	def validate(self):
+		"""Normalise the key and keep it unique."""
+		self.element_type = (self.element_type or "").strip().upper()
+		self.material = (self.material or "").strip().lower()
+		self.uom = (self.uom or "").strip()
+
+		# Learned rows are bulk-inserted by imports; anything saved here is a user override
+		self.mapping_source = "Manual"
+
+		duplicate = melon.db.exists("BIM Item Mapping", {
+			"element_type": self.element_type,
+			"material": self.material,
+			"uom": self.uom,
+			"name": ["!=", self.name]
+		})
+		if duplicate:
+			melon.throw(_("A mapping for {0} / {1} / {2} already exists: {3}").format(
+				self.element_type, self.material or "-", self.uom or "-", duplicate
+			))
+
+
+def on_doctype_update():
+	# One mapping per key, so concurrent imports cannot learn the same key twice
+	melon.db.add_unique("BIM Item Mapping", ["element_type", "material", "uom"],
+		constraint_name="unique_mapping_key")
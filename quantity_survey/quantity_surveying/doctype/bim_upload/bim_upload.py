@@ -0,0 +1,10 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+from melon.model.document import Document
+
+
+class BIMUpload(Document):
+	"""Chunked, resumable upload of a model file ahead of a BIM import."""
+
+	pass
@@ -69,6 +69,27 @@ def get_boq_items(boq):
 	)
 	return items
 
+@melon.whitelist()
+def get_boq_location_summary(boq):
+	"""Quantities and amounts of a BoQ per BIM location"""
+	if not boq:
+		melon.throw(_("BoQ is required"))
+	
+	if not melon.has_permission("BoQ", "read", boq):
+		melon.throw(_("Insufficient permission to access BoQ"))
+	
+	return melon.db.sql("""
+		SELECT
+			COALESCE(location_path, '') as location_path,
+			COUNT(*) as item_count,
+			SUM(quantity) as total_quantity,
+			SUM(amount) as total_amount
+		FROM `tabBoQ Item`
+		WHERE parent = %s AND parenttype = 'BoQ'
+		GROUP BY location_path
+		ORDER BY location_path
+	""", (boq,), as_dict=True)
+
 @melon.whitelist()
 def duplicate_boq(source_name, target_doc=None):
 	"""Duplicate BoQ with items"""
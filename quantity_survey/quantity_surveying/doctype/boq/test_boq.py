@@ -0,0 +1,71 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+import melon
+from melon.tests.utils import MelonTestCase
+from melon.utils import flt
+
+from quantity_survey.bim.boq_builder import create_boq_bulk, create_boq_header
+
+TEST_PROJECT = "_Test BIM Project"
+TEST_ITEM = "_Test BIM Wall"
+
+
+class TestBoQ(MelonTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+
+		if not melon.db.exists("Project", TEST_PROJECT):
+			melon.get_doc({"doctype": "Project", "project_name": TEST_PROJECT}).insert()
+
+		if not melon.db.exists("Item", TEST_ITEM):
+			melon.get_doc({
+				"doctype": "Item",
+				"item_code": TEST_ITEM,
+				"item_name": TEST_ITEM,
+				"item_group": "All Item Groups",
+				"stock_uom": "Nos",
+				"is_construction_item": 1,
+				"standard_rate": 10
+			}).insert()
+
+	def test_create_boq_header_without_items(self):
+		"""The header of a bulk BoQ is inserted before any of its rows"""
+		boq = create_boq_header(TEST_PROJECT, "_Test BIM Header", "Header only")
+
+		self.assertTrue(melon.db.exists("BoQ", boq.name))
+		self.assertEqual(melon.db.count("BoQ Item", {"parent": boq.name}), 0)
+
+	def test_create_boq_bulk(self):
+		"""Rows are written in batches and the header totals follow them"""
+		lines = [
+			{
+				"item_code": TEST_ITEM,
+				"item_name": TEST_ITEM,
+				"description": f"Wall {i}",
+				"uom": "Nos",
+				"quantity": i + 1,
+				"bim_element_id": f"WALL-{i}"
+			}
+			for i in range(5)
+		]
+
+		boq = create_boq_bulk(TEST_PROJECT, "_Test BIM Bulk", "Bulk import", lines, chunk_size=2)
+
+		rows = melon.get_all("BoQ Item",
+			filters={"parent": boq.name, "parenttype": "BoQ"},
+			fields=["idx", "quantity", "rate", "amount"],
+			order_by="idx asc"
+		)
+		self.assertEqual([row.idx for row in rows], [1, 2, 3, 4, 5])
+		self.assertEqual([flt(row.rate) for row in rows], [10.0] * 5)
+
+		totals = melon.db.get_value("BoQ", boq.name, ["total_quantity", "total_amount"], as_dict=True)
+		self.assertEqual(flt(totals.total_quantity), 15.0)
+		self.assertEqual(flt(totals.total_amount), 150.0)
+
+		# The stored document loads and validates with its bulk-inserted rows
+		doc = melon.get_doc("BoQ", boq.name)
+		self.assertEqual(len(doc.boq_items), 5)
+		doc.save()
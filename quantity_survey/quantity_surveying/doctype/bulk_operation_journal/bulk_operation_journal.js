@@ -0,0 +1,27 @@
+// Copyright (c) 2025, Alphamonak Solutions
+
+melon.ui.form.on('Bulk Operation Journal', {
+	refresh: function(frm) {
+		if (frm.doc.status !== 'Applied') {
+			return;
+		}
+
+		frm.add_custom_button(__('Undo'), function() {
+			melon.confirm(__('Restore the items of {0} to their values before this operation?', [frm.doc.final_account]), function() {
+				melon.call({
+					method: 'quantity_survey.utils.bulk_journal.undo_bulk_operation',
+					args: {
+						journal: frm.doc.name
+					},
+					freeze: true,
+					callback: function(r) {
+						if (r.message) {
+							melon.show_alert(r.message.message);
+							frm.reload_doc();
+						}
+					}
+				});
+			});
+		});
+	}
+});
@@ -0,0 +1,10 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+from melon.model.document import Document
+
+
+class BulkOperationJournal(Document):
+	"""Compressed before-image of one bulk operation on a Final Account, used to undo it."""
+
+	pass
@@ -0,0 +1,10 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+from melon.model.document import Document
+
+
+class ExportCacheEntry(Document):
+	"""Generated export file, reused while nothing it was built from has changed."""
+
+	pass
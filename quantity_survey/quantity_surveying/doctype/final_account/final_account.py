@@ -80,28 +80,8 @@ class FinalAccount(Document):
 			if item.final_amount:
 				total_certified += item.final_amount
 		
-		self.total_certified_value = total_certified
-		
-		# Calculate retention
-		if self.less_retention_percentage:
-			self.retention_amount = flt(total_certified * self.less_retention_percentage / 100, 2)
-		else:
-			self.retention_amount = 0
-		
-		# Net amount
-		self.net_amount_due = total_certified - self.retention_amount
-		
-		# VAT calculation
-		if self.vat_percentage:
-			self.vat_amount = flt(self.net_amount_due * self.vat_percentage / 100, 2)
-		else:
-			self.vat_amount = 0
-		
-		# Gross amount
-		self.gross_amount_payable = self.net_amount_due + self.vat_amount
-		
-		# Final payment calculation
-		self.final_payment_amount = self.gross_amount_payable - flt(self.previous_payments, 2)
+		self.update(get_final_amounts(total_certified, self.less_retention_percentage,
+			self.vat_percentage, self.previous_payments))
 	
 	def update_project_status(self):
 		"""Update project status on final account submission"""
@@ -214,3 +194,34 @@ class FinalAccount(Document):
 		melon.msgprint(f"Payment Certificate {payment_cert.name} created successfully")
 		
 		return payment_cert.name
+
+
+def get_final_amounts(total_certified, retention_percentage, vat_percentage, previous_payments):
+	"""Header totals that follow from the certified value of the items"""
+	# Calculate retention
+	if retention_percentage:
+		retention_amount = flt(total_certified * retention_percentage / 100, 2)
+	else:
+		retention_amount = 0
+	
+	# Net amount
+	net_amount_due = total_certified - retention_amount
+	
+	# VAT calculation
+	if vat_percentage:
+		vat_amount = flt(net_amount_due * vat_percentage / 100, 2)
+	else:
+		vat_amount = 0
+	
+	# Gross amount
+	gross_amount_payable = net_amount_due + vat_amount
+	
+	return {
+		"total_certified_value": total_certified,
+		"retention_amount": retention_amount,
+		"net_amount_due": net_amount_due,
+		"vat_amount": vat_amount,
+		"gross_amount_payable": gross_amount_payable,
+		# Final payment calculation
+		"final_payment_amount": gross_amount_payable - flt(previous_payments, 2)
+	}
@@ -0,0 +1,25 @@
+// Copyright (c) 2025, Alphamonak Solutions
+
+melon.ui.form.on('Portfolio Bulk Operation', {
+	refresh: function(frm) {
+		if (frm.doc.status === 'Running' || frm.doc.status === 'Queued') {
+			frm.dashboard.show_progress(__('Progress'), frm.doc.progress || 0,
+				__('{0} of {1} documents, {2} failed', [frm.doc.processed_documents || 0,
+					frm.doc.total_documents || 0, frm.doc.failed_documents || 0]));
+		}
+
+		melon.realtime.off('portfolio_bulk_operation_progress');
+		melon.realtime.on('portfolio_bulk_operation_progress', function(data) {
+			if (data.job !== frm.doc.name) {
+				return;
+			}
+			if (data.status === 'Running') {
+				frm.dashboard.show_progress(__('Progress'), data.progress || 0,
+					__('{0} of {1} documents, {2} failed', [data.processed_documents || 0,
+						data.total_documents || 0, data.failed_documents || 0]));
+			} else {
+				frm.reload_doc();
+			}
+		});
+	}
+});
@@ -0,0 +1,10 @@
+# Copyright (c) 2025, Alphamonak Solutions
+
+
+from melon.model.document import Document
+
+
+class PortfolioBulkOperation(Document):
+	"""Bulk operation applied to many Final Accounts or BoQs by sharded background jobs."""
+
+	pass
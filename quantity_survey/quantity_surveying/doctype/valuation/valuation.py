@@ -6,6 +6,8 @@ from melon import _
 from melon.model.document import Document
 from melon.utils import flt
 
+from quantity_survey.bim.spatial_index import LOCATION_PATH_SEPARATOR
+
 
 class Valuation(Document):
 	"""Valuation document for tracking work progress and payments."""
@@ -80,16 +82,27 @@ class Valuation(Document):
 			self.company = melon.defaults.get_user_default("Company")
 
 @melon.whitelist()
-def get_boq_items_for_valuation(boq):
-	"""Get BoQ items for valuation with proper error handling"""
+def get_boq_items_for_valuation(boq, location_path=None):
+	"""Get BoQ items for valuation, optionally limited to one location (e.g. a storey) and below"""
 	if not boq:
 		melon.throw(_("BoQ is required"))
 	
 	if not melon.has_permission("BoQ", "read", boq):
 		melon.throw(_("Insufficient permission to access BoQ"))
 	
+	filters = {"parent": boq}
+	or_filters = None
+	if location_path:
+		# The location itself or anything below it; the prefix match keeps the location_path index usable
+		escaped = location_path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+		or_filters = [
+			["location_path", "=", location_path],
+			["location_path", "like", f"{escaped}{LOCATION_PATH_SEPARATOR}%"]
+		]
+	
 	items = melon.db.get_all("BoQ Item",
-		filters={"parent": boq},
+		filters=filters,
+		or_filters=or_filters,
 		fields=[
 			"item_code", "item_name", "description", "uom",
 			"quantity as boq_quantity", "rate", "amount as boq_amount"
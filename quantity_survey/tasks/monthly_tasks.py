@@ -19,6 +19,10 @@ def archive_completed_projects():
             fields=["name", "project_name", "actual_end_date"]
         )
         
+        # Totals of every project in one query; the archive summaries read them from cache
+        from quantity_survey.utils.financial_rollup import get_project_financial_summaries
+        get_project_financial_summaries([project.name for project in completed_projects])
+        
         for project in completed_projects:
             archive_project_data(project)
             
@@ -86,24 +90,19 @@ def get_project_archive_summary(project_name):
     summary = {}
     
     try:
+        from quantity_survey.utils.financial_rollup import get_project_financial_summary
+        
+        rollup = get_project_financial_summary(project_name)
+        
         # Count all documents
-        summary["boqs"] = melon.db.count("Bill of Quantities", {"project": project_name})
-        summary["valuations"] = melon.db.count("Valuation", {"project": project_name})
-        summary["certificates"] = melon.db.count("Payment Certificate", {"project": project_name})
-        summary["variations"] = melon.db.count("Variation Order", {"project": project_name})
+        summary["boqs"] = rollup["boq_count"]
+        summary["valuations"] = rollup["valuation_count"]
+        summary["certificates"] = rollup["payment_count"]
+        summary["variations"] = rollup["variation_count"]
         
         # Get final amounts
-        contract_value = melon.db.sql("""
-            SELECT IFNULL(SUM(total_amount), 0)
-            FROM `tabBill of Quantities`
-            WHERE project = %s AND docstatus = 1
-        """, project_name)[0][0]
-        
-        certified = melon.db.sql("""
-            SELECT IFNULL(SUM(certified_amount), 0)
-            FROM `tabPayment Certificate`
-            WHERE project = %s AND docstatus = 1
-        """, project_name)[0][0]
+        contract_value = rollup["total_boq_value"]
+        certified = rollup["total_certified"]
         
         summary["contract_value"] = contract_value
         summary["certified"] = certified
@@ -17,6 +17,10 @@ def generate_progress_reports():
             fields=["name", "project_name", "project_manager"]
         )
         
+        # Totals of every project in one query; the reports read them from cache
+        from quantity_survey.utils.financial_rollup import get_project_financial_summaries
+        get_project_financial_summaries([project.name for project in projects])
+        
         for project in projects:
             generate_project_progress_report(project)
             
@@ -83,7 +87,7 @@ def get_project_weekly_summary(project_name):
         # Count documents created this week
         week_start = add_days(today(), -7)
         
-        summary["boqs"] = melon.db.count("Bill of Quantities", {
+        summary["boqs"] = melon.db.count("BoQ", {
             "project": project_name,
             "creation": [">=", week_start]
         })
@@ -99,23 +103,12 @@ def get_project_weekly_summary(project_name):
         })
         
         # Get amounts
-        work_done = melon.db.sql("""
-            SELECT IFNULL(SUM(total_work_done), 0)
-            FROM `tabValuation`
-            WHERE project = %s AND docstatus = 1
-        """, project_name)[0][0]
-        
-        certified = melon.db.sql("""
-            SELECT IFNULL(SUM(certified_amount), 0)
-            FROM `tabPayment Certificate`
-            WHERE project = %s AND docstatus = 1
-        """, project_name)[0][0]
-        
-        contract_value = melon.db.sql("""
-            SELECT IFNULL(SUM(total_amount), 0)
-            FROM `tabBill of Quantities`
-            WHERE project = %s AND docstatus = 1
-        """, project_name)[0][0]
+        from quantity_survey.utils.financial_rollup import get_project_financial_summary
+        
+        rollup = get_project_financial_summary(project_name)
+        work_done = rollup["total_valuations"]
+        certified = rollup["total_certified"]
+        contract_value = rollup["total_boq_value"]
         
         summary["work_done"] = work_done
         summary["certified"] = certified
@@ -0,0 +1,280 @@
+"""
+Bulk Engine Module
+Columnar, vectorised edits of Final Account items without loading the document
+"""
+
+import melon
+from melon import _
+from melon.utils import flt
+from typing import Dict, List
+import numpy as np
+
+# Float columns of Final Account Item held as arrays
+ITEM_NUMERIC_COLUMNS = (
+    'original_quantity', 'original_rate', 'original_amount',
+    'final_quantity', 'final_rate', 'final_amount',
+    'quantity_variance', 'rate_variance', 'amount_variance'
+)
+
+ITEM_TEXT_COLUMNS = ('item_code', 'item_name', 'uom')
+
+# Rows per batched UPDATE / DELETE
+BULK_WRITE_CHUNK_SIZE = 1000
+
+
+class FinalAccountItemColumns:
+    """
+    Items of one Final Account, as one array per field.
+
+    Only the rows selected by the bulk operation filters are loaded, in idx
+    order and with a single query. Operations work on a row mask.
+    recalculate() applies FinalAccountItem.validate to every row at once,
+    and save() writes back only the rows (and fields) that differ from
+    what was loaded.
+    """
+
+    def __init__(self, final_account: str, names: List[str], text: Dict[str, np.ndarray],
+            numeric: Dict[str, np.ndarray]):
+        self.final_account = final_account
+        self.names = np.array(names, dtype=object)
+        self.text = text
+        self.numeric = numeric
+        self.deleted = np.zeros(len(names), dtype=bool)
+
+        # Loaded values, to find what changed
+        self.loaded_text = {field: column.copy() for field, column in text.items()}
+        self.loaded_numeric = {field: column.copy() for field, column in numeric.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, final_account: str, filters: Dict = None) -> 'FinalAccountItemColumns':
+        """Rows matching filters (see compile_item_filters); all rows when there are none"""
+        from quantity_survey.utils.bulk_operations import get_filtered_item_rows
+
+        fields = ('name',) + ITEM_TEXT_COLUMNS + ITEM_NUMERIC_COLUMNS
+        rows = get_filtered_item_rows(final_account, filters, list(fields))
+
+        by_field = {field: [row[field] for row in rows] for field in fields}
+
+        return cls(
+            final_account,
+            by_field['name'],
+            {field: np.array([value or '' for value in by_field[field]], dtype=object) for field in ITEM_TEXT_COLUMNS},
+            {field: np.fromiter((flt(value) for value in by_field[field]), dtype=float, count=len(rows))
+                for field in ITEM_NUMERIC_COLUMNS}
+        )
+
+    def update_rate(self, rows: np.ndarray, new_rate: float = None, percentage: float = None):
+        """Set final_rate, or scale it by percentage"""
+        rate = self.numeric['final_rate']
+        if new_rate:
+            rate[rows] = new_rate
+        elif percentage:
+            rate[rows] *= 1 + percentage / 100
+        else:
+            return
+
+        self.numeric['final_amount'][rows] = self.numeric['final_quantity'][rows] * rate[rows]
+
+    def apply_variance_percentage(self, rows: np.ndarray, percentage: float):
+        """Final quantity = original quantity adjusted by percentage, where there is one"""
+        if not percentage:
+            return
+
+        original = self.numeric['original_quantity']
+        rows = rows & (original != 0)
+
+        quantity = self.numeric['final_quantity']
+        quantity[rows] = original[rows] * (1 + percentage / 100)
+        self.numeric['final_amount'][rows] = quantity[rows] * self.numeric['final_rate'][rows]
+        self.numeric['quantity_variance'][rows] = quantity[rows] - original[rows]
+
+    def update_uom(self, rows: np.ndarray, new_uom: str, get_conversion_factor) -> List[str]:
+        """
+        Convert quantities and rates to new_uom, with one factor lookup per distinct current UOM.
+
+        Rates are divided by the factor the quantities are multiplied by, so
+        amounts do not change. Rows whose UOM cannot be converted are left
+        alone; their UOMs are returned.
+        """
+        if not new_uom:
+            return []
+
+        uoms = self.text['uom']
+        rows = rows & (uoms != new_uom)
+
+        factors = np.ones(len(self))
+        unconvertible = []
+        for uom in sorted(set(uoms[rows].tolist())):
+            factor = get_conversion_factor(uom, new_uom)
+            if not factor:
+                unconvertible.append(uom)
+                rows &= uoms != uom
+            else:
+                factors[rows & (uoms == uom)] = factor
+
+        self.numeric['final_quantity'][rows] *= factors[rows]
+        self.numeric['original_quantity'][rows] *= factors[rows]
+        self.numeric['final_rate'][rows] /= factors[rows]
+        self.numeric['original_rate'][rows] /= factors[rows]
+        uoms[rows] = new_uom
+
+        return unconvertible
+
+    def delete(self, rows: np.ndarray):
+        """Drop rows; the account's remaining rows are renumbered on save"""
+        self.deleted |= rows
+
+    def recalculate(self):
+        """FinalAccountItem.validate for every row at once"""
+        n = self.numeric
+        quantity, rate, amount = n['final_quantity'], n['final_rate'], n['final_amount']
+
+        priced = (quantity != 0) & (rate != 0)
+        amount[priced] = quantity[priced] * rate[priced]
+
+        for variance, original, final in (
+            ('quantity_variance', 'original_quantity', 'final_quantity'),
+            ('rate_variance', 'original_rate', 'final_rate'),
+            ('amount_variance', 'original_amount', 'final_amount')
+        ):
+            present = (n[original] != 0) & (n[final] != 0)
+            n[variance][present] = n[final][present] - n[original][present]
+
+    def get_row_updates(self) -> Dict[str, Dict]:
+        """name -> {field: value} for the fields that changed on kept rows"""
+        kept = ~self.deleted
+        changes = []
+
+        for field in ITEM_TEXT_COLUMNS:
+            changes.append((field, self.text[field], (self.text[field] != self.loaded_text[field]) & kept))
+        for field in ITEM_NUMERIC_COLUMNS:
+            changes.append((field, self.numeric[field], (self.numeric[field] != self.loaded_numeric[field]) & kept))
+
+        updates: Dict[str, Dict] = {}
+        for field, column, changed in changes:
+            for position in np.flatnonzero(changed).tolist():
+                value = column[position]
+                updates.setdefault(self.names[position], {})[field] = value.item() if hasattr(value, 'item') else value
+
+        return updates
+
+    def get_before_image(self) -> Dict:
+        """
+        Loaded values of what save() is about to change, column by column.
+
+        Only changed rows and the columns changed on at least one of them
+        are kept. Rows about to be deleted are read back in full, together
+        with the idx of every row of the account, so undo can put them
+        back where they were.
+        """
+        kept = ~self.deleted
+        changed_rows = np.zeros(len(self), dtype=bool)
+        changed_columns = []
+
+        for field, column, loaded in (
+            [(field, self.text[field], self.loaded_text[field]) for field in ITEM_TEXT_COLUMNS]
+            + [(field, self.numeric[field], self.loaded_numeric[field]) for field in ITEM_NUMERIC_COLUMNS]
+        ):
+            changed = (column != loaded) & kept
+            if changed.any():
+                changed_rows |= changed
+                changed_columns.append((field, loaded))
+
+        positions = np.flatnonzero(changed_rows)
+        image = {
+            'names': self.names[positions].tolist(),
+            'columns': {field: loaded[positions].tolist() for field, loaded in changed_columns}
+        }
+
+        deleted_names = self.names[self.deleted].tolist()
+        if deleted_names:
+            rows = []
+            for start in range(0, len(deleted_names), BULK_WRITE_CHUNK_SIZE):
+                rows.extend(melon.db.sql("""
+                    SELECT * FROM `tabFinal Account Item` WHERE name IN %s
+                """, (tuple(deleted_names[start:start + BULK_WRITE_CHUNK_SIZE]),), as_dict=True))
+
+            fields = list(rows[0].keys())
+            image['deleted'] = {'fields': fields, 'rows': [[row[field] for field in fields] for row in rows]}
+            image['idx'] = [list(row) for row in get_final_account_item_order(self.final_account)]
+
+        return image
+
+    def save(self) -> Dict:
+        """
+        Write changed rows, delete removed ones and refresh the header totals.
+
+        Child rows are written with batched CASE updates; the header is
+        updated once. No document is loaded, so no Version is recorded;
+        the returned before_image (see get_before_image) is what undo needs.
+        """
+        self.recalculate()
+        before_image = self.get_before_image()
+
+        deleted_names = self.names[self.deleted].tolist()
+        for start in range(0, len(deleted_names), BULK_WRITE_CHUNK_SIZE):
+            melon.db.delete('Final Account Item', {'name': ['in', deleted_names[start:start + BULK_WRITE_CHUNK_SIZE]]})
+        if deleted_names:
+            renumber_final_account_items(self.final_account)
+
+        updates = self.get_row_updates()
+        if updates:
+            melon.db.bulk_update('Final Account Item', updates, chunk_size=BULK_WRITE_CHUNK_SIZE)
+
+        update_final_account_totals(self.final_account)
+
+        return {'rows_updated': len(updates), 'rows_deleted': len(deleted_names), 'before_image': before_image}
+
+
+def update_final_account_totals(final_account: str):
+    """FinalAccount.calculate_final_amounts without loading the document"""
+    from quantity_survey.quantity_surveying.doctype.final_account.final_account import get_final_amounts
+
+    header = melon.db.get_value('Final Account', final_account,
+        ['less_retention_percentage', 'vat_percentage', 'previous_payments'], as_dict=True)
+
+    # Unselected rows count too, so the total comes from the table
+    total_certified = flt(melon.db.sql("""
+        SELECT COALESCE(SUM(final_amount), 0)
+        FROM `tabFinal Account Item`
+        WHERE parent = %s AND parenttype = 'Final Account' AND parentfield = 'final_account_items'
+    """, (final_account,))[0][0])
+
+    melon.db.set_value('Final Account', final_account, get_final_amounts(
+        total_certified, header.less_retention_percentage, header.vat_percentage, header.previous_payments
+    ))
+
+
+def get_final_account_item_order(final_account: str) -> List:
+    """(name, idx) of every row of the account, in idx order"""
+    return melon.db.sql("""
+        SELECT name, idx
+        FROM `tabFinal Account Item`
+        WHERE parent = %s AND parenttype = 'Final Account' AND parentfield = 'final_account_items'
+        ORDER BY idx
+    """, (final_account,))
+
+
+def renumber_final_account_items(final_account: str):
+    """Close the idx gaps left by deleted rows, as Document.remove does"""
+    rows = get_final_account_item_order(final_account)
+
+    updates = {name: {'idx': position} for position, (name, idx) in enumerate(rows, 1) if idx != position}
+    if updates:
+        melon.db.bulk_update('Final Account Item', updates, chunk_size=BULK_WRITE_CHUNK_SIZE)
+
+
+def check_final_account_editable(final_account: str):
+    """Lock the header row; only draft accounts the user may write can be bulk edited"""
+    docstatus = melon.db.get_value('Final Account', final_account, 'docstatus', for_update=True)
+    if docstatus is None:
+        melon.throw(_('Final Account {0} not found').format(final_account))
+
+    if not melon.has_permission('Final Account', 'write', final_account):
+        melon.throw(_('Access denied'), melon.PermissionError)
+
+    if int(docstatus) != 0:
+        melon.throw(_('Only draft Final Accounts can be bulk edited'))
@@ -0,0 +1,146 @@
+"""
+Bulk Journal Module
+Compressed before-images of bulk operations, and their undo
+"""
+
+import melon
+from melon import _
+from melon.utils import get_datetime, now_datetime
+from typing import Dict
+import base64
+import json
+import zlib
+
+from quantity_survey.utils.bulk_engine import (
+    BULK_WRITE_CHUNK_SIZE, check_final_account_editable, get_final_account_item_order,
+    update_final_account_totals
+)
+
+
+def record_bulk_operation(final_account: str, operation: str, filters: Dict, parameters: Dict,
+        before_image: Dict) -> str:
+    """Journal one applied operation; returns the journal name, or None when nothing changed"""
+    if not before_image['names'] and not before_image.get('deleted'):
+        return None
+
+    encoded = encode_before_image(before_image)
+
+    journal = melon.get_doc({
+        'doctype': 'Bulk Operation Journal',
+        'final_account': final_account,
+        'operation': operation,
+        'status': 'Applied',
+        'filters': json.dumps(filters or {}, indent=1),
+        'parameters': json.dumps(parameters or {}, indent=1),
+        'rows_changed': len(before_image['names']),
+        'rows_deleted': len(before_image.get('deleted', {}).get('rows', [])),
+        'compressed_size': len(encoded),
+        'before_image': encoded,
+        'document_modified': melon.db.get_value('Final Account', final_account, 'modified')
+    })
+    journal.insert(ignore_permissions=True)
+
+    return journal.name
+
+
+@melon.whitelist()
+def undo_bulk_operation(journal: str) -> Dict:
+    """
+    Put the rows a bulk operation touched back to their previous values.
+
+    Values are restored with batched updates and deleted rows re-inserted
+    in place, then the header totals are refreshed; the Final Account is
+    not loaded or saved. Operations on an account are undone newest first,
+    and only while nothing else has changed the account since.
+    """
+    try:
+        doc = melon.get_doc('Bulk Operation Journal', journal, for_update=True)
+
+        if doc.status != 'Applied':
+            return {'success': False, 'message': _('Operation already undone')}
+
+        check_final_account_editable(doc.final_account)
+
+        if get_datetime(melon.db.get_value('Final Account', doc.final_account, 'modified')) != get_expected_modified(doc):
+            return {
+                'success': False,
+                'message': _('Final Account {0} has changed since this operation; undo the later changes first')
+                    .format(doc.final_account)
+            }
+
+        image = decode_before_image(doc.before_image)
+        restore_before_image(doc.final_account, image)
+
+        doc.db_set({
+            'status': 'Undone',
+            'undone_at': now_datetime(),
+            'undone_by': melon.session.user,
+            'restored_modified': melon.db.get_value('Final Account', doc.final_account, 'modified')
+        })
+
+        return {
+            'success': True,
+            'rows_restored': len(image['names']) + len(image.get('deleted', {}).get('rows', [])),
+            'message': _('Bulk operation undone')
+        }
+
+    except Exception as e:
+        melon.db.rollback()
+        melon.log_error(f"Bulk operation undo error: {str(e)}", "Bulk Operations")
+        return {'success': False, 'message': f'Undo failed: {str(e)}'}
+
+
+def get_expected_modified(doc):
+    """
+    Modified timestamp the account must still have for doc to be undone.
+
+    Either the one the operation left, or, when every later operation was
+    undone, the one left by undoing the earliest of them.
+    """
+    later = melon.get_all('Bulk Operation Journal',
+        filters={'final_account': doc.final_account, 'creation': ['>', doc.creation]},
+        fields=['status', 'restored_modified'],
+        order_by='creation asc'
+    )
+
+    if not later:
+        return get_datetime(doc.document_modified)
+
+    if any(row.status != 'Undone' for row in later):
+        return None
+
+    return get_datetime(later[0].restored_modified)
+
+
+def restore_before_image(final_account: str, image: Dict):
+    """Write a before-image back: deleted rows, row order, then column values"""
+    deleted = image.get('deleted')
+    if deleted:
+        melon.db.bulk_insert('Final Account Item', deleted['fields'], [tuple(row) for row in deleted['rows']],
+            chunk_size=BULK_WRITE_CHUNK_SIZE)
+
+    updates: Dict[str, Dict] = {}
+
+    if image.get('idx'):
+        current = dict(get_final_account_item_order(final_account))
+        for name, idx in image['idx']:
+            if name in current and current[name] != idx:
+                updates.setdefault(name, {})['idx'] = idx
+
+    for field, values in image['columns'].items():
+        for name, value in zip(image['names'], values):
+            updates.setdefault(name, {})[field] = value
+
+    if updates:
+        melon.db.bulk_update('Final Account Item', updates, chunk_size=BULK_WRITE_CHUNK_SIZE)
+
+    update_final_account_totals(final_account)
+
+
+def encode_before_image(image: Dict) -> str:
+    payload = json.dumps(image, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.b64encode(zlib.compress(payload, 6)).decode('ascii')
+
+
+def decode_before_image(encoded: str) -> Dict:
+    return json.loads(zlib.decompress(base64.b64decode(encoded)).decode('utf-8'))
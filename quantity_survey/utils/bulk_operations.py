@@ -5,176 +5,314 @@ Provides bulk editing and operations for quantity survey documents
 
 import melon
 from melon import _
-from melon.utils import flt, cint
-from typing import Dict, List, Any
+from melon.utils import flt, cint, now
+from typing import Dict, List, Any, Tuple
 import json
+import numpy as np
+
+from quantity_survey.utils.uom_conversion import get_uom_conversion_factor
+
+# Operations applied by the columnar engine (see quantity_survey.utils.bulk_engine)
+BULK_OPERATIONS = ['Update Rate', 'Apply Variance %', 'Update UOM', 'Bulk Delete']
+
+# Operations available on BoQ rows
+BOQ_BULK_OPERATIONS = ['Update Rate']
 
 @melon.whitelist()
 def execute_bulk_operation(final_account: str, operation: str, filters: Dict, parameters: Dict) -> Dict:
     """
     Execute bulk operations on final account items
+    
+    Items are loaded as columns and edited in vectorised form; only the
+    changed rows are written back and the header totals are refreshed
+    once, without saving the whole Final Account.
     """
     try:
-        doc = melon.get_doc('Final Account', final_account)
-        
-        # Get filtered items
-        items_to_update = get_filtered_items(doc, filters)
-        
-        if not items_to_update:
-            return {'success': False, 'message': 'No items match the specified criteria'}
+        if isinstance(filters, str):
+            filters = json.loads(filters)
+        if isinstance(parameters, str):
+            parameters = json.loads(parameters)
         
-        # Execute the operation
-        updated_count = 0
-        errors = []
+        if operation not in BULK_OPERATIONS:
+            return {'success': False, 'message': f'Unsupported operation: {operation}'}
         
-        for item in items_to_update:
-            try:
-                if operation == 'Update Rate':
-                    update_item_rate(item, parameters)
-                    updated_count += 1
-                
-                elif operation == 'Apply Variance %':
-                    apply_variance_percentage(item, parameters)
-                    updated_count += 1
-                
-                elif operation == 'Update UOM':
-                    update_item_uom(item, parameters)
-                    updated_count += 1
-                
-                elif operation == 'Bulk Delete':
-                    if can_delete_item(item):
-                        doc.remove(item)
-                        updated_count += 1
-                    else:
-                        errors.append(f"Cannot delete {item.item_name} - has dependencies")
-                
-            except Exception as e:
-                errors.append(f"Error updating {item.item_name}: {str(e)}")
-        
-        # Save the document
-        doc.save()
-        
-        return {
-            'success': True,
-            'updated_count': updated_count,
-            'total_items': len(items_to_update),
-            'errors': errors,
-            'message': f'Successfully updated {updated_count} items'
-        }
+        return apply_bulk_operation(final_account, operation, filters, parameters)
         
     except Exception as e:
+        melon.db.rollback()
         melon.log_error(f"Bulk operation error: {str(e)}", "Bulk Operations")
         return {'success': False, 'message': f'Operation failed: {str(e)}'}
 
-def get_filtered_items(doc, filters: Dict) -> List:
-    """Get items that match the specified filters"""
-    filtered_items = []
+def apply_bulk_operation(final_account: str, operation: str, filters: Dict = None, parameters: Dict = None) -> Dict:
+    """
+    Apply one bulk operation to a Final Account, without committing.
+    
+    Raises when the account cannot be edited; the caller rolls back. The
+    rows' previous values are kept in a Bulk Operation Journal, which
+    quantity_survey.utils.bulk_journal.undo_bulk_operation restores.
+    """
+    from quantity_survey.utils.bulk_engine import FinalAccountItemColumns, check_final_account_editable
+    from quantity_survey.utils.bulk_journal import record_bulk_operation
+    
+    filters = filters or {}
+    parameters = parameters or {}
+    
+    check_final_account_editable(final_account)
+    
+    # Only the rows the filters select are read and written
+    columns = FinalAccountItemColumns.load(final_account, filters)
+    rows = np.ones(len(columns), dtype=bool)
+    matched = len(columns)
+    
+    if not matched:
+        return {'success': False, 'message': 'No items match the specified criteria'}
+    
+    errors = []
+    
+    if operation == 'Update Rate':
+        columns.update_rate(rows, flt(parameters.get('new_value')), flt(parameters.get('percentage_adjustment')))
+    
+    elif operation == 'Apply Variance %':
+        columns.apply_variance_percentage(rows, flt(parameters.get('percentage_adjustment')))
+    
+    elif operation == 'Update UOM':
+        new_uom = parameters.get('new_uom')
+        for uom in columns.update_uom(rows, new_uom, get_uom_conversion_factor):
+            errors.append(f"No conversion from {uom} to {new_uom}; those items were left unchanged")
+    
+    elif operation == 'Bulk Delete':
+        deletable = np.fromiter((can_delete_item(name) for name in columns.names[rows]), dtype=bool, count=matched)
+        for item_name in columns.text['item_name'][rows][~deletable]:
+            errors.append(f"Cannot delete {item_name} - has dependencies")
+        
+        rows[rows] = deletable
+        columns.delete(rows)
+    
+    written = columns.save()
+    updated_count = int(rows.sum())
+    
+    # Compressed before-image instead of a full-document Version
+    journal = record_bulk_operation(final_account, operation, filters, parameters, written['before_image'])
+    
+    return {
+        'success': True,
+        'updated_count': updated_count,
+        'total_items': matched,
+        'rows_written': written['rows_updated'] + written['rows_deleted'],
+        'journal': journal,
+        'errors': errors,
+        'message': f'Successfully updated {updated_count} items'
+    }
+
+def apply_boq_bulk_operation(boq: str, operation: str, filters: Dict = None, parameters: Dict = None) -> Dict:
+    """
+    Apply one bulk operation to the rows of a draft BoQ, without committing.
+    
+    Rates are changed with one UPDATE per chunk of matching rows and the
+    header totals are refreshed once, as for Final Accounts.
+    """
+    from quantity_survey.bim.boq_builder import refresh_boq_totals
+    from quantity_survey.utils.bulk_engine import BULK_WRITE_CHUNK_SIZE
+    
+    filters = filters or {}
+    parameters = parameters or {}
+    
+    if operation not in BOQ_BULK_OPERATIONS:
+        melon.throw(_('Unsupported operation for BoQ: {0}').format(operation))
+    
+    if filters.get('variance_threshold'):
+        melon.throw(_('BoQ items have no variance to filter on'))
+    
+    check_boq_editable(boq)
+    
+    joins, conditions, values = compile_item_filters(filters, alias='boq_item')
+    values['boq'] = boq
+    names = [row[0] for row in melon.db.sql(f"""
+        SELECT boq_item.name
+        FROM `tabBoQ Item` boq_item {joins}
+        WHERE boq_item.parent = %(boq)s
+            AND boq_item.parenttype = 'BoQ'
+            AND boq_item.parentfield = 'boq_items'
+            {conditions}
+    """, values)]
+    
+    if not names:
+        return {'success': False, 'message': 'No items match the specified criteria'}
     
-    for item in doc.final_account_items:
-        if matches_filter(item, filters):
-            filtered_items.append(item)
+    new_rate = flt(parameters.get('new_value'))
+    factor = 1 + flt(parameters.get('percentage_adjustment')) / 100
     
-    return filtered_items
+    if new_rate or factor != 1:
+        # amount is assigned first so it is computed from the rate before the change
+        assignments = ('amount = quantity * %(rate)s, rate = %(rate)s' if new_rate
+            else 'amount = quantity * rate * %(factor)s, rate = rate * %(factor)s')
+        
+        for start in range(0, len(names), BULK_WRITE_CHUNK_SIZE):
+            melon.db.sql(f"""
+                UPDATE `tabBoQ Item`
+                SET {assignments}
+                WHERE name IN %(names)s
+            """, {'names': tuple(names[start:start + BULK_WRITE_CHUNK_SIZE]), 'rate': new_rate, 'factor': factor})
+        
+        refresh_boq_totals(boq)
+        melon.db.set_value('BoQ', boq, 'modified', now())
+    
+    return {
+        'success': True,
+        'updated_count': len(names),
+        'total_items': len(names),
+        'rows_written': len(names),
+        'errors': [],
+        'message': f'Successfully updated {len(names)} items'
+    }
 
-def matches_filter(item, filters: Dict) -> bool:
-    """Check if item matches the filter criteria"""
+def check_boq_editable(boq: str):
+    """Lock the header row; only draft BoQs the user may write can be bulk edited"""
+    docstatus = melon.db.get_value('BoQ', boq, 'docstatus', for_update=True)
+    if docstatus is None:
+        melon.throw(_('BoQ {0} not found').format(boq))
+    
+    if not melon.has_permission('BoQ', 'write', boq):
+        melon.throw(_('Access denied'), melon.PermissionError)
+    
+    if int(docstatus) != 0:
+        melon.throw(_('Only draft BoQs can be bulk edited'))
+
+# Filter keys understood by compile_item_filters
+ITEM_FILTER_KEYS = ['item_category', 'variance_threshold', 'item_code', 'uom']
+
+# Rows returned by preview_bulk_operation
+PREVIEW_ROW_LIMIT = 50
+
+def compile_item_filters(filters: Dict, alias: str = 'fai') -> Tuple[str, str, Dict]:
+    """
+    Compile bulk operation filters into SQL over the child table aliased as
+    alias (`tabFinal Account Item` fai unless given).
+    
+    Returns (joins, conditions, values); conditions is a string of
+    'AND ...' clauses. item_category matches the Item Group and all its
+    descendants through the lft/rgt nested set, so only rows whose Item
+    sits under that group are returned. variance_threshold compares the
+    absolute amount variance as a percentage of the original amount.
+    """
+    filters = filters or {}
+    joins = []
+    conditions = []
+    values = {}
     
-    # Filter by item category
     if filters.get('item_category'):
-        item_doc = melon.get_cached_doc('Item', item.item_code)
-        if item_doc.item_group != filters['item_category']:
-            return False
+        bounds = melon.db.get_value('Item Group', filters['item_category'], ['lft', 'rgt'], as_dict=True)
+        if not bounds:
+            # Unknown group: nothing can match
+            conditions.append('1 = 0')
+        else:
+            joins.append(f'INNER JOIN `tabItem` item ON item.name = {alias}.item_code')
+            joins.append('INNER JOIN `tabItem Group` item_group ON item_group.name = item.item_group')
+            conditions.append('item_group.lft >= %(group_lft)s AND item_group.rgt <= %(group_rgt)s')
+            values.update(group_lft=bounds.lft, group_rgt=bounds.rgt)
     
-    # Filter by variance threshold
     if filters.get('variance_threshold'):
-        variance = abs(flt(item.get('variance_percentage', 0)))
-        if variance < flt(filters['variance_threshold']):
-            return False
+        conditions.append(f"""ABS(CASE WHEN {alias}.original_amount != 0
+            THEN {alias}.amount_variance * 100 / {alias}.original_amount ELSE 0 END) >= %(variance_threshold)s""")
+        values['variance_threshold'] = flt(filters['variance_threshold'])
     
-    # Add more filter criteria as needed
+    for field in ('item_code', 'uom'):
+        value = filters.get(field)
+        if isinstance(value, (list, tuple)):
+            if not value:
+                conditions.append('1 = 0')
+                continue
+            conditions.append(f'{alias}.{field} IN %({field})s')
+            values[field] = tuple(value)
+        elif value:
+            conditions.append(f'{alias}.{field} = %({field})s')
+            values[field] = value
     
-    return True
+    return ' '.join(joins), ''.join(f' AND {condition}' for condition in conditions), values
 
-def update_item_rate(item, parameters: Dict):
-    """Update item rate"""
-    if parameters.get('new_value'):
-        item.actual_rate = flt(parameters['new_value'])
-    elif parameters.get('percentage_adjustment'):
-        current_rate = flt(item.actual_rate)
-        adjustment = flt(parameters['percentage_adjustment']) / 100
-        item.actual_rate = current_rate * (1 + adjustment)
-    
-    # Recalculate amount
-    item.actual_amount = flt(item.actual_quantity) * flt(item.actual_rate)
+def get_filtered_item_rows(final_account: str, filters: Dict, fields: List[str] = None,
+        limit: int = None) -> List[Dict]:
+    """Final Account Item rows matching filters, in idx order, read with one query"""
+    query, values = get_filtered_item_query(final_account, filters, fields, limit)
+    return melon.db.sql(query, values, as_dict=True)
 
-def apply_variance_percentage(item, parameters: Dict):
-    """Apply variance percentage to quantity"""
-    if parameters.get('percentage_adjustment') and item.boq_quantity:
-        adjustment = flt(parameters['percentage_adjustment']) / 100
-        item.actual_quantity = flt(item.boq_quantity) * (1 + adjustment)
-        
-        # Recalculate amount and variance
-        item.actual_amount = flt(item.actual_quantity) * flt(item.actual_rate)
-        item.quantity_variance = flt(item.actual_quantity) - flt(item.boq_quantity)
+def get_filtered_item_query(final_account: str, filters: Dict, fields: List[str] = None,
+        limit: int = None) -> Tuple[str, Dict]:
+    """(query, values) selecting the Final Account Item rows matching filters, in idx order"""
+    joins, conditions, values = compile_item_filters(filters)
+    values['final_account'] = final_account
+    
+    columns = ', '.join(f'fai.`{field}`' for field in (fields or ['name']))
+    limit_clause = f' LIMIT {cint(limit)}' if limit else ''
+    
+    return f"""
+        SELECT {columns}
+        FROM `tabFinal Account Item` fai {joins}
+        WHERE fai.parent = %(final_account)s
+            AND fai.parenttype = 'Final Account'
+            AND fai.parentfield = 'final_account_items'
+            {conditions}
+        ORDER BY fai.idx{limit_clause}
+    """, values
 
-def update_item_uom(item, parameters: Dict):
-    """Update item UOM"""
-    if parameters.get('new_uom'):
-        # Convert quantities if needed
-        old_uom = item.uom
-        new_uom = parameters['new_uom']
-        
-        if old_uom != new_uom:
-            conversion_factor = get_uom_conversion_factor(old_uom, new_uom)
-            if conversion_factor:
-                item.actual_quantity = flt(item.actual_quantity) * conversion_factor
-                item.boq_quantity = flt(item.boq_quantity) * conversion_factor
-                item.uom = new_uom
+def get_filtered_item_names(final_account: str, filters: Dict) -> List[str]:
+    """Names of the Final Account Item rows matching filters"""
+    return [row.name for row in get_filtered_item_rows(final_account, filters)]
+
+@melon.whitelist()
+def preview_bulk_operation(final_account: str, filters: Dict = None) -> Dict:
+    """How many rows a bulk operation with these filters would touch, and the first of them"""
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    
+    if not melon.has_permission('Final Account', 'read', final_account):
+        melon.throw(_('Access denied'), melon.PermissionError)
+    
+    joins, conditions, values = compile_item_filters(filters)
+    values['final_account'] = final_account
+    
+    matched = melon.db.sql(f"""
+        SELECT COUNT(*)
+        FROM `tabFinal Account Item` fai {joins}
+        WHERE fai.parent = %(final_account)s
+            AND fai.parenttype = 'Final Account'
+            AND fai.parentfield = 'final_account_items'
+            {conditions}
+    """, values)[0][0]
+    
+    return {
+        'matched': cint(matched),
+        'rows': get_filtered_item_rows(final_account, filters,
+            ['name', 'idx', 'item_code', 'item_name', 'uom', 'original_amount', 'final_amount', 'amount_variance'],
+            limit=PREVIEW_ROW_LIMIT)
+    }
 
-def can_delete_item(item) -> bool:
-    """Check if item can be deleted"""
+def can_delete_item(item_row: str) -> bool:
+    """Check if a Final Account Item row can be deleted"""
     # Add business logic to check if item has dependencies
     # For now, allow all deletions
     return True
 
-def get_uom_conversion_factor(from_uom: str, to_uom: str) -> float:
-    """Get conversion factor between UOMs"""
-    try:
-        # Try to get conversion from UOM Conversion Detail
-        conversion = melon.db.get_value('UOM Conversion Detail', 
-            {'parent': from_uom, 'uom': to_uom}, 'value')
-        
-        if conversion:
-            return flt(conversion)
-        
-        # Try reverse conversion
-        conversion = melon.db.get_value('UOM Conversion Detail',
-            {'parent': to_uom, 'uom': from_uom}, 'value')
-        
-        if conversion:
-            return 1 / flt(conversion)
-        
-        return 1  # Default to 1 if no conversion found
-        
-    except:
-        return 1
-
 @melon.whitelist()
 def export_to_excel(final_account: str, filters: Dict = None) -> str:
-    """Export final account items to Excel"""
+    """
+    Export final account items to Excel
+    
+    Rows are streamed from the database into a constant-memory workbook
+    in the private files folder (see quantity_survey.utils.xlsx_export).
+    """
+    from quantity_survey.utils.xlsx_export import StreamingXlsxWriter, write_row
+    
+    writer = None
     try:
-        import xlsxwriter
-        import tempfile
-        import os
+        if isinstance(filters, str):
+            filters = json.loads(filters)
         
-        doc = melon.get_doc('Final Account', final_account)
+        if not melon.has_permission('Final Account', 'read', final_account):
+            melon.throw(_('Access denied'), melon.PermissionError)
         
-        # Create temporary file
-        temp_dir = tempfile.mkdtemp()
-        file_path = os.path.join(temp_dir, f'final_account_{doc.name}.xlsx')
-        
-        workbook = xlsxwriter.Workbook(file_path)
-        worksheet = workbook.add_worksheet('Final Account Items')
+        writer = StreamingXlsxWriter(f'final_account_{final_account}.xlsx', 'Final Account', final_account)
+        worksheet = writer.add_worksheet('Final Account Items')
         
         # Headers
         headers = [
@@ -185,53 +323,41 @@ def export_to_excel(final_account: str, filters: Dict = None) -> str:
         ]
         
         # Write headers
-        header_format = workbook.add_format({'bold': True, 'bg_color': '#D7E4BC'})
+        header_format = writer.add_format({'bold': True, 'bg_color': '#D7E4BC'})
         for col, header in enumerate(headers):
             worksheet.write(0, col, header, header_format)
         
-        # Get filtered items
-        items = get_filtered_items(doc, filters or {})
+        # Filtered items (original = BoQ, final = actual)
+        query, values = get_filtered_item_query(final_account, filters, [
+            'item_code', 'item_name', 'description', 'uom',
+            'original_quantity', 'original_rate', 'original_amount',
+            'final_quantity', 'final_rate', 'final_amount',
+            'quantity_variance', 'amount_variance'
+        ])
+        formats = [None] * len(headers)
         
         # Write data
-        for row, item in enumerate(items, 1):
-            data = [
-                item.item_code,
-                item.item_name,
-                item.description,
-                item.uom,
-                item.boq_quantity,
-                item.boq_rate,
-                item.boq_amount,
-                item.actual_quantity,
-                item.actual_rate,
-                item.actual_amount,
-                item.get('quantity_variance', 0),
-                item.get('amount_variance', 0),
-                item.get('variance_percentage', 0)
-            ]
-            
-            for col, value in enumerate(data):
-                worksheet.write(row, col, value)
-        
-        workbook.close()
-        
-        # Save file to Melon's file system
-        with open(file_path, 'rb') as f:
-            file_doc = melon.get_doc({
-                'doctype': 'File',
-                'file_name': f'final_account_{doc.name}.xlsx',
-                'content': f.read(),
-                'is_private': 1
-            })
-            file_doc.save()
-        
-        # Cleanup
-        os.remove(file_path)
-        os.rmdir(temp_dir)
-        
-        return file_doc.file_url
+        writer.write_query(worksheet, 1, query, values, lambda sheet, row, item: write_row(sheet, row, [
+            item.item_code,
+            item.item_name,
+            item.description,
+            item.uom,
+            item.original_quantity,
+            item.original_rate,
+            item.original_amount,
+            item.final_quantity,
+            item.final_rate,
+            item.final_amount,
+            item.quantity_variance or 0,
+            item.amount_variance or 0,
+            flt(item.amount_variance) * 100 / flt(item.original_amount) if flt(item.original_amount) else 0
+        ], formats))
+        
+        return writer.save().file_url
         
     except Exception as e:
+        if writer:
+            writer.discard()
         melon.log_error(f"Excel export error: {str(e)}", "Bulk Operations")
         return None
 
@@ -8,6 +8,8 @@ from melon import _
 from melon.utils import flt, cint, getdate, now_datetime
 from typing import Dict, List, Optional, Any
 
+from quantity_survey.utils import financial_rollup
+
 
 def get_project_financial_summary(project: str) -> Dict[str, float]:
 	"""
@@ -17,57 +19,13 @@ def get_project_financial_summary(project: str) -> Dict[str, float]:
 		project (str): Project name
 		
 	Returns:
-		Dict: Financial summary with totals
+		Dict: Financial summary with totals (see quantity_survey.utils.financial_rollup)
 	"""
 	if not project:
 		melon.throw(_("Project is required"))
 	
 	try:
-		summary = {
-			'total_boq_value': 0.0,
-			'total_valuations': 0.0,
-			'total_variations': 0.0,
-			'total_payments': 0.0,
-			'outstanding_amount': 0.0,
-			'completion_percentage': 0.0
-		}
-		
-		# Get BOQ totals
-		boq_data = melon.db.get_all('BOQ',
-			filters={'project': project, 'docstatus': 1},
-			fields=['total_amount']
-		)
-		summary['total_boq_value'] = sum(flt(d.total_amount) for d in boq_data)
-		
-		# Get valuation totals
-		val_data = melon.db.get_all('Valuation',
-			filters={'project': project, 'docstatus': 1},
-			fields=['total_amount']
-		)
-		summary['total_valuations'] = sum(flt(d.total_amount) for d in val_data)
-		
-		# Get variation totals
-		var_data = melon.db.get_all('Variation Order',
-			filters={'project': project, 'docstatus': 1},
-			fields=['total_amount']
-		)
-		summary['total_variations'] = sum(flt(d.total_amount) for d in var_data)
-		
-		# Get payment totals
-		pay_data = melon.db.get_all('Payment Certificate',
-			filters={'project': project, 'docstatus': 1},
-			fields=['certificate_amount']
-		)
-		summary['total_payments'] = sum(flt(d.certificate_amount) for d in pay_data)
-		
-		# Calculate outstanding
-		summary['outstanding_amount'] = summary['total_valuations'] - summary['total_payments']
-		
-		# Calculate completion percentage
-		if summary['total_boq_value'] > 0:
-			summary['completion_percentage'] = (summary['total_valuations'] / summary['total_boq_value']) * 100
-		
-		return summary
+		return financial_rollup.get_project_financial_summary(project)
 		
 	except Exception as e:
 		melon.log_error(f"Project financial summary error: {str(e)}", "QS Utilities")
@@ -308,28 +266,24 @@ def get_dashboard_data(project: str = None) -> Dict:
 		Dict: Dashboard data
 	"""
 	try:
-		filters = {}
-		if project:
-			filters['project'] = project
-		
-		# Get counts
-		boq_count = melon.db.count('BOQ', filters)
-		valuation_count = melon.db.count('Valuation', filters)
-		variation_count = melon.db.count('Variation Order', filters)
-		payment_count = melon.db.count('Payment Certificate', filters)
-		
-		# Get financial data
+		# Counts and totals of one project come from its cached rollup
 		financial_summary = {}
 		if project:
 			financial_summary = get_project_financial_summary(project)
+			counts = {
+				key: financial_summary.get(key, 0)
+				for key in ('boq_count', 'valuation_count', 'variation_count', 'payment_count')
+			}
+		else:
+			counts = {
+				'boq_count': melon.db.count('BoQ'),
+				'valuation_count': melon.db.count('Valuation'),
+				'variation_count': melon.db.count('Variation Order'),
+				'payment_count': melon.db.count('Payment Certificate')
+			}
 		
 		return {
-			'counts': {
-				'boq_count': boq_count,
-				'valuation_count': valuation_count,
-				'variation_count': variation_count,
-				'payment_count': payment_count
-			},
+			'counts': counts,
 			'financial_summary': financial_summary,
 			'timestamp': now_datetime()
 		}
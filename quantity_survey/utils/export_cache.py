@@ -0,0 +1,159 @@
+"""
+Export Cache Module
+Content-addressed reuse of generated export files
+"""
+
+import melon
+from melon.utils import add_days, now_datetime
+from typing import Callable, Dict, List
+import hashlib
+import os
+import time
+
+# Bump whenever an exporter's output changes, so older cached files are not served
+EXPORT_CACHE_VERSION = 2
+
+# Documents each exporter reads besides its own: (doctype, field linking them to it)
+EXPORT_SOURCES = {
+    'final_account_excel': [('Final Account Item', 'parent')],
+    'boq_csv': [('BoQ Item', 'parent')],
+    'project_summary_excel': [
+        ('BoQ', 'project'),
+        ('Valuation', 'project'),
+        ('Variation Order', 'project'),
+        ('Payment Certificate', 'project')
+    ]
+}
+
+# Cached exports not rebuilt for this many days are removed
+EXPORT_CACHE_DAYS = 30
+
+# Unfinished export files older than this many seconds are left over from a crashed worker
+EXPORT_PART_FILE_AGE = 24 * 60 * 60
+
+
+def get_or_build_export(exporter: str, doctype: str, name: str, build: Callable) -> Dict:
+    """
+    File of an export, built by build() only when nothing it reads has changed.
+
+    The cache key hashes the exporter, the document, its modified timestamp
+    and, for every source in EXPORT_SOURCES, the row count and latest
+    modified of the linked rows, so edits, additions and deletions all
+    produce a new key. build() returns the new File document. Building
+    under a new key removes the files of earlier keys for the same
+    document and exporter.
+    """
+    cache_key = get_export_cache_key(exporter, doctype, name)
+
+    cached = get_cached_export(cache_key)
+    if cached:
+        return cached
+
+    file_doc = build()
+
+    entry = melon.get_doc({
+        'doctype': 'Export Cache Entry',
+        'exporter': exporter,
+        'reference_doctype': doctype,
+        'reference_name': name,
+        'cache_key': cache_key,
+        'file': file_doc.name,
+        'file_url': file_doc.file_url,
+        'file_name': file_doc.file_name
+    })
+
+    try:
+        entry.insert(ignore_permissions=True)
+    except melon.DuplicateEntryError:
+        # Built concurrently by another request: keep theirs
+        melon.delete_doc('File', file_doc.name, ignore_permissions=True)
+        return get_cached_export(cache_key)
+
+    remove_superseded_exports(exporter, doctype, name, cache_key)
+
+    return {'file_url': file_doc.file_url, 'file_name': file_doc.file_name, 'cached': False}
+
+
+def get_export_cache_key(exporter: str, doctype: str, name: str) -> str:
+    """Hash of everything the export depends on, read with one query"""
+    queries = [f'SELECT %(doctype)s AS source, 1 AS row_count, modified FROM `tab{doctype}` WHERE name = %(name)s']
+    for source, link_field in EXPORT_SOURCES.get(exporter, []):
+        queries.append(f"""
+            SELECT '{source}', COUNT(*), MAX(modified) FROM `tab{source}` WHERE `{link_field}` = %(name)s
+        """)
+
+    rows = melon.db.sql(' UNION ALL '.join(queries), {'doctype': doctype, 'name': name})
+
+    parts = [str(EXPORT_CACHE_VERSION), exporter, doctype, name]
+    parts.extend(f'{source}:{row_count}:{modified}' for source, row_count, modified in rows)
+
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_cached_export(cache_key: str) -> Dict:
+    entry = melon.db.get_value('Export Cache Entry', {'cache_key': cache_key},
+        ['name', 'file', 'file_url', 'file_name'], as_dict=True)
+    if not entry:
+        return None
+
+    if not entry.file or not melon.db.exists('File', entry.file):
+        # The file was deleted by hand; build it again
+        melon.db.delete('Export Cache Entry', {'name': entry.name})
+        return None
+
+    return {'file_url': entry.file_url, 'file_name': entry.file_name, 'cached': True}
+
+
+def remove_superseded_exports(exporter: str, doctype: str, name: str, current_key: str):
+    """Delete earlier exports of the same document and exporter"""
+    entries = melon.get_all('Export Cache Entry',
+        filters={
+            'exporter': exporter,
+            'reference_doctype': doctype,
+            'reference_name': name,
+            'cache_key': ['!=', current_key]
+        },
+        fields=['name', 'file']
+    )
+    remove_export_entries(entries)
+
+
+def remove_export_entries(entries: List):
+    for entry in entries:
+        if entry.file and melon.db.exists('File', entry.file):
+            # Deleting the File removes it from disk too
+            melon.delete_doc('File', entry.file, ignore_permissions=True, force=True)
+        melon.db.delete('Export Cache Entry', {'name': entry.name})
+
+
+def cleanup_export_cache():
+    """
+    Remove cached exports older than EXPORT_CACHE_DAYS and export files
+    abandoned half way (called by scheduler)
+    """
+    from quantity_survey.utils.xlsx_export import get_export_folder
+
+    try:
+        entries = melon.get_all('Export Cache Entry',
+            filters={'creation': ['<', add_days(now_datetime(), -EXPORT_CACHE_DAYS)]},
+            fields=['name', 'file']
+        )
+        remove_export_entries(entries)
+
+        folder = get_export_folder()
+        removed_parts = 0
+        if os.path.isdir(folder):
+            for file_name in os.listdir(folder):
+                file_path = os.path.join(folder, file_name)
+                if file_name.endswith('.part') and time.time() - os.path.getmtime(file_path) > EXPORT_PART_FILE_AGE:
+                    os.remove(file_path)
+                    removed_parts += 1
+
+        if entries:
+            melon.db.commit()
+
+        if entries or removed_parts:
+            melon.logger().info(f"Removed {len(entries)} cached exports and {removed_parts} unfinished export files")
+
+    except Exception as e:
+        melon.log_error(f"Error cleaning up export cache: {str(e)}")
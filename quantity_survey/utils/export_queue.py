@@ -0,0 +1,160 @@
+"""
+Export Queue Module
+Exports built by background workers, with realtime completion notices
+"""
+
+import melon
+from melon import _
+from melon.realtime import publish_realtime
+from typing import Dict, List
+
+from quantity_survey.utils.export_cache import get_cached_export, get_export_cache_key, get_or_build_export
+from quantity_survey.utils.export_utilities import (
+    build_boq_csv, build_final_account_excel, build_project_summary_excel
+)
+
+# Exporter -> (document type it exports, function writing the file and returning its File)
+EXPORTERS = {
+    'final_account_excel': ('Final Account', build_final_account_excel),
+    'boq_csv': ('BoQ', build_boq_csv),
+    'project_summary_excel': ('Project', build_project_summary_excel)
+}
+
+# Worker timeout for a single export, in seconds
+EXPORT_JOB_TIMEOUT = 30 * 60
+
+
+@melon.whitelist()
+def enqueue_export(exporter: str, name: str) -> Dict:
+    """
+    Build an export in the background.
+
+    When a file for the current state of the document is already cached
+    its URL is returned straight away. Otherwise one job per exporter and
+    document is queued; users asking for the same export while it is
+    pending join that job instead of queueing another. Every one of them
+    receives an 'export_ready' realtime event when the file is written.
+
+    A user who joins after the job has made its last check for waiting
+    users would otherwise be deduplicated against a job that is about to
+    end; the job marks that phase (see run_export_job) and such users get
+    a follow-up job of their own.
+    """
+    try:
+        if exporter not in EXPORTERS:
+            return {'success': False, 'message': f'Unsupported exporter: {exporter}'}
+
+        doctype = EXPORTERS[exporter][0]
+        if not melon.has_permission(doctype, 'read', name):
+            melon.throw(_('Access denied'), melon.PermissionError)
+
+        cached = get_cached_export(get_export_cache_key(exporter, doctype, name))
+        if cached:
+            return dict(cached, success=True, queued=False, exporter=exporter, name=name)
+
+        melon.cache().sadd(get_waiting_users_key(exporter, name), melon.session.user)
+
+        job_id = get_export_job_id(exporter, name)
+        if is_job_enqueued(job_id):
+            follow_up = bool(melon.cache().get_value(get_closing_key(exporter, name)))
+        else:
+            # A mark left by an earlier job must not turn the next joiners into follow-ups
+            melon.cache().delete_value(get_closing_key(exporter, name))
+            follow_up = False
+
+        melon.enqueue(
+            'quantity_survey.utils.export_queue.run_export_job',
+            queue='long',
+            timeout=EXPORT_JOB_TIMEOUT,
+            job_id=f'{job_id}::{melon.generate_hash(length=8)}' if follow_up else job_id,
+            deduplicate=not follow_up,
+            enqueue_after_commit=True,
+            exporter=exporter,
+            name=name,
+            follow_up=follow_up
+        )
+
+        return {
+            'success': True,
+            'queued': True,
+            'exporter': exporter,
+            'name': name,
+            'message': _('Export queued; you will be notified when it is ready')
+        }
+
+    except Exception as e:
+        melon.log_error(f"Export enqueue error: {str(e)}", "Export Utilities")
+        return {'success': False, 'message': str(e)}
+
+
+def run_export_job(exporter: str, name: str, follow_up: bool = False):
+    """
+    Worker entry point: write the export (or reuse the cached file) and notify everyone waiting.
+
+    The users waiting so far are taken before the build. Users who join
+    meanwhile are deduplicated against this job, so once it has notified
+    its own users it checks again and serves them from the cached file.
+    Before that last check it sets the closing mark, telling enqueue_export
+    that joining this job is no longer safe.
+    """
+    cache = melon.cache()
+    closing_key = get_closing_key(exporter, name)
+
+    if not follow_up:
+        cache.delete_value(closing_key)
+
+    while True:
+        users = pop_waiting_users(exporter, name)
+        message = build_export(exporter, name)
+
+        for user in users:
+            publish_realtime(event='export_ready', message=message, user=user)
+
+        cache.set_value(closing_key, 1, expires_in_sec=EXPORT_JOB_TIMEOUT)
+        if not cache.smembers(get_waiting_users_key(exporter, name)):
+            break
+
+
+def build_export(exporter: str, name: str) -> Dict:
+    """Realtime message for one export, building the file unless it is cached"""
+    doctype, build = EXPORTERS[exporter]
+
+    try:
+        export = get_or_build_export(exporter, doctype, name, lambda: build(name))
+        melon.db.commit()
+        message = dict(export, success=True)
+
+    except Exception as e:
+        melon.db.rollback()
+        melon.log_error(f"Export job {exporter} {name} failed: {str(e)}", "Export Utilities")
+        message = {'success': False, 'message': str(e)}
+
+    message.update(exporter=exporter, name=name)
+    return message
+
+
+def pop_waiting_users(exporter: str, name: str) -> List[str]:
+    """Users waiting for an export; removed one by one so late joiners are not lost"""
+    key = get_waiting_users_key(exporter, name)
+    users = melon.cache().smembers(key)
+    if users:
+        melon.cache().srem(key, *users)
+
+    return [user.decode() if isinstance(user, bytes) else user for user in users]
+
+
+def get_export_job_id(exporter: str, name: str) -> str:
+    return f'export::{exporter}::{name}'
+
+
+def get_waiting_users_key(exporter: str, name: str) -> str:
+    return f'quantity_survey:export_waiting:{exporter}:{name}'
+
+
+def get_closing_key(exporter: str, name: str) -> str:
+    return f'quantity_survey:export_closing:{exporter}:{name}'
+
+
+def is_job_enqueued(job_id: str) -> bool:
+    from melon.utils.background_jobs import is_job_enqueued as _is_job_enqueued
+    return _is_job_enqueued(job_id)
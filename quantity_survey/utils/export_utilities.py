@@ -8,102 +8,151 @@ from melon import _
 from melon.utils import now_datetime, cstr, flt
 import json
 import csv
-import io
-import xlsxwriter
+import os
 from typing import Dict, List, Any, Optional
-import base64
+
+from quantity_survey.utils.export_cache import get_or_build_export
+from quantity_survey.utils.financial_rollup import get_project_financial_summary
+from quantity_survey.utils.xlsx_export import (
+    StreamingXlsxWriter, create_export_file, get_export_folder, iter_query_chunks, write_row
+)
+
+# Child fields written from a sheet's Quantity, Rate and Quantity * Rate,
+# following each item controller's validate
+SHEET_IMPORT_FIELDS = {
+    'BoQ': {'quantity': ['quantity'], 'rate': ['rate'], 'amount': ['amount']},
+    'Variation Order': {'quantity': ['quantity'], 'rate': ['rate'], 'amount': ['amount']},
+    'Final Account': {'quantity': ['final_quantity'], 'rate': ['final_rate'], 'amount': ['final_amount']},
+    'Valuation': {
+        'quantity': ['current_quantity', 'cumulative_quantity'],
+        'rate': ['rate'],
+        'amount': ['current_amount', 'cumulative_amount']
+    },
+    'Cost Plan': {'quantity': ['estimated_quantity'], 'rate': ['unit_rate'], 'amount': ['estimated_cost']}
+}
 
 @melon.whitelist()
 def export_final_account_excel(final_account_name: str) -> Dict:
     """
     Export Final Account to Excel format
+    
+    The workbook is only rebuilt when the account or its items changed
+    since the last export (see quantity_survey.utils.export_cache).
     """
     try:
-        # Get Final Account document
-        doc = melon.get_doc('Final Account', final_account_name)
+        if not melon.has_permission('Final Account', 'read', final_account_name):
+            melon.throw(_('Access denied'), melon.PermissionError)
+        
+        export = get_or_build_export('final_account_excel', 'Final Account', final_account_name,
+            lambda: build_final_account_excel(final_account_name))
         
-        # Create Excel file in memory
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        return {
+            'success': True,
+            'file_url': export['file_url'],
+            'file_name': export['file_name'],
+            'cached': export['cached'],
+            'message': f'Final Account exported successfully'
+        }
         
+    except Exception as e:
+        melon.log_error(f"Excel export error: {str(e)}", "Export Utilities")
+        return {'success': False, 'message': str(e)}
+
+def build_final_account_excel(final_account_name: str):
+    """
+    Write the Final Account workbook and return its File
+    
+    Items are streamed from the database into a constant-memory workbook
+    written straight into the private files folder, so memory use stays
+    flat however many items the account has.
+    """
+    header = melon.db.get_value('Final Account', final_account_name,
+        ['name', 'project', 'status', 'total_certified_value', 'creation', 'modified'], as_dict=True)
+    totals = get_final_account_item_totals(final_account_name)
+    
+    writer = StreamingXlsxWriter(f"final_account_{header.name}_{melon.utils.today()}.xlsx",
+        'Final Account', header.name)
+    try:
         # Create worksheets
-        summary_sheet = workbook.add_worksheet('Summary')
-        items_sheet = workbook.add_worksheet('Items')
-        analysis_sheet = workbook.add_worksheet('Analysis')
+        summary_sheet = writer.add_worksheet('Summary')
+        items_sheet = writer.add_worksheet('Items')
+        analysis_sheet = writer.add_worksheet('Analysis')
         
         # Define formats
-        header_format = workbook.add_format({
+        header_format = writer.add_format({
             'bold': True,
             'bg_color': '#4472C4',
             'font_color': 'white',
             'border': 1
         })
         
-        currency_format = workbook.add_format({
+        currency_format = writer.add_format({
             'num_format': '#,##0.00',
             'border': 1
         })
         
-        percentage_format = workbook.add_format({
+        percentage_format = writer.add_format({
             'num_format': '0.00%',
             'border': 1
         })
         
-        border_format = workbook.add_format({'border': 1})
+        border_format = writer.add_format({'border': 1})
         
         # Write Summary Sheet
-        write_summary_sheet(summary_sheet, doc, header_format, currency_format, border_format)
+        write_summary_sheet(summary_sheet, header, totals, header_format, currency_format, border_format)
         
         # Write Items Sheet
-        write_items_sheet(items_sheet, doc, header_format, currency_format, border_format)
+        write_items_sheet(writer, items_sheet, header.name, totals, header_format, currency_format, border_format)
         
         # Write Analysis Sheet
-        write_analysis_sheet(analysis_sheet, doc, header_format, currency_format, percentage_format, border_format)
-        
-        workbook.close()
-        output.seek(0)
-        
-        # Save file
-        file_data = output.read()
-        file_name = f"final_account_{doc.name}_{melon.utils.today()}.xlsx"
-        
-        # Create File document
-        file_doc = melon.get_doc({
-            'doctype': 'File',
-            'file_name': file_name,
-            'content': base64.b64encode(file_data).decode(),
-            'decode': True,
-            'is_private': 1
-        })
-        file_doc.insert(ignore_permissions=True)
+        write_analysis_sheet(writer, analysis_sheet, header.name, totals, header_format, currency_format,
+            percentage_format, border_format)
         
-        return {
-            'success': True,
-            'file_url': file_doc.file_url,
-            'file_name': file_name,
-            'message': f'Final Account exported successfully'
-        }
+        return writer.save()
         
-    except Exception as e:
-        melon.log_error(f"Excel export error: {str(e)}", "Export Utilities")
-        return {'success': False, 'message': str(e)}
+    except Exception:
+        writer.discard()
+        raise
+
+def get_final_account_item_totals(final_account: str) -> Dict:
+    """Item count and totals, aggregated in the database"""
+    return melon.db.sql("""
+        SELECT COUNT(*) AS item_count,
+            COALESCE(SUM(final_quantity), 0) AS total_quantity,
+            COALESCE(AVG(final_rate), 0) AS average_rate,
+            COALESCE(SUM(final_amount), 0) AS total_amount
+        FROM `tabFinal Account Item`
+        WHERE parent = %s AND parenttype = 'Final Account' AND parentfield = 'final_account_items'
+    """, (final_account,), as_dict=True)[0]
 
-def write_summary_sheet(sheet, doc, header_format, currency_format, border_format):
+def get_final_account_items_query(final_account: str, order_by: str, min_amount: float = None):
+    """(query, values) selecting the export columns of a Final Account's items"""
+    amount_condition = 'AND final_amount > %(min_amount)s' if min_amount is not None else ''
+    
+    return f"""
+        SELECT item_code, description, uom,
+            final_quantity AS quantity, final_rate AS rate, final_amount AS amount
+        FROM `tabFinal Account Item`
+        WHERE parent = %(final_account)s AND parenttype = 'Final Account'
+            AND parentfield = 'final_account_items' {amount_condition}
+        ORDER BY {order_by}
+    """, {'final_account': final_account, 'min_amount': min_amount}
+
+def write_summary_sheet(sheet, header, totals, header_format, currency_format, border_format):
     """Write summary information to Excel sheet"""
     
     # Document header
-    sheet.write('A1', 'Final Account Summary', header_format)
     sheet.merge_range('A1:D1', 'Final Account Summary', header_format)
     
     # Basic information
     row = 3
     info_data = [
-        ['Final Account', doc.name],
-        ['Project', doc.project],
-        ['Status', doc.status],
-        ['Total Amount', doc.total_amount or 0],
-        ['Creation Date', doc.creation.strftime('%Y-%m-%d') if doc.creation else ''],
-        ['Modified Date', doc.modified.strftime('%Y-%m-%d') if doc.modified else '']
+        ['Final Account', header.name],
+        ['Project', header.project],
+        ['Status', header.status],
+        ['Total Amount', header.total_certified_value or 0],
+        ['Creation Date', header.creation.strftime('%Y-%m-%d') if header.creation else ''],
+        ['Modified Date', header.modified.strftime('%Y-%m-%d') if header.modified else '']
     ]
     
     for label, value in info_data:
@@ -115,29 +164,26 @@ def write_summary_sheet(sheet, doc, header_format, currency_format, border_forma
         row += 1
     
     # Items summary
-    if doc.final_account_items:
-        sheet.write(row + 1, 0, 'Items Summary', header_format)
+    if totals.item_count:
         sheet.merge_range(f'A{row + 2}:D{row + 2}', 'Items Summary', header_format)
         
         row += 3
         sheet.write(row, 0, 'Total Items', border_format)
-        sheet.write(row, 1, len(doc.final_account_items), border_format)
+        sheet.write(row, 1, totals.item_count, border_format)
         
         row += 1
-        total_quantity = sum(flt(item.quantity) for item in doc.final_account_items)
         sheet.write(row, 0, 'Total Quantity', border_format)
-        sheet.write(row, 1, total_quantity, border_format)
+        sheet.write(row, 1, flt(totals.total_quantity), border_format)
         
         row += 1
-        avg_rate = sum(flt(item.rate) for item in doc.final_account_items) / len(doc.final_account_items) if doc.final_account_items else 0
         sheet.write(row, 0, 'Average Rate', border_format)
-        sheet.write(row, 1, avg_rate, currency_format)
+        sheet.write(row, 1, flt(totals.average_rate), currency_format)
     
     # Auto-fit columns
     sheet.set_column('A:A', 15)
     sheet.set_column('B:B', 20)
 
-def write_items_sheet(sheet, doc, header_format, currency_format, border_format):
+def write_items_sheet(writer, sheet, final_account, totals, header_format, currency_format, border_format):
     """Write items details to Excel sheet"""
     
     # Headers
@@ -146,21 +192,17 @@ def write_items_sheet(sheet, doc, header_format, currency_format, border_format)
         sheet.write(0, col, header, header_format)
     
     # Items data
-    row = 1
-    for item in doc.final_account_items or []:
-        sheet.write(row, 0, item.item_code or '', border_format)
-        sheet.write(row, 1, item.description or '', border_format)
-        sheet.write(row, 2, item.uom or '', border_format)
-        sheet.write(row, 3, flt(item.quantity), border_format)
-        sheet.write(row, 4, flt(item.rate), currency_format)
-        sheet.write(row, 5, flt(item.amount), currency_format)
-        row += 1
+    formats = [border_format, border_format, border_format, border_format, currency_format, currency_format]
+    query, values = get_final_account_items_query(final_account, 'idx')
+    row = writer.write_query(sheet, 1, query, values, lambda sheet, row_number, item: write_row(sheet, row_number, [
+        item.item_code or '', item.description or '', item.uom or '',
+        flt(item.quantity), flt(item.rate), flt(item.amount)
+    ], formats))
     
     # Total row
-    if doc.final_account_items:
-        sheet.write(row, 0, 'TOTAL', header_format)
+    if totals.item_count:
         sheet.merge_range(f'A{row + 1}:E{row + 1}', 'TOTAL', header_format)
-        sheet.write(row, 5, doc.total_amount or 0, currency_format)
+        sheet.write(row, 5, flt(totals.total_amount), currency_format)
     
     # Auto-fit columns
     sheet.set_column('A:A', 12)
@@ -170,15 +212,15 @@ def write_items_sheet(sheet, doc, header_format, currency_format, border_format)
     sheet.set_column('E:E', 12)
     sheet.set_column('F:F', 15)
 
-def write_analysis_sheet(sheet, doc, header_format, currency_format, percentage_format, border_format):
+def write_analysis_sheet(writer, sheet, final_account, totals, header_format, currency_format, percentage_format,
+        border_format):
     """Write analysis data to Excel sheet"""
     
-    if not doc.final_account_items:
+    if not totals.item_count:
         sheet.write('A1', 'No items to analyze', border_format)
         return
     
     # Item analysis by category/type
-    sheet.write('A1', 'Item Analysis', header_format)
     sheet.merge_range('A1:E1', 'Item Analysis', header_format)
     
     # Headers
@@ -187,43 +229,30 @@ def write_analysis_sheet(sheet, doc, header_format, currency_format, percentage_
         sheet.write(2, col, header, header_format)
     
     # Calculate percentages
-    total_amount = doc.total_amount or 1  # Avoid division by zero
-    row = 3
+    total_amount = flt(totals.total_amount) or 1  # Avoid division by zero
+    formats = [border_format, border_format, currency_format, currency_format, percentage_format]
     
-    # Sort items by amount (descending)
-    sorted_items = sorted(doc.final_account_items, key=lambda x: flt(x.amount), reverse=True)
+    def write_analysis_row(sheet, row_number, item):
+        write_row(sheet, row_number, [
+            item.item_code or '', flt(item.quantity), flt(item.rate), flt(item.amount),
+            flt(item.amount) / total_amount
+        ], formats)
     
-    for item in sorted_items:
-        percentage = flt(item.amount) / total_amount if total_amount else 0
-        
-        sheet.write(row, 0, item.item_code or '', border_format)
-        sheet.write(row, 1, flt(item.quantity), border_format)
-        sheet.write(row, 2, flt(item.rate), currency_format)
-        sheet.write(row, 3, flt(item.amount), currency_format)
-        sheet.write(row, 4, percentage, percentage_format)
-        row += 1
+    # Items by amount (descending), sorted by the database
+    query, values = get_final_account_items_query(final_account, 'final_amount DESC')
+    row = writer.write_query(sheet, 3, query, values, write_analysis_row)
     
     # High-value items analysis
     row += 2
-    sheet.write(row, 0, 'High Value Items (>10% of total)', header_format)
     sheet.merge_range(f'A{row + 1}:E{row + 1}', 'High Value Items (>10% of total)', header_format)
     
     row += 2
-    high_value_items = [item for item in sorted_items if flt(item.amount) / total_amount > 0.1]
-    
-    if high_value_items:
+    query, values = get_final_account_items_query(final_account, 'final_amount DESC', min_amount=total_amount * 0.1)
+    if melon.db.sql(f'SELECT COUNT(*) FROM ({query}) high_value', values)[0][0]:
         for col, header in enumerate(analysis_headers):
             sheet.write(row, col, header, header_format)
-        row += 1
         
-        for item in high_value_items:
-            percentage = flt(item.amount) / total_amount
-            sheet.write(row, 0, item.item_code or '', border_format)
-            sheet.write(row, 1, flt(item.quantity), border_format)
-            sheet.write(row, 2, flt(item.rate), currency_format)
-            sheet.write(row, 3, flt(item.amount), currency_format)
-            sheet.write(row, 4, percentage, percentage_format)
-            row += 1
+        writer.write_query(sheet, row + 1, query, values, write_analysis_row)
     else:
         sheet.write(row, 0, 'No high-value items found', border_format)
     
@@ -238,52 +267,20 @@ def write_analysis_sheet(sheet, doc, header_format, currency_format, percentage_
 def export_boq_csv(boq_name: str) -> Dict:
     """
     Export BOQ to CSV format
+    
+    Rebuilt only when the BoQ or its items changed since the last export.
     """
     try:
-        # Get BOQ document
-        doc = melon.get_doc('BOQ', boq_name)
-        
-        # Create CSV content
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Item Code', 'Description', 'UOM', 'Quantity', 'Rate', 'Amount'])
-        
-        # Write items
-        for item in doc.boq_items or []:
-            writer.writerow([
-                item.item_code or '',
-                item.description or '',
-                item.uom or '',
-                flt(item.quantity),
-                flt(item.rate),
-                flt(item.amount)
-            ])
-        
-        # Write total
-        writer.writerow(['', '', '', '', 'TOTAL', doc.total_amount or 0])
-        
-        # Create file
-        csv_content = output.getvalue()
-        output.close()
-        
-        file_name = f"boq_{doc.name}_{melon.utils.today()}.csv"
-        
-        # Create File document
-        file_doc = melon.get_doc({
-            'doctype': 'File',
-            'file_name': file_name,
-            'content': base64.b64encode(csv_content.encode()).decode(),
-            'decode': True,
-            'is_private': 1
-        })
-        file_doc.insert(ignore_permissions=True)
+        if not melon.has_permission('BoQ', 'read', boq_name):
+            melon.throw(_('Access denied'), melon.PermissionError)
+        
+        export = get_or_build_export('boq_csv', 'BoQ', boq_name, lambda: build_boq_csv(boq_name))
         
         return {
             'success': True,
-            'file_url': file_doc.file_url,
-            'file_name': file_name,
+            'file_url': export['file_url'],
+            'file_name': export['file_name'],
+            'cached': export['cached'],
             'message': f'BOQ exported to CSV successfully'
         }
         
@@ -291,64 +288,135 @@ def export_boq_csv(boq_name: str) -> Dict:
         melon.log_error(f"CSV export error: {str(e)}", "Export Utilities")
         return {'success': False, 'message': str(e)}
 
+def build_boq_csv(boq_name: str):
+    """Stream the BoQ items into a CSV file in the private files folder and return its File"""
+    total_amount = melon.db.get_value('BoQ', boq_name, 'total_amount')
+    
+    file_name = f"boq_{boq_name}_{melon.utils.today()}.csv"
+    folder = get_export_folder()
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, f'{melon.generate_hash(length=10)}_{file_name}')
+    
+    try:
+        with open(file_path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            
+            # Write header
+            writer.writerow(['Item Code', 'Description', 'UOM', 'Quantity', 'Rate', 'Amount'])
+            
+            # Write items
+            for chunk in iter_query_chunks("""
+                SELECT item_code, description, uom, quantity, rate, amount
+                FROM `tabBoQ Item`
+                WHERE parent = %s AND parenttype = 'BoQ' AND parentfield = 'boq_items'
+                ORDER BY idx
+            """, (boq_name,)):
+                writer.writerows([
+                    item.item_code or '',
+                    item.description or '',
+                    item.uom or '',
+                    flt(item.quantity),
+                    flt(item.rate),
+                    flt(item.amount)
+                ] for item in chunk)
+            
+            # Write total
+            writer.writerow(['', '', '', '', 'TOTAL', total_amount or 0])
+        
+        return create_export_file(file_path, file_name, 'BoQ', boq_name)
+        
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
 @melon.whitelist()
 def import_items_from_excel(file_url: str, doctype: str, docname: str) -> Dict:
     """
-    Import items from Excel file
+    Import items from Excel or CSV file
+    
+    The sheet is read in chunks; each chunk is coerced column-wise and
+    written with one multi-row insert, so memory stays bounded however
+    many rows the sheet has.
     """
     try:
-        # Get file content
+        import numpy as np
+        from quantity_survey.utils.sheet_import import (
+            insert_child_rows, iter_sheet_chunks, numeric_column, text_column
+        )
+        
+        import_fields = SHEET_IMPORT_FIELDS.get(doctype)
+        if not import_fields:
+            return {'success': False, 'message': f'Items cannot be imported into {doctype}'}
+        
+        docstatus = melon.db.get_value(doctype, docname, 'docstatus')
+        if docstatus is None:
+            return {'success': False, 'message': f'{doctype} {docname} not found'}
+        if docstatus != 0:
+            return {'success': False, 'message': 'Items can only be imported into draft documents'}
+        if not melon.has_permission(doctype, 'write', docname):
+            return {'success': False, 'message': 'Access denied'}
+        
+        item_table_field = get_item_table_field(doctype)
+        table_df = melon.get_meta(doctype).get_field(item_table_field)
+        if not table_df:
+            return {'success': False, 'message': f'{doctype} has no items table'}
+        child_doctype = table_df.options
+        
+        # Read the file from disk rather than loading its content
         file_doc = melon.get_doc('File', {'file_url': file_url})
-        file_content = file_doc.get_content()
-        
-        # Read Excel file
-        import pandas as pd
-        df = pd.read_excel(io.BytesIO(file_content))
+        file_path = file_doc.get_full_path()
         
-        # Validate required columns
         required_columns = ['Item Code', 'Quantity', 'Rate']
-        missing_columns = [col for col in required_columns if col not in df.columns]
         
-        if missing_columns:
-            return {
-                'success': False,
-                'message': f'Missing required columns: {", ".join(missing_columns)}'
-            }
-        
-        # Get target document
-        doc = melon.get_doc(doctype, docname)
-        
-        # Clear existing items (optional)
-        # doc.set('items', [])
-        
-        # Add items from Excel
+        start_idx = get_last_child_idx(child_doctype, doctype, docname, item_table_field)
         items_added = 0
         errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Create item
-                item_data = {
-                    'item_code': str(row.get('Item Code', '')),
-                    'description': str(row.get('Description', '')),
-                    'uom': str(row.get('UOM', 'Each')),
-                    'quantity': flt(row.get('Quantity', 0)),
-                    'rate': flt(row.get('Rate', 0))
+        error_count = 0
+        
+        for chunk in iter_sheet_chunks(file_path):
+            missing_columns = [col for col in required_columns if col not in chunk.columns]
+            if missing_columns:
+                return {
+                    'success': False,
+                    'message': f'Missing required columns: {", ".join(missing_columns)}'
                 }
-                
-                # Calculate amount
-                item_data['amount'] = item_data['quantity'] * item_data['rate']
-                
-                # Add to document
-                item_table_field = get_item_table_field(doctype)
-                doc.append(item_table_field, item_data)
-                items_added += 1
-                
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        # Save document
-        doc.save()
+            
+            item_codes = text_column(chunk, 'Item Code')
+            quantities = numeric_column(chunk, 'Quantity')
+            rates = numeric_column(chunk, 'Rate')
+            amounts = quantities * rates
+            
+            # Item links are checked with one query per chunk
+            item_names = get_item_names(set(item_codes))
+            valid = np.fromiter((code in item_names for code in item_codes), dtype=bool, count=len(item_codes))
+            
+            for row_index, item_code in zip(chunk.index[~valid], item_codes[~valid]):
+                error_count += 1
+                if len(errors) < 10:
+                    errors.append(f"Row {row_index + 2}: Item {item_code} not found")
+            
+            if not valid.any():
+                continue
+            
+            valid_codes = item_codes[valid]
+            columns = {
+                'item_code': valid_codes,
+                'item_name': [item_names[item_code] for item_code in valid_codes],
+                'description': text_column(chunk, 'Description')[valid],
+                'uom': text_column(chunk, 'UOM', 'Each')[valid]
+            }
+            for source, values in (('quantity', quantities), ('rate', rates), ('amount', amounts)):
+                for field in import_fields[source]:
+                    columns[field] = values[valid]
+            
+            insert_child_rows(doctype, docname, item_table_field, child_doctype, columns,
+                start_idx + items_added)
+            
+            items_added += int(valid.sum())
+        
+        if items_added:
+            refresh_document_totals(doctype, docname)
         
         result = {
             'success': True,
@@ -357,25 +425,135 @@ def import_items_from_excel(file_url: str, doctype: str, docname: str) -> Dict:
         }
         
         if errors:
-            result['errors'] = errors[:10]  # Limit to first 10 errors
-            result['message'] += f'. {len(errors)} errors occurred.'
+            result['errors'] = errors  # First 10 errors only
+            result['message'] += f'. {error_count} errors occurred.'
         
         return result
         
     except Exception as e:
+        # Chunks already inserted must not be committed without their totals
+        melon.db.rollback()
         melon.log_error(f"Excel import error: {str(e)}", "Import Utilities")
         return {'success': False, 'message': str(e)}
 
+def get_last_child_idx(child_doctype: str, parenttype: str, parent: str, parentfield: str) -> int:
+    """Highest idx in a child table"""
+    result = melon.db.sql(f"""
+        SELECT MAX(idx) FROM `tab{child_doctype}`
+        WHERE parent = %s AND parenttype = %s AND parentfield = %s
+    """, (parent, parenttype, parentfield))
+    return int(result[0][0] or 0) if result else 0
+
+def get_item_names(item_codes) -> Dict[str, str]:
+    """item_code -> item_name for the codes that exist"""
+    item_codes = [code for code in item_codes if code]
+    if not item_codes:
+        return {}
+    
+    items = melon.get_all('Item',
+        filters={'name': ['in', item_codes]},
+        fields=['name', 'item_name']
+    )
+    return {item.name: item.item_name for item in items}
+
+def refresh_document_totals(doctype: str, docname: str):
+    """
+    Bring header totals in line after rows were inserted directly
+    
+    Totals are recomputed with aggregate queries, following each
+    controller's validate, so the document and its rows are never loaded.
+    """
+    if doctype == 'BoQ':
+        from quantity_survey.bim.boq_builder import refresh_boq_totals
+        refresh_boq_totals(docname)
+    elif doctype == 'Final Account':
+        from quantity_survey.utils.bulk_engine import update_final_account_totals
+        update_final_account_totals(docname)
+    elif doctype == 'Valuation':
+        refresh_valuation_totals(docname)
+    elif doctype == 'Cost Plan':
+        refresh_cost_plan_totals(docname)
+    elif doctype == 'Variation Order':
+        refresh_variation_order_totals(docname)
+    else:
+        melon.throw(_('Items cannot be imported into {0}').format(doctype))
+    
+    melon.db.set_value(doctype, docname, {'modified': now_datetime(), 'modified_by': melon.session.user},
+        update_modified=False)
+
+def refresh_valuation_totals(valuation: str):
+    """Valuation.calculate_totals and calculate_retention without loading the document"""
+    current_valuation, total_work_done = melon.db.sql("""
+        SELECT
+            COALESCE(SUM(CASE WHEN current_quantity != 0 AND rate != 0 THEN current_quantity * rate ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN cumulative_quantity != 0 AND rate != 0 THEN cumulative_quantity * rate ELSE 0 END), 0)
+        FROM `tabValuation Item`
+        WHERE parent = %s AND parenttype = 'Valuation' AND parentfield = 'valuation_items'
+    """, (valuation,))[0]
+    
+    current_valuation = flt(current_valuation)
+    retention_percentage = flt(melon.db.get_value('Valuation', valuation, 'retention_percentage'))
+    retention_amount = current_valuation * retention_percentage / 100 if retention_percentage else 0
+    
+    melon.db.set_value('Valuation', valuation, {
+        'total_work_done': flt(total_work_done),
+        'cumulative_total': flt(total_work_done),
+        'current_valuation': current_valuation,
+        'retention_amount': retention_amount,
+        'net_payable': current_valuation - retention_amount
+    }, update_modified=False)
+
+def refresh_cost_plan_totals(cost_plan: str):
+    """CostPlan.calculate_totals and calculate_budget_variance without loading the document"""
+    total_estimated_cost = flt(melon.db.sql("""
+        SELECT COALESCE(SUM(estimated_cost), 0)
+        FROM `tabCost Plan Item`
+        WHERE parent = %s AND parenttype = 'Cost Plan' AND parentfield = 'cost_plan_items'
+    """, (cost_plan,))[0][0])
+    
+    header = melon.db.get_value('Cost Plan', cost_plan,
+        ['contingency_percentage', 'contingency_amount', 'overhead_percentage', 'overhead_amount',
+         'approved_budget'], as_dict=True)
+    
+    totals = {'total_estimated_cost': total_estimated_cost}
+    
+    # Amounts without a percentage were entered by hand and are kept
+    if header.contingency_percentage:
+        totals['contingency_amount'] = total_estimated_cost * flt(header.contingency_percentage) / 100
+    if header.overhead_percentage:
+        totals['overhead_amount'] = total_estimated_cost * flt(header.overhead_percentage) / 100
+    
+    totals['total_project_cost'] = (
+        total_estimated_cost
+        + flt(totals.get('contingency_amount', header.contingency_amount))
+        + flt(totals.get('overhead_amount', header.overhead_amount))
+    )
+    if header.approved_budget and totals['total_project_cost']:
+        totals['budget_variance'] = totals['total_project_cost'] - flt(header.approved_budget)
+    
+    melon.db.set_value('Cost Plan', cost_plan, totals, update_modified=False)
+
+def refresh_variation_order_totals(variation_order: str):
+    """VariationOrder.calculate_total_amount without loading the document"""
+    total_variation_amount = flt(melon.db.sql("""
+        SELECT COALESCE(SUM(CASE WHEN quantity != 0 AND rate != 0 THEN amount ELSE 0 END), 0)
+        FROM `tabVariation Order Item`
+        WHERE parent = %s AND parenttype = 'Variation Order' AND parentfield = 'variation_items'
+    """, (variation_order,))[0][0])
+    
+    melon.db.set_value('Variation Order', variation_order, 'total_variation_amount', total_variation_amount,
+        update_modified=False)
+
 def get_item_table_field(doctype: str) -> str:
     """
     Get the child table fieldname for items based on doctype
     """
     field_mapping = {
-        'BOQ': 'boq_items',
+        'BoQ': 'boq_items',
         'Final Account': 'final_account_items',
         'Valuation': 'valuation_items',
         'Cost Plan': 'cost_plan_items',
-        'Variation Order': 'variation_order_items'
+        'Variation Order': 'variation_items'
     }
     
     return field_mapping.get(doctype, 'items')
@@ -384,15 +562,38 @@ def get_item_table_field(doctype: str) -> str:
 def export_project_summary_excel(project: str) -> Dict:
     """
     Export comprehensive project summary to Excel
+    
+    Rebuilt only when the project or one of its BoQs, valuations,
+    variations or payment certificates changed since the last export.
     """
     try:
-        # Get project document
-        project_doc = melon.get_doc('Project', project)
+        if not melon.has_permission('Project', 'read', project):
+            melon.throw(_('Access denied'), melon.PermissionError)
         
-        # Create Excel file
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        export = get_or_build_export('project_summary_excel', 'Project', project,
+            lambda: build_project_summary_excel(project))
         
+        return {
+            'success': True,
+            'file_url': export['file_url'],
+            'file_name': export['file_name'],
+            'cached': export['cached'],
+            'message': f'Project summary exported successfully'
+        }
+        
+    except Exception as e:
+        melon.log_error(f"Project export error: {str(e)}", "Export Utilities")
+        return {'success': False, 'message': str(e)}
+
+def build_project_summary_excel(project: str):
+    """Write the project summary workbook into the private files folder and return its File"""
+    # Get project document
+    project_doc = melon.get_doc('Project', project)
+    
+    writer = StreamingXlsxWriter(f"project_summary_{project_doc.name}_{melon.utils.today()}.xlsx",
+        'Project', project_doc.name)
+    workbook = writer.workbook
+    try:
         # Define formats
         title_format = workbook.add_format({
             'bold': True,
@@ -439,32 +640,11 @@ def export_project_summary_excel(project: str) -> Dict:
         # Write payments summary
         write_payments_summary(payments_sheet, project, header_format, currency_format, border_format)
         
-        workbook.close()
-        output.seek(0)
-        
-        # Save file
-        file_data = output.read()
-        file_name = f"project_summary_{project_doc.name}_{melon.utils.today()}.xlsx"
+        return writer.save()
         
-        file_doc = melon.get_doc({
-            'doctype': 'File',
-            'file_name': file_name,
-            'content': base64.b64encode(file_data).decode(),
-            'decode': True,
-            'is_private': 1
-        })
-        file_doc.insert(ignore_permissions=True)
-        
-        return {
-            'success': True,
-            'file_url': file_doc.file_url,
-            'file_name': file_name,
-            'message': f'Project summary exported successfully'
-        }
-        
-    except Exception as e:
-        melon.log_error(f"Project export error: {str(e)}", "Export Utilities")
-        return {'success': False, 'message': str(e)}
+    except Exception:
+        writer.discard()
+        raise
 
 def write_project_overview(sheet, project_doc, title_format, header_format, currency_format, border_format):
     """Write project overview to Excel sheet"""
@@ -520,7 +700,7 @@ def write_boq_summary(sheet, project, header_format, currency_format, border_for
     """Write BOQ summary to Excel sheet"""
     
     # Get BOQ data
-    boqs = melon.get_all('BOQ', 
+    boqs = melon.get_all('BoQ', 
         filters={'project': project},
         fields=['name', 'total_amount', 'status', 'creation']
     )
@@ -559,7 +739,7 @@ def write_valuations_summary(sheet, project, header_format, currency_format, bor
     # Get Valuation data
     valuations = melon.get_all('Valuation', 
         filters={'project': project},
-        fields=['name', 'total_amount', 'status', 'valuation_date']
+        fields=['name', 'current_valuation', 'status', 'valuation_date']
     )
     
     # Headers
@@ -573,10 +753,10 @@ def write_valuations_summary(sheet, project, header_format, currency_format, bor
     
     for val in valuations:
         sheet.write(row, 0, val.name, border_format)
-        sheet.write(row, 1, flt(val.total_amount), currency_format)
+        sheet.write(row, 1, flt(val.current_valuation), currency_format)
         sheet.write(row, 2, val.status, border_format)
         sheet.write(row, 3, val.valuation_date.strftime('%Y-%m-%d') if val.valuation_date else '', border_format)
-        total_valuations += flt(val.total_amount)
+        total_valuations += flt(val.current_valuation)
         row += 1
     
     # Total row
@@ -590,7 +770,7 @@ def write_variations_summary(sheet, project, header_format, currency_format, bor
     # Get Variation Order data
     variations = melon.get_all('Variation Order', 
         filters={'project': project},
-        fields=['name', 'total_amount', 'status', 'date']
+        fields=['name', 'total_variation_amount', 'status', 'variation_date']
     )
     
     # Headers
@@ -604,10 +784,10 @@ def write_variations_summary(sheet, project, header_format, currency_format, bor
     
     for var in variations:
         sheet.write(row, 0, var.name, border_format)
-        sheet.write(row, 1, flt(var.total_amount), currency_format)
+        sheet.write(row, 1, flt(var.total_variation_amount), currency_format)
         sheet.write(row, 2, var.status, border_format)
-        sheet.write(row, 3, var.date.strftime('%Y-%m-%d') if var.date else '', border_format)
-        total_variations += flt(var.total_amount)
+        sheet.write(row, 3, var.variation_date.strftime('%Y-%m-%d') if var.variation_date else '', border_format)
+        total_variations += flt(var.total_variation_amount)
         row += 1
     
     # Total row
@@ -621,7 +801,7 @@ def write_payments_summary(sheet, project, header_format, currency_format, borde
     # Get Payment Certificate data
     payments = melon.get_all('Payment Certificate', 
         filters={'project': project},
-        fields=['name', 'certificate_amount', 'status', 'certificate_date']
+        fields=['name', 'net_payable', 'status', 'certificate_date']
     )
     
     # Headers
@@ -635,10 +815,10 @@ def write_payments_summary(sheet, project, header_format, currency_format, borde
     
     for payment in payments:
         sheet.write(row, 0, payment.name, border_format)
-        sheet.write(row, 1, flt(payment.certificate_amount), currency_format)
+        sheet.write(row, 1, flt(payment.net_payable), currency_format)
         sheet.write(row, 2, payment.status, border_format)
         sheet.write(row, 3, payment.certificate_date.strftime('%Y-%m-%d') if payment.certificate_date else '', border_format)
-        total_payments += flt(payment.certificate_amount)
+        total_payments += flt(payment.net_payable)
         row += 1
     
     # Total row
@@ -646,68 +826,6 @@ def write_payments_summary(sheet, project, header_format, currency_format, borde
         sheet.write(row, 0, 'TOTAL', header_format)
         sheet.write(row, 1, total_payments, currency_format)
 
-def get_project_financial_summary(project: str) -> Dict:
-    """
-    Get comprehensive financial summary for a project
-    """
-    try:
-        summary = {
-            'total_boq_value': 0,
-            'total_valuations': 0,
-            'total_variations': 0,
-            'total_payments': 0,
-            'outstanding_amount': 0
-        }
-        
-        # BOQ totals
-        boq_total = melon.db.sql("""
-            SELECT COALESCE(SUM(total_amount), 0) as total
-            FROM `tabBOQ` 
-            WHERE project = %s AND docstatus = 1
-        """, [project])
-        
-        if boq_total:
-            summary['total_boq_value'] = flt(boq_total[0][0])
-        
-        # Valuation totals
-        val_total = melon.db.sql("""
-            SELECT COALESCE(SUM(total_amount), 0) as total
-            FROM `tabValuation` 
-            WHERE project = %s AND docstatus = 1
-        """, [project])
-        
-        if val_total:
-            summary['total_valuations'] = flt(val_total[0][0])
-        
-        # Variation totals
-        var_total = melon.db.sql("""
-            SELECT COALESCE(SUM(total_amount), 0) as total
-            FROM `tabVariation Order` 
-            WHERE project = %s AND docstatus = 1
-        """, [project])
-        
-        if var_total:
-            summary['total_variations'] = flt(var_total[0][0])
-        
-        # Payment totals
-        pay_total = melon.db.sql("""
-            SELECT COALESCE(SUM(certificate_amount), 0) as total
-            FROM `tabPayment Certificate` 
-            WHERE project = %s AND docstatus = 1
-        """, [project])
-        
-        if pay_total:
-            summary['total_payments'] = flt(pay_total[0][0])
-        
-        # Calculate outstanding
-        summary['outstanding_amount'] = summary['total_valuations'] - summary['total_payments']
-        
-        return summary
-        
-    except Exception as e:
-        melon.log_error(f"Financial summary error: {str(e)}", "Export Utilities")
-        return {'error': str(e)}
-
 @melon.whitelist()
 def get_export_templates() -> Dict:
     """
@@ -0,0 +1,139 @@
+"""
+Financial Rollup Module
+Project financial totals from one aggregate query, cached per project
+"""
+
+import melon
+from melon.utils import flt
+from typing import Dict, List
+
+# Cache key prefix of one project's summary
+ROLLUP_CACHE_PREFIX = 'quantity_survey:project_financial_summary'
+
+# Cached summaries also expire after this many seconds, should an update bypass the doc events
+ROLLUP_CACHE_TTL = 6 * 60 * 60
+
+
+def get_project_financial_summary(project: str) -> Dict:
+    """Financial summary of one project (see get_project_financial_summaries)"""
+    return get_project_financial_summaries([project])[project]
+
+
+def get_project_financial_summaries(projects: List[str]) -> Dict[str, Dict]:
+    """
+    Financial summary of each project, keyed by project.
+
+    Cached summaries are returned as they are; all the others are computed
+    together by compute_project_financial_summaries in a single query.
+    Amounts cover submitted documents only, counts every document that
+    is not cancelled.
+    """
+    projects = list(dict.fromkeys(project for project in projects if project))
+    cache = melon.cache()
+
+    summaries = {}
+    for project in projects:
+        cached = cache.get_value(get_rollup_cache_key(project))
+        if cached is not None:
+            summaries[project] = cached
+
+    missing = [project for project in projects if project not in summaries]
+    if missing:
+        computed = compute_project_financial_summaries(missing)
+        for project, summary in computed.items():
+            cache.set_value(get_rollup_cache_key(project), summary, expires_in_sec=ROLLUP_CACHE_TTL)
+        summaries.update(computed)
+
+    return summaries
+
+
+def compute_project_financial_summaries(projects: List[str]) -> Dict[str, Dict]:
+    """Totals of many projects in one UNION ALL / GROUP BY round trip"""
+    rows = melon.db.sql("""
+        SELECT project, 'boq' AS source, COUNT(*) AS documents,
+            SUM(CASE WHEN docstatus = 1 THEN total_amount ELSE 0 END) AS amount,
+            0 AS net_amount
+        FROM `tabBoQ`
+        WHERE project IN %(projects)s AND docstatus < 2
+        GROUP BY project
+        UNION ALL
+        SELECT project, 'valuation', COUNT(*),
+            SUM(CASE WHEN docstatus = 1 THEN current_valuation ELSE 0 END),
+            SUM(CASE WHEN docstatus = 1 THEN net_payable ELSE 0 END)
+        FROM `tabValuation`
+        WHERE project IN %(projects)s AND docstatus < 2
+        GROUP BY project
+        UNION ALL
+        SELECT project, 'variation', COUNT(*),
+            SUM(CASE WHEN docstatus = 1 THEN total_variation_amount ELSE 0 END),
+            0
+        FROM `tabVariation Order`
+        WHERE project IN %(projects)s AND docstatus < 2
+        GROUP BY project
+        UNION ALL
+        SELECT project, 'payment', COUNT(*),
+            SUM(CASE WHEN docstatus = 1 THEN gross_amount ELSE 0 END),
+            SUM(CASE WHEN docstatus = 1 THEN net_payable ELSE 0 END)
+        FROM `tabPayment Certificate`
+        WHERE project IN %(projects)s AND docstatus < 2
+        GROUP BY project
+    """, {'projects': tuple(projects)}, as_dict=True)
+
+    by_project = {project: {} for project in projects}
+    for row in rows:
+        by_project[row.project][row.source] = row
+
+    return {project: build_summary(sources) for project, sources in by_project.items()}
+
+
+def build_summary(sources: Dict) -> Dict:
+    empty = {'documents': 0, 'amount': 0, 'net_amount': 0}
+    boq, valuation, variation, payment = (
+        sources.get(source) or empty for source in ('boq', 'valuation', 'variation', 'payment')
+    )
+
+    summary = {
+        'boq_count': int(boq['documents']),
+        'valuation_count': int(valuation['documents']),
+        'variation_count': int(variation['documents']),
+        'payment_count': int(payment['documents']),
+        'total_boq_value': flt(boq['amount']),
+        # Each valuation holds the work valued in its period, so their sum is the work done to date
+        'total_valuations': flt(valuation['amount']),
+        'total_valuations_net': flt(valuation['net_amount']),
+        'total_variations': flt(variation['amount']),
+        'total_certified': flt(payment['amount']),
+        'total_payments': flt(payment['net_amount'])
+    }
+
+    summary['outstanding_amount'] = summary['total_valuations'] - summary['total_payments']
+    summary['completion_percentage'] = (
+        summary['total_valuations'] / summary['total_boq_value'] * 100 if summary['total_boq_value'] else 0.0
+    )
+
+    return summary
+
+
+def clear_project_financial_summary(doc, method=None):
+    """Drop the cached summary of the document's project, and of its previous project if it moved (doc event)"""
+    projects = {doc.get('project')}
+
+    previous = doc.get_doc_before_save() if hasattr(doc, 'get_doc_before_save') else None
+    if previous:
+        projects.add(previous.get('project'))
+
+    keys = [get_rollup_cache_key(project) for project in filter(None, projects)]
+    delete_cached_summaries(keys)
+
+    # Again once committed, in case another request cached the old totals in between
+    melon.db.after_commit.add(lambda: delete_cached_summaries(keys))
+
+
+def delete_cached_summaries(keys: List[str]):
+    cache = melon.cache()
+    for key in keys:
+        cache.delete_value(key)
+
+
+def get_rollup_cache_key(project: str) -> str:
+    return f'{ROLLUP_CACHE_PREFIX}:{project}'
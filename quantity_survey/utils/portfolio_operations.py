@@ -0,0 +1,241 @@
+"""
+Portfolio Operations Module
+Bulk operations across many Final Accounts and BoQs, run as sharded background jobs
+"""
+
+import melon
+from melon import _
+from melon.utils import cint, now_datetime
+from melon.realtime import publish_realtime
+from typing import Dict, List
+import json
+
+from quantity_survey.utils.bulk_operations import (
+    BOQ_BULK_OPERATIONS, BULK_OPERATIONS, apply_boq_bulk_operation, apply_bulk_operation
+)
+
+# Operations each target document type supports, and how one document is edited
+PORTFOLIO_OPERATIONS = {
+    'Final Account': (BULK_OPERATIONS, apply_bulk_operation),
+    'BoQ': (BOQ_BULK_OPERATIONS, apply_boq_bulk_operation)
+}
+
+# Documents edited per transaction; each batch is committed and reported once
+PORTFOLIO_BATCH_SIZE = 20
+
+# Most worker jobs one operation is split into
+PORTFOLIO_MAX_SHARDS = 8
+
+# Worker timeout for a single shard, in seconds
+PORTFOLIO_SHARD_TIMEOUT = 2 * 60 * 60
+
+# Longest error line kept per document
+PORTFOLIO_ERROR_LENGTH = 500
+
+
+@melon.whitelist()
+def enqueue_portfolio_bulk_operation(target_doctype: str, operation: str, document_filters=None,
+        item_filters: Dict = None, parameters: Dict = None) -> Dict:
+    """
+    Queue a bulk operation on every draft target_doctype document matching document_filters.
+
+    Matching documents are split into up to PORTFOLIO_MAX_SHARDS jobs on the
+    long queue. item_filters and parameters are those of
+    execute_bulk_operation and apply to each document. Aggregated counts are
+    pushed to the requesting user as 'portfolio_bulk_operation_progress'
+    realtime events after every committed batch.
+    """
+    try:
+        if isinstance(document_filters, str):
+            document_filters = json.loads(document_filters)
+        if isinstance(item_filters, str):
+            item_filters = json.loads(item_filters)
+        if isinstance(parameters, str):
+            parameters = json.loads(parameters)
+
+        if target_doctype not in PORTFOLIO_OPERATIONS:
+            return {'success': False, 'message': f'Unsupported document type: {target_doctype}'}
+
+        if operation not in PORTFOLIO_OPERATIONS[target_doctype][0]:
+            return {'success': False, 'message': f'Unsupported operation: {operation}'}
+
+        documents = get_target_documents(target_doctype, document_filters)
+        if not documents:
+            return {'success': False, 'message': 'No draft documents match the filter'}
+
+        shards = split_into_shards(documents)
+
+        job = melon.get_doc({
+            'doctype': 'Portfolio Bulk Operation',
+            'target_doctype': target_doctype,
+            'operation': operation,
+            'document_filters': json.dumps(document_filters or {}, indent=1),
+            'item_filters': json.dumps(item_filters or {}, indent=1),
+            'parameters': json.dumps(parameters or {}, indent=1),
+            'total_documents': len(documents),
+            'shards': len(shards),
+            'status': 'Queued'
+        })
+        job.insert()
+
+        for index, shard in enumerate(shards):
+            melon.enqueue(
+                'quantity_survey.utils.portfolio_operations.run_portfolio_shard',
+                queue='long',
+                timeout=PORTFOLIO_SHARD_TIMEOUT,
+                job_id=f'portfolio_bulk_operation::{job.name}::{index}',
+                deduplicate=True,
+                enqueue_after_commit=True,
+                job=job.name,
+                documents=shard
+            )
+
+        return {
+            'success': True,
+            'job': job.name,
+            'total_documents': len(documents),
+            'shards': len(shards),
+            'message': _('Bulk operation queued for {0} documents').format(len(documents))
+        }
+
+    except Exception as e:
+        melon.log_error(f"Portfolio bulk operation enqueue error: {str(e)}", "Bulk Operations")
+        return {'success': False, 'message': f'Operation failed: {str(e)}'}
+
+
+@melon.whitelist()
+def get_portfolio_bulk_operation_status(job: str) -> Dict:
+    """Aggregated counts of a portfolio bulk operation"""
+    if not melon.has_permission('Portfolio Bulk Operation', 'read', job):
+        melon.throw(_('Access denied'), melon.PermissionError)
+
+    return get_job_counts(job)
+
+
+def get_target_documents(target_doctype: str, document_filters) -> List[str]:
+    """Draft documents the user can read that match document_filters (a dict or filter list)"""
+    if isinstance(document_filters, (list, tuple)):
+        filters = list(document_filters) + [[target_doctype, 'docstatus', '=', 0]]
+    else:
+        filters = dict(document_filters or {}, docstatus=0)
+
+    return melon.get_list(target_doctype, filters=filters, pluck='name', order_by='name asc',
+        limit_page_length=0)
+
+
+def split_into_shards(documents: List[str]) -> List[List[str]]:
+    """Contiguous slices of at least one batch each, at most PORTFOLIO_MAX_SHARDS of them"""
+    shard_count = min(PORTFOLIO_MAX_SHARDS, -(-len(documents) // PORTFOLIO_BATCH_SIZE))
+    shard_size = -(-len(documents) // shard_count)
+    return [documents[start:start + shard_size] for start in range(0, len(documents), shard_size)]
+
+
+def run_portfolio_shard(job: str, documents: List[str]):
+    """
+    Worker entry point for one shard.
+
+    Documents are edited in batches of PORTFOLIO_BATCH_SIZE, each batch in
+    one transaction. A document that fails is rolled back to its savepoint
+    and counted as failed without undoing the rest of its batch. Counts
+    are added to the job row with relative updates, so shards running in
+    parallel never overwrite each other's totals.
+    """
+    settings = melon.db.get_value('Portfolio Bulk Operation', job,
+        ['target_doctype', 'operation', 'item_filters', 'parameters'], as_dict=True)
+    if not settings:
+        return
+
+    apply_operation = PORTFOLIO_OPERATIONS[settings.target_doctype][1]
+    item_filters = json.loads(settings.item_filters or '{}')
+    parameters = json.loads(settings.parameters or '{}')
+
+    melon.db.sql("""
+        UPDATE `tabPortfolio Bulk Operation`
+        SET status = 'Running', started_at = %s
+        WHERE name = %s AND status = 'Queued'
+    """, (now_datetime(), job))
+    melon.db.commit()
+
+    for start in range(0, len(documents), PORTFOLIO_BATCH_SIZE):
+        batch = documents[start:start + PORTFOLIO_BATCH_SIZE]
+        succeeded = 0
+        items_updated = 0
+        errors = []
+
+        for document in batch:
+            melon.db.savepoint('portfolio_document')
+            try:
+                result = apply_operation(document, settings.operation, item_filters, parameters)
+            except Exception as e:
+                melon.db.rollback(save_point='portfolio_document')
+                errors.append(f'{document}: {str(e)}')
+                continue
+
+            # A document with no matching items has nothing to do and still succeeds
+            succeeded += 1
+            items_updated += cint(result.get('updated_count'))
+            errors.extend(f'{document}: {error}' for error in result.get('errors', []))
+
+        record_batch(job, len(batch), succeeded, items_updated, errors)
+        melon.db.commit()
+
+        publish_portfolio_progress(job)
+
+
+def record_batch(job: str, processed: int, succeeded: int, items_updated: int, errors: List[str]):
+    """Add one batch to the job counts; the batch that reaches the total closes the job"""
+    error_log = ''.join(f'{error[:PORTFOLIO_ERROR_LENGTH]}\n' for error in errors)
+
+    melon.db.sql("""
+        UPDATE `tabPortfolio Bulk Operation`
+        SET processed_documents = processed_documents + %(processed)s,
+            succeeded_documents = succeeded_documents + %(succeeded)s,
+            failed_documents = failed_documents + %(failed)s,
+            items_updated = items_updated + %(items_updated)s,
+            error_log = CONCAT(COALESCE(error_log, ''), %(error_log)s),
+            progress = (processed_documents + %(processed)s) * 100.0 / total_documents,
+            modified = %(modified)s
+        WHERE name = %(job)s
+    """, {
+        'job': job,
+        'processed': processed,
+        'succeeded': succeeded,
+        'failed': processed - succeeded,
+        'items_updated': items_updated,
+        'error_log': error_log,
+        'modified': now_datetime()
+    })
+
+    melon.db.sql("""
+        UPDATE `tabPortfolio Bulk Operation`
+        SET status = CASE WHEN failed_documents > 0 THEN 'Completed with Errors' ELSE 'Completed' END,
+            completed_at = %(completed_at)s
+        WHERE name = %(job)s AND status = 'Running' AND processed_documents >= total_documents
+    """, {'job': job, 'completed_at': now_datetime()})
+
+
+def get_job_counts(job: str) -> Dict:
+    return melon.db.get_value('Portfolio Bulk Operation', job,
+        ['name', 'status', 'progress', 'total_documents', 'processed_documents',
+         'succeeded_documents', 'failed_documents', 'items_updated', 'owner'],
+        as_dict=True
+    )
+
+
+def publish_portfolio_progress(job: str):
+    """Push the counts of all shards so far to the user who queued the operation"""
+    counts = get_job_counts(job)
+    publish_realtime(
+        event='portfolio_bulk_operation_progress',
+        message={
+            'job': counts.name,
+            'status': counts.status,
+            'progress': counts.progress,
+            'total_documents': counts.total_documents,
+            'processed_documents': counts.processed_documents,
+            'succeeded_documents': counts.succeeded_documents,
+            'failed_documents': counts.failed_documents,
+            'items_updated': counts.items_updated
+        },
+        user=counts.owner
+    )
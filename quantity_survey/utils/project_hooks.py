@@ -77,34 +77,19 @@ def get_project_summary(project):
     }
     
     try:
-        # Count documents
-        summary["boqs"] = melon.db.count("Bill of Quantities", {"project": project})
-        summary["valuations"] = melon.db.count("Valuation", {"project": project})
-        summary["payment_certificates"] = melon.db.count("Payment Certificate", {"project": project})
-        summary["variation_orders"] = melon.db.count("Variation Order", {"project": project})
+        from quantity_survey.utils.financial_rollup import get_project_financial_summary
         
-        # Sum amounts
-        boq_total = melon.db.sql("""
-            SELECT IFNULL(SUM(total_amount), 0)
-            FROM `tabBill of Quantities`
-            WHERE project = %s AND docstatus = 1
-        """, project)[0][0]
+        rollup = get_project_financial_summary(project)
         
-        valuation_total = melon.db.sql("""
-            SELECT IFNULL(SUM(total_work_done), 0)
-            FROM `tabValuation`
-            WHERE project = %s AND docstatus = 1
-        """, project)[0][0]
+        summary["boqs"] = rollup["boq_count"]
+        summary["valuations"] = rollup["valuation_count"]
+        summary["payment_certificates"] = rollup["payment_count"]
+        summary["variation_orders"] = rollup["variation_count"]
         
-        certificate_total = melon.db.sql("""
-            SELECT IFNULL(SUM(certified_amount), 0)
-            FROM `tabPayment Certificate`
-            WHERE project = %s AND docstatus = 1
-        """, project)[0][0]
-        
-        summary["total_contract_value"] = boq_total
-        summary["total_work_done"] = valuation_total
-        summary["total_certified"] = certificate_total
+        summary["total_contract_value"] = rollup["total_boq_value"]
+        summary["total_work_done"] = rollup["total_valuations"]
+        summary["total_certified"] = rollup["total_certified"]
+        summary["total_paid"] = rollup["total_payments"]
         
     except Exception as e:
         melon.log_error(f"Error getting project summary: {str(e)}")
@@ -0,0 +1,140 @@
+"""
+Sheet Import Utilities
+Chunked reading of Excel/CSV sheets and bulk child-row writes
+"""
+
+import melon
+from melon import _
+from melon.utils import now
+from typing import Dict, Iterator, List
+import os
+
+# Rows held in memory per chunk
+SHEET_CHUNK_ROWS = 50000
+
+# Standard child-row columns written by insert_child_rows
+CHILD_ROW_STANDARD_FIELDS = [
+    'name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus',
+    'parent', 'parenttype', 'parentfield', 'idx'
+]
+
+
+def iter_sheet_chunks(file_path: str, chunk_rows: int = SHEET_CHUNK_ROWS) -> Iterator:
+    """
+    Yield a DataFrame per chunk of rows from an .xlsx, .xls or .csv file.
+
+    CSV is read with pandas' chunked reader and xlsx with openpyxl in
+    read-only mode, so only one chunk is ever held in memory. Legacy .xls
+    sheets are capped at 65536 rows and are read whole, then split. Chunk
+    indexes continue from the previous chunk, matching a whole-sheet read.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        yield from iter_xlsx_chunks(file_path, chunk_rows)
+    elif extension == '.xls':
+        import pandas as pd
+        sheet = pd.read_excel(file_path)
+        for start in range(0, len(sheet), chunk_rows):
+            yield sheet.iloc[start:start + chunk_rows]
+    elif extension == '.csv':
+        import pandas as pd
+        yield from pd.read_csv(file_path, chunksize=chunk_rows)
+    else:
+        melon.throw(_('Unsupported sheet format {0}, use .xlsx, .xls or .csv').format(extension or file_path))
+
+
+def iter_xlsx_chunks(file_path: str, chunk_rows: int = SHEET_CHUNK_ROWS) -> Iterator:
+    """Stream the first worksheet of an xlsx file in chunks of rows"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f'Unnamed: {i}' for i, col in enumerate(header)]
+        width = len(columns)
+
+        start = 0
+        buffer = []
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            buffer.append(row[:width] + (None,) * (width - len(row)))
+            if len(buffer) >= chunk_rows:
+                yield make_chunk(buffer, columns, start)
+                start += len(buffer)
+                buffer = []
+
+        if buffer:
+            yield make_chunk(buffer, columns, start)
+    finally:
+        workbook.close()
+
+
+def make_chunk(rows: List[tuple], columns: List[str], start: int):
+    import pandas as pd
+
+    return pd.DataFrame.from_records(rows, columns=columns,
+        index=pd.RangeIndex(start, start + len(rows)))
+
+
+def numeric_column(chunk, column: str, default: float = 0.0):
+    """Column coerced to float, with missing and non-numeric cells as default"""
+    import numpy as np
+    import pandas as pd
+
+    if column not in chunk.columns:
+        return np.full(len(chunk), default, dtype=float)
+
+    return pd.to_numeric(chunk[column], errors='coerce').fillna(default).to_numpy(dtype=float)
+
+
+def text_column(chunk, column: str, default: str = ''):
+    """Column as strings, with missing cells as default"""
+    import numpy as np
+
+    if column not in chunk.columns:
+        return np.full(len(chunk), default, dtype=object)
+
+    values = chunk[column]
+    return values.where(values.notna(), default).astype(str).to_numpy(dtype=object)
+
+
+def insert_child_rows(parent_doctype: str, parent: str, parentfield: str, child_doctype: str,
+        columns: Dict[str, list], start_idx: int = 0):
+    """
+    Write child rows with a single multi-row INSERT.
+
+    columns maps fieldname -> a column of values (all the same length).
+    Fields that the child doctype does not have are ignored, as
+    Document.append would ignore them.
+    """
+    meta = melon.get_meta(child_doctype)
+    fields = [field for field in columns if meta.has_field(field)]
+    if not fields:
+        return
+
+    row_count = len(columns[fields[0]])
+    if not row_count:
+        return
+
+    timestamp = now()
+    user = melon.session.user
+    field_values = [columns[field] for field in fields]
+
+    values = [
+        (melon.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+         parent, parent_doctype, parentfield, start_idx + offset + 1)
+        + tuple(to_db_value(column[offset]) for column in field_values)
+        for offset in range(row_count)
+    ]
+
+    melon.db.bulk_insert(child_doctype, fields=CHILD_ROW_STANDARD_FIELDS + fields, values=values)
+
+
+def to_db_value(value):
+    """Unwrap NumPy scalars for the database driver"""
+    return value.item() if hasattr(value, 'item') else value
@@ -0,0 +1,55 @@
+"""
+Tests for the columnar Final Account bulk engine
+"""
+
+import unittest
+
+import numpy as np
+
+from quantity_survey.utils.bulk_engine import ITEM_NUMERIC_COLUMNS, FinalAccountItemColumns
+
+
+def make_columns(rows):
+    """Columns for (uom, original_quantity, original_rate, final_quantity, final_rate) rows"""
+    numeric = {field: np.zeros(len(rows)) for field in ITEM_NUMERIC_COLUMNS}
+    for field, position in (('original_quantity', 1), ('original_rate', 2), ('final_quantity', 3), ('final_rate', 4)):
+        numeric[field] = np.array([row[position] for row in rows], dtype=float)
+    numeric['original_amount'] = numeric['original_quantity'] * numeric['original_rate']
+
+    columns = FinalAccountItemColumns(
+        '_Test Final Account',
+        [f'row-{i}' for i in range(len(rows))],
+        {
+            'item_code': np.array([f'ITEM-{i}' for i in range(len(rows))], dtype=object),
+            'item_name': np.array([f'Item {i}' for i in range(len(rows))], dtype=object),
+            'uom': np.array([row[0] for row in rows], dtype=object)
+        },
+        numeric
+    )
+    columns.recalculate()
+    return columns
+
+
+class TestFinalAccountItemColumns(unittest.TestCase):
+    def test_update_uom_keeps_amounts(self):
+        """Quantities are converted and rates scaled back, so amounts are unchanged"""
+        columns = make_columns([
+            ('Meter', 10, 5, 12, 6),
+            ('Foot', 30, 2, 33, 2.5),
+            ('Box', 4, 100, 4, 110),
+            ('Centimeter', 250, 0.5, 300, 0.4)
+        ])
+        original_amounts = columns.numeric['original_amount'].copy()
+        final_amounts = columns.numeric['final_amount'].copy()
+
+        factors = {'Meter': 1000.0, 'Foot': 304.8, 'Centimeter': 10.0}
+        unconvertible = columns.update_uom(np.ones(len(columns), dtype=bool), 'Millimeter',
+            lambda uom, new_uom: factors.get(uom))
+        columns.recalculate()
+
+        self.assertEqual(unconvertible, ['Box'])
+        self.assertEqual(columns.text['uom'].tolist(), ['Millimeter', 'Millimeter', 'Box', 'Millimeter'])
+        np.testing.assert_allclose(columns.numeric['final_quantity'], [12000, 33 * 304.8, 4, 3000])
+        np.testing.assert_allclose(columns.numeric['final_amount'], final_amounts)
+        np.testing.assert_allclose(
+            columns.numeric['original_quantity'] * columns.numeric['original_rate'], original_amounts)
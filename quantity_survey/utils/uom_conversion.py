@@ -0,0 +1,119 @@
+"""
+UOM Conversion Module
+Cached conversion graph with transitive, shortest-path factor lookups
+"""
+
+import melon
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Redis keys for the shared graph and its version
+UOM_GRAPH_CACHE_KEY = 'quantity_survey:uom_conversion_graph'
+UOM_GRAPH_VERSION_KEY = 'quantity_survey:uom_conversion_graph_version'
+
+# Source UOMs whose factor tables are kept per process
+UOM_FACTOR_CACHE_SIZE = 1024
+
+# Graph last loaded by this process
+_process_graph = None
+
+
+class UOMConversionGraph:
+    """
+    UOM Conversion Detail rows as an undirected, weighted graph.
+
+    Each row (parent -> uom, value) gives an edge in both directions, the
+    reverse with factor 1 / value. A lookup runs one breadth-first search
+    from the source UOM, so the path used has the fewest hops, and keeps
+    the factors to every UOM it reached in an LRU cache. Chained
+    conversions such as m -> cm -> mm therefore resolve without extra
+    work.
+    """
+
+    def __init__(self, edges: List[Tuple[str, str, float]], version: str):
+        self.version = version
+        self.adjacency: Dict[str, Dict[str, float]] = {}
+
+        for from_uom, to_uom, value in edges:
+            if not from_uom or not to_uom or not value:
+                continue
+            # The first (most direct) definition of a pair wins
+            self.adjacency.setdefault(from_uom, {}).setdefault(to_uom, value)
+            self.adjacency.setdefault(to_uom, {}).setdefault(from_uom, 1 / value)
+
+        self.get_factors_from = lru_cache(maxsize=UOM_FACTOR_CACHE_SIZE)(self.search_factors)
+
+    def get_factor(self, from_uom: str, to_uom: str) -> Optional[float]:
+        """Quantity multiplier from from_uom to to_uom; None when they are not connected"""
+        if from_uom == to_uom:
+            return 1.0
+        return self.get_factors_from(from_uom).get(to_uom)
+
+    def search_factors(self, source: str) -> Dict[str, float]:
+        """Factors from source to every reachable UOM, along shortest paths"""
+        factors = {source: 1.0}
+        queue = deque([source])
+
+        while queue:
+            current = queue.popleft()
+            for neighbour, value in self.adjacency.get(current, {}).items():
+                if neighbour not in factors:
+                    factors[neighbour] = factors[current] * value
+                    queue.append(neighbour)
+
+        return factors
+
+
+def get_uom_conversion_factor(from_uom: str, to_uom: str) -> Optional[float]:
+    """
+    Factor converting a quantity in from_uom to to_uom, or None if no chain of
+    conversions links them.
+
+    The graph is read once per request from Redis (built from the database
+    only when Redis has none), so repeated lookups cost no queries.
+    """
+    return get_uom_conversion_graph().get_factor(from_uom, to_uom)
+
+
+def get_uom_conversion_graph() -> UOMConversionGraph:
+    """Graph for the current request; reloaded only when its version changed"""
+    graph = getattr(melon.local, 'uom_conversion_graph', None)
+    if graph is None:
+        graph = melon.local.uom_conversion_graph = load_uom_conversion_graph()
+    return graph
+
+
+def load_uom_conversion_graph() -> UOMConversionGraph:
+    global _process_graph
+
+    cache = melon.cache()
+    version = cache.get_value(UOM_GRAPH_VERSION_KEY)
+    if version and _process_graph is not None and _process_graph.version == version:
+        return _process_graph
+
+    cached = cache.get_value(UOM_GRAPH_CACHE_KEY)
+    if cached and cached.get('version') == version:
+        edges = cached['edges']
+    else:
+        version = melon.generate_hash(length=12)
+        edges = [
+            (row.parent, row.uom, float(row.value))
+            for row in melon.get_all('UOM Conversion Detail', fields=['parent', 'uom', 'value'], order_by='creation asc')
+            if row.value
+        ]
+        cache.set_value(UOM_GRAPH_CACHE_KEY, {'version': version, 'edges': edges})
+        cache.set_value(UOM_GRAPH_VERSION_KEY, version)
+
+    _process_graph = UOMConversionGraph(edges, version)
+    return _process_graph
+
+
+def clear_uom_conversion_cache(doc=None, method=None):
+    """Drop the cached graph when conversions change (doc event); every process reloads it on next use"""
+    cache = melon.cache()
+    cache.delete_value(UOM_GRAPH_CACHE_KEY)
+    cache.delete_value(UOM_GRAPH_VERSION_KEY)
+
+    if hasattr(melon.local, 'uom_conversion_graph'):
+        del melon.local.uom_conversion_graph
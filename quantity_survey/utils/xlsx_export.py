@@ -0,0 +1,138 @@
+"""
+XLSX Export Module
+Constant-memory workbooks streamed from SQL straight into the private files folder
+"""
+
+import melon
+from melon.utils import get_files_path
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Sequence
+import hashlib
+import os
+import xlsxwriter
+
+# Rows fetched from the server-side cursor and written per chunk
+EXPORT_FETCH_SIZE = 2000
+
+# Private files folder holding generated exports
+EXPORT_FOLDER = 'quantity_survey_exports'
+
+# Bytes read at a time when hashing a finished file
+EXPORT_HASH_READ_SIZE = 1024 * 1024
+
+
+class StreamingXlsxWriter:
+    """
+    xlsxwriter workbook in constant_memory mode, written directly to disk.
+
+    constant_memory flushes every row as soon as the next one is started,
+    so each sheet must be written top to bottom; write_query keeps that
+    order while reading rows from an unbuffered cursor. The workbook is
+    built under a temporary name in the private export folder and only
+    renamed and registered as a File by save(), attached to the document it
+    exports (see create_export_file).
+    """
+
+    def __init__(self, file_name: str, attached_to_doctype: str = None, attached_to_name: str = None):
+        self.file_name = file_name
+        self.attached_to_doctype = attached_to_doctype
+        self.attached_to_name = attached_to_name
+        self.folder = get_export_folder()
+        os.makedirs(self.folder, exist_ok=True)
+
+        self.temp_path = os.path.join(self.folder, f'.{melon.generate_hash(length=10)}.{file_name}.part')
+        self.workbook = xlsxwriter.Workbook(self.temp_path, {'constant_memory': True, 'tmpdir': self.folder})
+
+    def add_format(self, properties: Dict):
+        return self.workbook.add_format(properties)
+
+    def add_worksheet(self, name: str):
+        return self.workbook.add_worksheet(name)
+
+    def write_query(self, sheet, first_row: int, query: str, values, row_writer: Callable) -> int:
+        """
+        Write every row of query from first_row down; returns the next free row.
+
+        Rows arrive EXPORT_FETCH_SIZE at a time and are passed to
+        row_writer(sheet, row_number, row) in order. No other query may run
+        on the connection until this returns.
+        """
+        row_number = first_row
+        for chunk in iter_query_chunks(query, values):
+            for row in chunk:
+                row_writer(sheet, row_number, row)
+                row_number += 1
+        return row_number
+
+    def save(self):
+        """Close the workbook and register it as a private File; returns the File document"""
+        self.workbook.close()
+
+        file_path = os.path.join(self.folder, f'{melon.generate_hash(length=10)}_{self.file_name}')
+        os.replace(self.temp_path, file_path)
+
+        return create_export_file(file_path, self.file_name, self.attached_to_doctype, self.attached_to_name)
+
+    def discard(self):
+        """Drop a workbook that failed half way"""
+        try:
+            self.workbook.close()
+        except Exception:
+            pass
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def iter_query_chunks(query: str, values=None, chunk_size: int = EXPORT_FETCH_SIZE) -> Iterator[List]:
+    """Rows of query as dicts, in lists of up to chunk_size, read through a server-side cursor"""
+    with melon.db.unbuffered_cursor():
+        rows = melon.db.sql(query, values, as_dict=True, as_iterator=True)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
+
+def write_row(sheet, row_number: int, values: Sequence, formats: Sequence):
+    for column, (value, cell_format) in enumerate(zip(values, formats)):
+        sheet.write(row_number, column, value, cell_format)
+
+
+def create_export_file(file_path: str, file_name: str, attached_to_doctype: str = None,
+        attached_to_name: str = None):
+    """
+    File document for a file already in the private export folder.
+
+    The content hash is computed here, reading the file in blocks, so the
+    File doctype does not load the whole file to compute it. Exports are
+    attached to the document they were built from: a private File can then
+    be downloaded by anyone who can read that document, which cached
+    exports shared between users rely on.
+    """
+    hasher = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(EXPORT_HASH_READ_SIZE), b''):
+            hasher.update(block)
+
+    file_doc = melon.get_doc({
+        'doctype': 'File',
+        'file_name': file_name,
+        'file_url': get_export_file_url(file_path),
+        'file_size': os.path.getsize(file_path),
+        'content_hash': hasher.hexdigest(),
+        'is_private': 1,
+        'attached_to_doctype': attached_to_doctype,
+        'attached_to_name': attached_to_name
+    })
+    file_doc.insert(ignore_permissions=True)
+
+    return file_doc
+
+
+def get_export_folder() -> str:
+    return get_files_path(EXPORT_FOLDER, is_private=True)
+
+
+def get_export_file_url(file_path: str) -> str:
+    return f'/private/files/{EXPORT_FOLDER}/{os.path.basename(file_path)}'